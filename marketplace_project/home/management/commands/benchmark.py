@@ -0,0 +1,105 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import translation
+
+from marketplace_project.benchmark import SCENARIOS, Bench, compare
+
+
+class Command(BaseCommand):
+    help = (
+        "Проганяє гарячі сторінки (каталог, пошук, товар, кошик, оформлення, "
+        "історія замовлень, відгуки про продавця) через тестовий клієнт і пише "
+        "JSON з перцентилями латентності, кількістю SQL-запитів і піковою пам'яттю. "
+        "Усі зміни в базі відкочуються, тож запуск можна повторювати."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--memory-iterations", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--scenario", action="append", dest="scenarios",
+            choices=[scenario.name for scenario in SCENARIOS],
+            help="Лише ці сценарії (можна кілька разів)",
+        )
+        parser.add_argument("--cold", action="store_true", help="Чистити кеш перед кожним запитом")
+        parser.add_argument("--language", default="uk")
+        parser.add_argument("--output", help="Файл для JSON (інакше — stdout)")
+        parser.add_argument("--compare", help="JSON попереднього запуску для порівняння")
+        parser.add_argument(
+            "--threshold", type=float, default=0.10,
+            help="Ріст метрики, що вважається регресією (0.10 = 10%%)",
+        )
+        parser.add_argument(
+            "--fail-on-regression", action="store_true",
+            help="Завершитись з помилкою, якщо є регресії",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                baseline = json.load(file)
+
+        bench = Bench(
+            seed=options["seed"],
+            iterations=options["iterations"],
+            warmup=options["warmup"],
+            memory_iterations=options["memory_iterations"],
+            cold=options["cold"],
+        )
+        with (
+            override_settings(
+                EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "localhost"],
+                # запити рахує сам бенчмарк; попередження про бюджети тут лише шум
+                QUERY_BUDGET_ENABLED=False,
+            ),
+            translation.override(options["language"]),
+            transaction.atomic(),
+        ):
+            try:
+                result = bench.run(options["scenarios"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            finally:
+                transaction.set_rollback(True)
+
+        report = json.dumps(result, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(report + "\n")
+        else:
+            self.stdout.write(report)
+
+        self.summary(result)
+        if baseline is not None:
+            regressions = self.report_comparison(baseline, result, options["threshold"])
+            if regressions and options["fail_on_regression"]:
+                raise CommandError(f"Регресій: {regressions}")
+
+    def summary(self, result):
+        self.stderr.write(f"{'сценарій':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'запити':>8}{'пам. КБ':>10}{'помилки':>9}")
+        for name, stats in result["scenarios"].items():
+            latency = stats["latency_ms"]
+            self.stderr.write(
+                f"{name:<16}{latency['p50']:>9.1f}{latency['p95']:>9.1f}{latency['p99']:>9.1f}"
+                f"{stats['queries']['mean']:>8.1f}{stats['peak_memory_kb']:>10.0f}{stats['errors']:>9}"
+            )
+
+    def report_comparison(self, baseline, result, threshold):
+        regressions = 0
+        self.stderr.write("")
+        for name, metric, old, new, change, regressed in compare(baseline, result, threshold):
+            line = f"{name:<16}{metric:<18}{old:>10.1f} -> {new:<10.1f}{change:+.0%}"
+            if regressed:
+                regressions += 1
+                self.stderr.write(self.style.ERROR(line))
+            else:
+                self.stderr.write(line)
+        return regressions
@@ -0,0 +1,290 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from marketplace_project import page_cache
+from orders.models import Order, OrderItem
+from products import facets, search
+from products.models import Category, Product, SellerReview, SubCategory
+from reviews.models import Review
+from reviews.ratings import recompute_product_ratings, recompute_seller_reputation
+from users.models import CustomUser
+
+ADJECTIVES = [
+    "Зволожувальний", "Живильний", "Відновлювальний", "Освіжаючий", "Делікатний",
+    "Натуральний", "Органічний", "Професійний", "Мʼякий", "Інтенсивний",
+    "Легкий", "Захисний", "Матуючий", "Заспокійливий", "Вітамінний",
+]
+NOUNS = [
+    "шампунь", "бальзам", "крем", "гель", "тонік", "скраб", "лосьйон", "маска",
+    "сироватка", "олія", "міцелярна вода", "пінка", "спрей", "мило", "флюїд",
+]
+BRANDS = ["Verde", "Lumi", "Aqua Pure", "Nordic", "Sol", "Mira", "Botanica", "Ultra", "Zen", "Kora"]
+CATEGORIES = {
+    "Догляд за волоссям": ["Шампуні", "Бальзами", "Маски для волосся"],
+    "Догляд за обличчям": ["Креми", "Сироватки", "Тоніки"],
+    "Догляд за тілом": ["Гелі для душу", "Скраби", "Лосьйони"],
+    "Гігієна": ["Мило", "Дезодоранти"],
+}
+COMMENTS = [
+    "Чудовий товар, рекомендую", "Добре, але дорогувато", "Не підійшов", "Купую вже вдруге",
+    "Швидка доставка", "Запах приємний", "Нормально за свої гроші", "Якість на висоті",
+]
+# J-подібний розподіл оцінок, як на справжніх маркетплейсах: 1..5
+RATING_P = [0.07, 0.04, 0.08, 0.21, 0.60]
+ITEMS_P = [0.55, 0.25, 0.12, 0.08]
+STATUSES = [code for code, _ in Order.STATUS_CHOICES]
+STATUS_P = [0.10, 0.15, 0.15, 0.60]
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерує великий синтетичний набір даних для бенчмарків: користувачі, "
+        "продавці, товари, відгуки й замовлення з Zipf-перекосом (кілька хітів і "
+        "довгий хвіст). Пише bulk_create пачками, без сигналів; агрегати рейтингів "
+        "і пошуковий індекс перебудовує наприкінці. Той самий --seed дає ті самі дані."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--products", type=int, default=20_000)
+        parser.add_argument("--reviews", type=int, default=100_000)
+        parser.add_argument("--orders", type=int, default=50_000)
+        parser.add_argument("--sellers", type=float, default=0.05, help="Частка продавців серед користувачів")
+        parser.add_argument("--skew", type=float, default=1.1, help="Показник Zipf для популярності")
+        parser.add_argument("--days", type=int, default=365, help="За скільки днів розкидати дати")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--prefix", default="synth", help="Префікс імен користувачів")
+        parser.add_argument("--password", default="synthetic-pass", help="Пароль усіх користувачів")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.batch_size = options["batch_size"]
+        self.rng = np.random.default_rng(options["seed"])
+        self.tag = f"{options['prefix']}{options['seed']}"
+        self.now = timezone.now()
+        if CustomUser.objects.filter(username__startswith=f"{self.tag}-").exists():
+            raise CommandError(
+                f"Дані з префіксом {self.tag}- вже є: візьміть інший --seed або --prefix"
+            )
+        if options["users"] < 2 or options["products"] < 1:
+            raise CommandError("Потрібно щонайменше 2 користувачі й 1 товар")
+
+        self.step("Категорії", self.make_categories)
+        self.step("Користувачі", self.make_users)
+        self.step("Товари", self.make_products)
+        self.step("Відгуки", self.make_reviews)
+        self.step("Відгуки про продавців", self.make_seller_reviews)
+        self.step("Замовлення", self.make_orders)
+        self.step("Рейтинги", lambda: recompute_product_ratings())
+        self.step("Репутація продавців", lambda: recompute_seller_reputation())
+        self.step("Пошуковий індекс", self.index)
+
+        facets.invalidate()
+        page_cache.purge("products")
+        self.stdout.write(
+            "Індекси схожих товарів і рекомендацій не перебудовуються: "
+            "build_retrieval_index / build_recommendations за потреби."
+        )
+
+    def step(self, label, func):
+        started = time.perf_counter()
+        with transaction.atomic():
+            count = func()
+        elapsed = time.perf_counter() - started
+        rate = f", {count / elapsed:,.0f}/с" if count and elapsed else ""
+        self.stdout.write(self.style.SUCCESS(f"{label}: {count or 0:,} за {elapsed:.1f} с{rate}"))
+
+    # ===========================
+    #   ВИПАДКОВІСТЬ
+    # ===========================
+    def popularity(self, ids):
+        """
+        Функція вибору з ``ids`` з вагами 1/rank**skew; ранги перемішані,
+        щоб хіти не збігались з найменшими pk.
+        """
+        ids = self.rng.permutation(np.asarray(ids))
+        weights = 1 / np.arange(1, len(ids) + 1) ** self.options["skew"]
+        cumulative = np.cumsum(weights / weights.sum())
+        return lambda size: ids[np.minimum(np.searchsorted(cumulative, self.rng.random(size)), len(ids) - 1)]
+
+    def dates(self, size):
+        seconds = self.rng.uniform(0, self.options["days"] * 86400, size)
+        return [self.now - timedelta(seconds=float(s)) for s in seconds]
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - start)
+
+    def ids(self, model, **filters):
+        return np.fromiter(
+            model.objects.filter(**filters).order_by("pk").values_list("pk", flat=True).iterator(),
+            dtype=np.int64,
+        )
+
+    # ===========================
+    #   ДАНІ
+    # ===========================
+    def make_categories(self):
+        self.subcategories = []
+        for name, subs in CATEGORIES.items():
+            category, _ = Category.objects.get_or_create(name=name)
+            for sub in subs:
+                subcategory, _ = SubCategory.objects.get_or_create(name=sub, defaults={"category": category})
+                self.subcategories.append(subcategory)
+        return len(self.subcategories)
+
+    def make_users(self):
+        total = self.options["users"]
+        sellers = max(1, int(total * self.options["sellers"]))
+        password = make_password(self.options["password"])
+        created = 0
+        for size in self.batches(total):
+            users = []
+            for i in range(created, created + size):
+                is_seller = i < sellers
+                users.append(CustomUser(
+                    username=f"{self.tag}-{i}",
+                    password=password,
+                    is_seller=is_seller,
+                    role="seller" if is_seller else "buyer",
+                    store_name=f"Магазин {i}" if is_seller else "",
+                ))
+            CustomUser.objects.bulk_create(users)
+            created += size
+
+        self.user_ids = self.ids(CustomUser, username__startswith=f"{self.tag}-")
+        self.seller_ids = self.ids(CustomUser, username__startswith=f"{self.tag}-", is_seller=True)
+        return created
+
+    def make_products(self):
+        total = self.options["products"]
+        pick_seller = self.popularity(self.seller_ids)
+        rng = self.rng
+        created = 0
+        for size in self.batches(total):
+            sellers = pick_seller(size)
+            prices = np.round(rng.lognormal(6.5, 1.0, size), 2)
+            stocks = np.where(rng.random(size) < 0.1, 0, rng.integers(1, 200, size))
+            subs = rng.integers(0, len(self.subcategories), size)
+            adjectives = rng.integers(0, len(ADJECTIVES), size)
+            nouns = rng.integers(0, len(NOUNS), size)
+            brands = rng.integers(0, len(BRANDS), size)
+            products = []
+            for i in range(size):
+                subcategory = self.subcategories[subs[i]]
+                noun = NOUNS[nouns[i]]
+                product = Product(
+                    seller_id=int(sellers[i]),
+                    title=f"{ADJECTIVES[adjectives[i]]} {noun} {BRANDS[brands[i]]} #{created + i}",
+                    description=f"{ADJECTIVES[adjectives[i]]} {noun} для щоденного догляду.",
+                    price=Decimal(str(prices[i])),
+                    stock=int(stocks[i]),
+                    available=bool(stocks[i]),
+                    category=subcategory.category,
+                    subcategory=subcategory,
+                )
+                product.refresh_ai_summary()
+                products.append(product)
+            Product.objects.bulk_create(products)
+            created += size
+
+        rows = Product.objects.filter(seller__username__startswith=f"{self.tag}-").order_by("pk")
+        self.product_ids = self.ids(Product, seller__username__startswith=f"{self.tag}-")
+        self.product_prices = dict(rows.values_list("pk", "price").iterator())
+        return created
+
+    def make_reviews(self):
+        pick_product = self.popularity(self.product_ids)
+        created = 0
+        for size in self.batches(self.options["reviews"]):
+            products = pick_product(size)
+            reviewers = self.rng.choice(self.user_ids, size)
+            ratings = self.rng.choice(5, size, p=RATING_P) + 1
+            comments = self.rng.integers(0, len(COMMENTS), size)
+            reviews = Review.objects.bulk_create([
+                Review(
+                    product_id=int(products[i]), reviewer_id=int(reviewers[i]),
+                    rating=int(ratings[i]), comment=COMMENTS[comments[i]],
+                )
+                for i in range(size)
+            ])
+            # auto_now_add у bulk_create завжди ставить "зараз"
+            for review, created_at in zip(reviews, self.dates(size)):
+                review.created_at = review.updated_at = created_at
+            Review.objects.bulk_update(reviews, ["created_at", "updated_at"], batch_size=1000)
+            created += size
+        return created
+
+    def make_seller_reviews(self):
+        pick_seller = self.popularity(self.seller_ids)
+        created = 0
+        for size in self.batches(self.options["reviews"] // 10):
+            sellers = pick_seller(size)
+            reviewers = self.rng.choice(self.user_ids, size)
+            ratings = self.rng.choice(5, size, p=RATING_P) + 1
+            SellerReview.objects.bulk_create([
+                SellerReview(
+                    seller_id=int(sellers[i]), reviewer_id=int(reviewers[i]),
+                    rating=int(ratings[i]), comment=COMMENTS[i % len(COMMENTS)],
+                )
+                for i in range(size)
+            ])
+            created += size
+        return created
+
+    def make_orders(self):
+        pick_buyer = self.popularity(self.user_ids)
+        pick_product = self.popularity(self.product_ids)
+        created = 0
+        for size in self.batches(self.options["orders"]):
+            buyers = pick_buyer(size)
+            item_counts = self.rng.choice(len(ITEMS_P), size, p=ITEMS_P) + 1
+            products = pick_product(int(item_counts.sum()))
+            quantities = np.where(self.rng.random(len(products)) < 0.85, 1, self.rng.integers(2, 5, len(products)))
+            statuses = self.rng.choice(len(STATUSES), size, p=STATUS_P)
+
+            orders, lines, position = [], [], 0
+            for i in range(size):
+                order_lines = []
+                for _ in range(item_counts[i]):
+                    product_id = int(products[position])
+                    quantity = int(quantities[position])
+                    price = self.product_prices[product_id]
+                    order_lines.append(OrderItem(
+                        product_id=product_id, quantity=quantity,
+                        unit_price=price, line_total=price * quantity,
+                    ))
+                    position += 1
+                orders.append(Order(
+                    buyer_id=int(buyers[i]),
+                    status=STATUSES[statuses[i]],
+                    full_name=f"Покупець {buyers[i]}",
+                    delivery_method="nova_poshta",
+                    payment_method="card",
+                    total_price=sum(line.line_total for line in order_lines),
+                ))
+                lines.append(order_lines)
+
+            Order.objects.bulk_create(orders)
+            for order, created_at in zip(orders, self.dates(size)):
+                order.created_at = created_at
+            Order.objects.bulk_update(orders, ["created_at"], batch_size=1000)
+            for order, order_lines in zip(orders, lines):
+                for line in order_lines:
+                    line.order = order
+            OrderItem.objects.bulk_create([line for order_lines in lines for line in order_lines])
+            created += size
+        return created
+
+    def index(self):
+        return search.index_products(
+            Product.objects.filter(seller__username__startswith=f"{self.tag}-")
+        )
@@ -1,3 +1,75 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from marketplace_project.benchmark import SCENARIOS, compare, percentile
+from orders.models import Order, OrderItem
+from products.models import Product
+from reviews.models import Review
+
+
+class SyntheticBenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            "generate_synthetic_data", users=40, products=60, reviews=300, orders=80,
+            batch_size=25, stdout=StringIO(),
+        )
+
+    def test_generated_dataset(self):
+        self.assertEqual(Product.objects.count(), 60)
+        self.assertEqual(Review.objects.count(), 300)
+        self.assertEqual(Order.objects.count(), 80)
+        self.assertGreaterEqual(OrderItem.objects.count(), 80)
+        # агрегати рейтингів перераховані після bulk_create
+        rated = Product.objects.filter(rating_count__gt=0)
+        self.assertEqual(sum(rated.values_list("rating_count", flat=True)), 300)
+
+    def test_benchmark_report_and_rollback(self):
+        orders = Order.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "run.json")
+            call_command(
+                "benchmark", iterations=3, warmup=0, memory_iterations=1,
+                output=output, stderr=StringIO(),
+            )
+            with open(output, encoding="utf-8") as file:
+                result = json.load(file)
+
+        self.assertEqual(set(result["scenarios"]), {scenario.name for scenario in SCENARIOS})
+        for name, stats in result["scenarios"].items():
+            self.assertEqual(stats["errors"], 0, name)
+            self.assertEqual(stats["requests"], 3)
+            self.assertGreater(stats["queries"]["max"], 0, name)
+        self.assertEqual(result["meta"]["dataset"]["orders"], orders)
+        # checkout відкочено
+        self.assertEqual(Order.objects.count(), orders)
+
+    def test_benchmark_does_not_touch_shared_cache(self):
+        cache.clear()
+        cache.set("live-site-key", "value")
+        call_command(
+            "benchmark", iterations=1, warmup=0, memory_iterations=1, cold=True,
+            scenarios=["catalog_list"], stdout=StringIO(), stderr=StringIO(),
+        )
+        self.assertEqual(cache.get("live-site-key"), "value")
+        # каталог під бенчмарком кешував фасети — але не тут
+        self.assertIsNone(cache.get("products:facets:version"))
+
+    def test_compare_flags_regressions(self):
+        stats = {"latency_ms": {"p50": 10, "p95": 20}, "queries": {"mean": 5}, "peak_memory_kb": 100}
+        slower = {"latency_ms": {"p50": 15, "p95": 20}, "queries": {"mean": 5}, "peak_memory_kb": 100}
+        rows = compare({"scenarios": {"cart": stats}}, {"scenarios": {"cart": slower}})
+        regressed = [(name, metric) for name, metric, *_, flag in rows if flag]
+        self.assertEqual(regressed, [("cart", "latency_ms.p50")])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
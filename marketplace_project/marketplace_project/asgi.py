@@ -3,6 +3,9 @@ ASGI config for marketplace_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Async views (the streaming AI chat) need an ASGI server, e.g.:
+    gunicorn marketplace_project.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,334 @@
+"""
+Відтворюваний бенчмарк гарячих сторінок магазину.
+
+Сценарії проганяються в процесі через тестовий клієнт Django — без мережі
+й веб-сервера, тож вимірюється саме view + шаблони + SQL. Товари, пошукові
+слова й сторінки обираються з Zipf-подібним перекосом (популярне частіше),
+генератор випадковості — з фіксованим seed, тож два запуски на одній базі
+роблять однакові запити.
+
+Для кожного сценарію збираються перцентилі латентності, кількість
+SQL-запитів (``query_budget.QueryLog``) і пікова пам'ять окремим проходом
+під tracemalloc (він сповільнює виконання і спотворив би латентність).
+Результат — JSON; ``compare`` порівнює його з попереднім запуском.
+
+Кеш на час прогону — власний LocMemCache процесу: сторінки й фасети
+бенчмарка (з даними, які потім відкотяться) не потрапляють у спільний
+Redis, а ``--cold`` не чистить кеш живого сайту.
+"""
+import bisect
+import itertools
+import math
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .query_budget import QueryLog, recording
+
+PERCENTILES = (50, 90, 95, 99)
+# метрики, за якими compare шукає регресії (шлях у JSON сценарію)
+COMPARED = (
+    ("latency_ms", "p50"),
+    ("latency_ms", "p95"),
+    ("queries", "mean"),
+    ("peak_memory_kb", None),
+)
+# скільки найпопулярніших товарів бере участь у вибірці
+POOL_SIZE = 1000
+SKEW = 1.1
+PRIVATE_CACHE = {
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "benchmark",
+    "OPTIONS": {"MAX_ENTRIES": 10_000},
+}
+
+
+def percentile(values, p):
+    """Перцентиль за найближчим рангом; ``values`` — відсортований список."""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+class Skewed:
+    """Вибір з послідовності з вагами 1/rank**SKEW: перші елементи — "хіти"."""
+
+    def __init__(self, items, rng):
+        self.items = list(items)
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** SKEW for rank in range(1, len(self.items) + 1)
+        ))
+
+    def pick(self):
+        x = self.rng.random() * self.cum_weights[-1]
+        return self.items[bisect.bisect(self.cum_weights, x)]
+
+
+# ===========================
+#   СЦЕНАРІЇ
+# ===========================
+@dataclass
+class Scenario:
+    name: str
+    # (method, url, data) наступного запиту
+    request: Callable[["Bench"], tuple]
+    # None — анонім, "buyer" — покупець з найбільшою історією замовлень
+    user: Optional[str] = None
+    # кроки перед запитом, що не входять у вимірювання
+    prepare: Optional[Callable[["Bench"], None]] = None
+    expect: tuple = (200,)
+
+
+def _catalog(bench):
+    return "GET", reverse("product-list"), {"page": bench.pages.pick()}
+
+
+def _search(bench):
+    return "GET", reverse("product-list"), {"q": bench.terms.pick()}
+
+
+def _detail(bench):
+    return "GET", reverse("product-detail", args=[bench.products.pick()]), None
+
+
+def _add_to_cart(bench):
+    return "POST", reverse("add-to-cart", args=[bench.products.pick()]), {}
+
+
+def _cart(bench):
+    return "GET", reverse("cart"), None
+
+
+def _fill_cart(bench):
+    bench.clients["buyer"].post(reverse("add-to-cart", args=[bench.products.pick()]))
+
+
+def _checkout(bench):
+    return "POST", reverse("order-create"), {
+        "full_name": bench.buyer.username,
+        "delivery_method": "courier",
+        "payment_method": "cod",
+    }
+
+
+def _order_history(bench):
+    return "GET", reverse("order-list"), None
+
+
+def _seller_reviews(bench):
+    return "GET", reverse("seller-reviews", args=[bench.sellers.pick()]), None
+
+
+SCENARIOS = [
+    Scenario("catalog_list", _catalog),
+    Scenario("search", _search),
+    Scenario("product_detail", _detail),
+    Scenario("add_to_cart", _add_to_cart, user="buyer", expect=(200, 302)),
+    Scenario("cart", _cart, user="buyer"),
+    Scenario("checkout", _checkout, user="buyer", prepare=_fill_cart, expect=(302,)),
+    Scenario("order_history", _order_history, user="buyer"),
+    Scenario("seller_reviews", _seller_reviews),
+]
+
+
+# ===========================
+#   ЗАПУСК
+# ===========================
+@dataclass
+class Bench:
+    seed: int = 0
+    iterations: int = 200
+    warmup: int = 20
+    memory_iterations: int = 5
+    # чистити кеш перед кожним запитом (найгірший випадок для анонімів)
+    cold: bool = False
+    rng: random.Random = field(init=False)
+    clients: dict = field(init=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.rng = random.Random(self.seed)
+
+    def setup(self):
+        """Вибірки з бази; самі ці запити не вимірюються."""
+        from orders.models import Order
+        from products.models import Product
+        from products.search import tokenize
+        from products.views import ProductListView
+        from users.models import CustomUser
+
+        popular = list(
+            Product.objects.filter(available=True)
+            .order_by("-rating_count", "pk")
+            .values_list("pk", "title")[:POOL_SIZE]
+        )
+        if not popular:
+            raise ValueError("у базі немає товарів у наявності — спершу generate_synthetic_data")
+        self.products = Skewed([pk for pk, _ in popular], self.rng)
+
+        words = Counter(word for _, title in popular for word in tokenize(title) if len(word) > 3)
+        self.terms = Skewed([word for word, _ in words.most_common(200)], self.rng)
+
+        pages = math.ceil(Product.objects.count() / ProductListView.paginate_by)
+        self.pages = Skewed(range(1, min(pages, 50) + 1), self.rng)
+
+        sellers = (
+            Product.objects.values("seller").annotate(n=Count("id")).order_by("-n")[:100]
+        )
+        self.sellers = Skewed([row["seller"] for row in sellers], self.rng)
+
+        top_buyer = (
+            Order.objects.values("buyer").annotate(n=Count("id")).order_by("-n").first()
+        )
+        if top_buyer:
+            self.buyer = CustomUser.objects.get(pk=top_buyer["buyer"])
+        else:
+            self.buyer = CustomUser.objects.filter(is_active=True).order_by("pk").first()
+
+        self.clients[None] = Client(HTTP_HOST="localhost")
+        self.clients["buyer"] = Client(HTTP_HOST="localhost")
+        self.clients["buyer"].force_login(self.buyer)
+
+    def call(self, scenario):
+        if scenario.prepare:
+            scenario.prepare(self)
+        method, url, data = scenario.request(self)
+        if self.cold:
+            cache.clear()
+        client = self.clients[scenario.user]
+        send = client.post if method == "POST" else client.get
+        return lambda: send(url, data)
+
+    def run_scenario(self, scenario):
+        for _ in range(self.warmup):
+            self.call(scenario)()
+
+        latencies, queries, errors = [], [], 0
+        for _ in range(self.iterations):
+            send = self.call(scenario)
+            log = QueryLog()
+            with recording(log):
+                started = time.perf_counter()
+                response = send()
+                latencies.append((time.perf_counter() - started) * 1000)
+            # SAVEPOINT/RELEASE транзакції бенчмарка QueryLog не рахує
+            queries.append(len(log))
+            if response.status_code not in scenario.expect:
+                errors += 1
+
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(self.memory_iterations):
+                send = self.call(scenario)
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                send()
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+
+        latencies.sort()
+        stats = {f"p{p}": round(percentile(latencies, p), 3) for p in PERCENTILES}
+        stats.update(
+            min=round(latencies[0], 3),
+            max=round(latencies[-1], 3),
+            mean=round(sum(latencies) / len(latencies), 3),
+        )
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "latency_ms": stats,
+            "queries": {
+                "mean": round(sum(queries) / len(queries), 2),
+                "max": max(queries),
+            },
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+
+    def run(self, names=None):
+        scenarios = [s for s in SCENARIOS if names is None or s.name in names]
+        with override_settings(CACHES={alias: PRIVATE_CACHE for alias in settings.CACHES}):
+            try:
+                self.setup()
+                return {
+                    "meta": self.meta(),
+                    "scenarios": {s.name: self.run_scenario(s) for s in scenarios},
+                }
+            finally:
+                cache.clear()
+
+    def meta(self):
+        from orders.models import Order
+        from products.models import Product
+        from reviews.models import Review
+        from users.models import CustomUser
+
+        try:
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except OSError:
+            commit = None
+        return {
+            "started_at": timezone.now().isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "debug": settings.DEBUG,
+            "seed": self.seed,
+            "iterations": self.iterations,
+            "warmup": self.warmup,
+            "cold_cache": self.cold,
+            "dataset": {
+                "users": CustomUser.objects.count(),
+                "products": Product.objects.count(),
+                "reviews": Review.objects.count(),
+                "orders": Order.objects.count(),
+            },
+        }
+
+
+# ===========================
+#   ПОРІВНЯННЯ
+# ===========================
+def _metric(stats, group, key):
+    value = stats.get(group)
+    return value.get(key) if key and isinstance(value, dict) else value
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    [(сценарій, метрика, було, стало, зміна, регресія?), ...] для сценаріїв,
+    що є в обох запусках; регресія — ріст більше ніж на ``threshold``.
+    """
+    rows = []
+    for name, stats in current["scenarios"].items():
+        old_stats = baseline["scenarios"].get(name)
+        if old_stats is None:
+            continue
+        for group, key in COMPARED:
+            old, new = _metric(old_stats, group, key), _metric(stats, group, key)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else math.inf)
+            label = f"{group}.{key}" if key else group
+            rows.append((name, label, old, new, change, change > threshold))
+    return rows
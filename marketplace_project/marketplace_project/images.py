@@ -0,0 +1,156 @@
+"""
+Похідні зображення (мініатюри) для фото товарів і аватарів.
+
+Після завантаження оригіналу пул потоків рендерить WebP і JPEG кількох
+ширин поруч з ним (``products/ab/cd/<хеш>.jpg`` -> ``products/ab/cd/<хеш>.w320.webp``)
+і записує, що згенеровано, у JSON-поле моделі (``{"src": ..., "widths": [...]}``).
+Шаблони будують з нього ``srcset`` (тег ``responsive_image``); поки
+похідних немає — віддається оригінал. ``render`` працює лише з байтами,
+тож його можна ганяти і в пулі процесів (команда build_image_derivatives).
+Після запису похідних шлеться сигнал ``variants_stored`` — застосунки
+скидають за ним свої кеші сторінок і фрагментів.
+Видаляє похідні сховище (``storage.collect``) разом з оригіналом, коли на
+нього не лишається посилань.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_WIDTHS = (320, 640, 1024)
+AVATAR_WIDTHS = (48, 96, 240)
+# (розширення, формат Pillow) — перший формат браузер отримує через <source>
+FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+QUALITY = 80
+
+# instance — рядок, яким він був до запису похідних (зі старим updated_at)
+variants_stored = Signal()
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "IMAGE_WORKERS", 2), thread_name_prefix="images"
+)
+
+
+def derivative_name(name, width, ext):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}.w{width}.{ext}"
+
+
+def render(data, widths):
+    """Байти оригіналу -> [(ширина, розширення, байти), ...]. Без збільшення."""
+    with Image.open(io.BytesIO(data)) as original:
+        # фото з телефона часто повернуті лише тегом EXIF
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    targets = [width for width in widths if width < image.width] or [image.width]
+    results = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        for ext, fmt in FORMATS:
+            frame = resized
+            if fmt == "JPEG" and frame.mode != "RGB":
+                # JPEG без прозорості: підкладаємо білий фон
+                background = Image.new("RGB", frame.size, "white")
+                rgba = frame.convert("RGBA")
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                frame = background
+            elif fmt == "WEBP" and frame.mode not in ("RGB", "RGBA"):
+                frame = frame.convert("RGBA")
+            buffer = io.BytesIO()
+            options = {"quality": QUALITY}
+            if fmt == "JPEG":
+                options.update(optimize=True, progressive=True)
+            else:
+                options.update(method=4)
+            frame.save(buffer, fmt, **options)
+            results.append((width, ext, buffer.getvalue()))
+    return results
+
+
+def save_rendered(storage, name, rendered):
+    """Записує результат ``render`` у сховище; повертає значення для JSON-поля."""
+    # контентно-адресоване сховище перейменувало б файл за хешем
+    save = getattr(storage, "save_exact", storage.save)
+    widths = []
+    for width, ext, data in rendered:
+        target = derivative_name(name, width, ext)
+        if storage.exists(target):
+            storage.delete(target)
+        save(target, ContentFile(data))
+        if width not in widths:
+            widths.append(width)
+    return {"src": name, "widths": sorted(widths)}
+
+
+def _auto_now_fields(model):
+    return [f.attname for f in model._meta.concrete_fields if getattr(f, "auto_now", False)]
+
+
+def store_variants(model, pk, field, name, variants_field, variants):
+    """Записує похідні, лише якщо за цей час не завантажили інше зображення."""
+    changes = {variants_field: variants}
+    # update() обходить auto_now, а від updated_at залежать кешовані фрагменти
+    now = timezone.now()
+    changes.update((attname, now) for attname in _auto_now_fields(model))
+    return bool(model.objects.filter(pk=pk, **{field: name}).update(**changes))
+
+
+def _process(model, pk, field, variants_field, widths):
+    instance = model.objects.filter(pk=pk).only(field, variants_field, *_auto_now_fields(model)).first()
+    if instance is None:
+        return
+    file = getattr(instance, field)
+    variants = getattr(instance, variants_field) or {}
+    if not file or variants.get("src") == file.name:
+        return
+
+    with file.open("rb") as source:
+        data = source.read()
+    variants = save_rendered(file.storage, file.name, render(data, widths))
+
+    updated = store_variants(model, pk, field, file.name, variants_field, variants)
+    if updated:
+        variants_stored.send(sender=model, instance=instance)
+    elif hasattr(file.storage, "collect"):
+        # оригінал могли вже прибрати разом з похідними — не лишаємо сиріт
+        file.storage.collect(file.name)
+
+
+def _run(*args):
+    try:
+        _process(*args)
+    except Exception:
+        logger.exception("image derivatives failed for %s", args[:2])
+
+
+def schedule(instance, field, variants_field, widths):
+    """Після коміту ставить генерацію похідних у пул, якщо зображення змінилось."""
+    file = getattr(instance, field)
+    variants = getattr(instance, variants_field) or {}
+    if (file.name or None) == variants.get("src"):
+        return
+    if not file:
+        # зображення прибрали; самі файли видалить сховище
+        model, pk = type(instance), instance.pk
+        transaction.on_commit(lambda: model.objects.filter(pk=pk).update(**{variants_field: {}}))
+        return
+    args = (type(instance), instance.pk, field, variants_field, widths)
+    transaction.on_commit(lambda: _executor.submit(_run, *args))
+
+
+def srcset(variants, ext, storage):
+    return ", ".join(
+        f"{storage.url(derivative_name(variants['src'], width, ext))} {width}w"
+        for width in variants["widths"]
+    )
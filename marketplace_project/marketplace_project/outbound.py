@@ -0,0 +1,330 @@
+"""
+Спільний HTTP-клієнт для зовнішніх інтеграцій (OpenAI, Telegram).
+
+На кожен upstream — свій ``requests.Session`` з пулом keep-alive
+з'єднань, жорсткими connect/read таймаутами, повтором з jitter і
+circuit breaker'ом: після серії помилок upstream вважається
+деградованим і запити до нього одразу падають з ``UpstreamUnavailable``,
+замість того щоб тримати воркер gunicorn. Латентність і помилки кожного
+upstream пишуться в лог "outbound" і доступні через ``metrics()``.
+
+Для async view є ``aclient(name)`` — неблокуючий клієнт на httpx зі
+спільними з синхронним клієнтом breaker'ом і метриками.
+"""
+import asyncio
+import logging
+import random
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("outbound")
+
+RETRY_STATUSES = {429, 502, 503, 504}
+# токен Telegram-бота сидить прямо в шляху — у лог він не потрапляє
+SECRET_PATH_RE = re.compile(r"/bot[^/]+")
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class UpstreamUnavailable(UpstreamError):
+    """Circuit breaker розімкнений — upstream не питаємо."""
+
+
+@dataclass(frozen=True)
+class Upstream:
+    name: str
+    base_url: str
+    connect_timeout: float = 3.05
+    read_timeout: float = 10
+    retries: int = 2
+    backoff: float = 0.2
+    pool_size: int = 10
+    # скільки помилок поспіль розмикає breaker і на скільки секунд
+    failure_threshold: int = 5
+    cooldown: float = 30
+    # POST повторюємо лише коли запит точно не дійшов (помилка з'єднання),
+    # якщо upstream не ідемпотентний
+    idempotent_post: bool = False
+
+
+UPSTREAMS = {
+    "openai": Upstream("openai", "https://api.openai.com", read_timeout=30, retries=1),
+    "telegram": Upstream("telegram", "https://api.telegram.org"),
+}
+
+
+def _log_path(path):
+    return SECRET_PATH_RE.sub("/bot***", path.split("?")[0])
+
+
+# ===========================
+#   CIRCUIT BREAKER
+# ===========================
+class CircuitBreaker:
+    def __init__(self, failure_threshold, cooldown):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            # після cooldown пропускаємо один пробний запит
+            if state == "half-open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Запит перервався без відповіді upstream'а (скасування, помилка в
+        нашому коді): пробу знімаємо, не рахуючи ні успіхом, ні помилкою."""
+        with self._lock:
+            self.probing = False
+
+
+# ===========================
+#   МЕТРИКИ
+# ===========================
+class UpstreamMetrics:
+    def __init__(self, window=500):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, ok):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.errors += 1
+            self.latencies.append(seconds)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            data = {"requests": self.requests, "errors": self.errors, "rejected": self.rejected}
+        if latencies:
+            def pct(p):
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1)
+            data.update(p50_ms=pct(0.5), p95_ms=pct(0.95), p99_ms=pct(0.99))
+        return data
+
+
+# ===========================
+#   КЛІЄНТ
+# ===========================
+class OutboundClient:
+    def __init__(self, upstream: Upstream):
+        self.upstream = upstream
+        self.breaker = CircuitBreaker(upstream.failure_threshold, upstream.cooldown)
+        self.stats = UpstreamMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=upstream.pool_size, pool_block=False
+        )
+        self.session.mount(upstream.base_url, adapter)
+
+    def request(self, method, path, **kwargs):
+        upstream = self.upstream
+        kwargs.setdefault("timeout", (upstream.connect_timeout, upstream.read_timeout))
+        retry_sent = method.upper() != "POST" or upstream.idempotent_post
+        url = upstream.base_url + path
+
+        for attempt in range(upstream.retries + 1):
+            if not self.breaker.allow():
+                self.stats.reject()
+                raise UpstreamUnavailable(f"{upstream.name}: circuit open")
+
+            began = time.perf_counter()
+            retryable = False
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.ConnectTimeout as e:
+                # з'єднання не встановлено — запит точно не дійшов
+                error, retryable = e, True
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, retryable = e, retry_sent
+            except BaseException:
+                # інакше half-open breaker чекав би результату проби вічно
+                self.breaker.release()
+                raise
+            else:
+                error = None
+                if response.status_code >= 500 or response.status_code == 429:
+                    error = UpstreamError(f"{upstream.name}: HTTP {response.status_code}")
+                    # 429 — запит не оброблено, його можна повторити завжди
+                    retryable = response.status_code in RETRY_STATUSES and (
+                        retry_sent or response.status_code == 429
+                    )
+            elapsed = time.perf_counter() - began
+
+            self.stats.observe(elapsed, ok=error is None)
+            logger.info(
+                "%s %s %s %.0fms %s", upstream.name, method, _log_path(path),
+                elapsed * 1000, "ok" if error is None else f"error: {error}",
+            )
+
+            if error is None:
+                self.breaker.record_success()
+                return response
+
+            self.breaker.record_failure()
+            if not retryable or attempt == upstream.retries:
+                if isinstance(error, UpstreamError):
+                    return response
+                raise error
+            time.sleep(random.uniform(0, upstream.backoff * 2 ** attempt))
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+
+class AsyncOutboundClient:
+    """
+    Неблокуючий клієнт для стрімінгових відповідей. Повторюється лише
+    невдале з'єднання — після перших байтів відповіді повтор неможливий.
+    """
+
+    def __init__(self, upstream: Upstream, breaker, stats):
+        self.upstream = upstream
+        self.breaker = breaker
+        self.stats = stats
+        self.http = httpx.AsyncClient(
+            base_url=upstream.base_url,
+            timeout=httpx.Timeout(upstream.read_timeout, connect=upstream.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=upstream.pool_size,
+                max_keepalive_connections=upstream.pool_size,
+            ),
+        )
+
+    @asynccontextmanager
+    async def stream(self, method, path, **kwargs):
+        upstream = self.upstream
+        for attempt in range(upstream.retries + 1):
+            if not self.breaker.allow():
+                self.stats.reject()
+                raise UpstreamUnavailable(f"{upstream.name}: circuit open")
+
+            began = time.perf_counter()
+            try:
+                request = self.http.build_request(method, path, **kwargs)
+                response = await self.http.send(request, stream=True)
+            except httpx.ConnectError as e:
+                error = e
+                response = None
+            except httpx.HTTPError:
+                self.stats.observe(time.perf_counter() - began, ok=False)
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                # у т.ч. CancelledError, коли клієнт закрив SSE-з'єднання
+                self.breaker.release()
+                raise
+            else:
+                error = None
+
+            # латентність стріму — час до заголовків відповіді
+            elapsed = time.perf_counter() - began
+            failed = error is not None or response.status_code >= 500
+            self.stats.observe(elapsed, ok=not failed)
+            logger.info(
+                "%s %s %s %.0fms stream %s", upstream.name, method, _log_path(path),
+                elapsed * 1000,
+                f"error: {error}" if error else response.status_code,
+            )
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            if error is None:
+                break
+            if attempt == upstream.retries:
+                raise error
+            await asyncio.sleep(random.uniform(0, upstream.backoff * 2 ** attempt))
+
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+# httpx.AsyncClient прив'язаний до event loop, тому клієнти — на кожен loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def client(name: str) -> OutboundClient:
+    """Клієнт upstream'а (один на процес)."""
+    if name not in _clients:
+        with _clients_lock:
+            if name not in _clients:
+                _clients[name] = OutboundClient(UPSTREAMS[name])
+    return _clients[name]
+
+
+def aclient(name: str) -> AsyncOutboundClient:
+    """Async-клієнт upstream'а для поточного event loop."""
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.setdefault(loop, {})
+    if name not in clients:
+        sync_client = client(name)
+        clients[name] = AsyncOutboundClient(
+            sync_client.upstream, sync_client.breaker, sync_client.stats
+        )
+    return clients[name]
+
+
+def metrics() -> dict:
+    """Латентність, помилки і стан breaker'а по кожному upstream."""
+    return {
+        name: {**c.stats.snapshot(), "circuit": c.breaker.state}
+        for name, c in _clients.items()
+    }
@@ -0,0 +1,154 @@
+"""
+Кеш цілих сторінок каталогу для анонімних відвідувачів.
+
+``cache_anonymous_page`` обгортає view: GET/HEAD анонімного користувача
+без flash-повідомлень віддається з кешу, ключ — шлях (з мовним префіксом
+i18n_patterns) + відсортований query string + HX-Request. Залогіненим
+сторінка рендериться як завжди, тож стан входу в навбарі кешованої копії
+завжди "анонімний" і окремої обробки не потребує.
+
+Інвалідація — через surrogate keys: сторінка позначається тегами
+(``products``, ``product:42``), у кеші лежить версія кожного тегу, а запис
+пам'ятає версії, з якими його збережено. ``purge(*tags)`` лише збільшує
+версії, і всі сторінки з цими тегами стають промахами — без перебору ключів.
+
+"Дірки" — шматки, що залежать від сесії: ``{% page_hole "cart_badge" %}``
+рендерить фрагмент між маркерами, перед записом у кеш він вирізається, а
+при видачі з кешу рендериться заново функцією з ``PAGE_CACHE_HOLES``.
+Так само CSRF-токен у формах підставляється свіжий для кожного запиту.
+"""
+import functools
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+TTL = getattr(settings, "PAGE_CACHE_TTL", 600)
+KEY_PREFIX = "pagecache"
+
+HOLE_RE = re.compile(r"<!--hole:(\w+)-->.*?<!--/hole-->", re.S)
+CSRF_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = "<!--csrf-->"
+
+
+# ===========================
+#   ТЕГИ
+# ===========================
+def _tag_key(tag):
+    return f"{KEY_PREFIX}:tag:{tag}"
+
+
+def tag_versions(tags):
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    missing = {key: 1 for key in keys if key not in found}
+    if missing:
+        # add(), а не set(): не перетираємо версію, яку щойно збільшив purge
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def purge(*tags):
+    """Скидає всі сторінки з будь-яким із тегів (після коміту транзакції)."""
+    def bump():
+        for tag in tags:
+            try:
+                cache.incr(_tag_key(tag))
+            except ValueError:
+                cache.add(_tag_key(tag), 2, None)
+
+    transaction.on_commit(bump)
+
+
+# ===========================
+#   ДІРКИ
+# ===========================
+def render_hole(name, request):
+    renderer = import_string(settings.PAGE_CACHE_HOLES[name])
+    return mark_safe(f"<!--hole:{name}-->{renderer(request)}<!--/hole-->")
+
+
+def _punch(content):
+    content = HOLE_RE.sub(lambda match: f"<!--hole:{match.group(1)}--><!--/hole-->", content)
+    return CSRF_RE.sub(rf"\g<1>{CSRF_PLACEHOLDER}\g<2>", content)
+
+
+def _fill(content, request):
+    content = HOLE_RE.sub(lambda match: render_hole(match.group(1), request), content)
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    return content
+
+
+# ===========================
+#   СТОРІНКИ
+# ===========================
+def page_key(request):
+    query = "&".join(sorted(request.GET.urlencode().split("&")))
+    raw = f"{request.path}?{query}|{request.headers.get('HX-Request', '')}"
+    return f"{KEY_PREFIX}:page:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def _has_messages(request):
+    if request.COOKIES.get("messages"):
+        return True
+    return settings.SESSION_COOKIE_NAME in request.COOKIES and "_messages" in request.session
+
+
+def is_cacheable_request(request):
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not _has_messages(request)
+    )
+
+
+def _is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and "private" not in response.get("Cache-Control", "")
+        and "no-store" not in response.get("Cache-Control", "")
+    )
+
+
+def cache_anonymous_page(view, tags=()):
+    """
+    ``tags`` — шаблони тегів, що форматуються kwargs з URL:
+    ``cache_anonymous_page(view, tags=["product:{pk}"])``.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        page_tags = [tag.format(**kwargs) for tag in tags]
+        key = page_key(request)
+        entry = cache.get(key)
+        versions = tag_versions(page_tags)
+        if entry is not None and entry["tags"] == versions:
+            response = HttpResponse(_fill(entry["content"], request), content_type=entry["content_type"])
+            response["X-Page-Cache"] = "hit"
+            return response
+
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and callable(response.render):
+            response = response.render()
+        if _is_cacheable_response(response):
+            cache.set(key, {
+                "tags": versions,
+                "content": _punch(response.content.decode(response.charset)),
+                "content_type": response["Content-Type"],
+            }, TTL)
+            response["X-Page-Cache"] = "miss"
+        return response
+
+    return wrapper
@@ -0,0 +1,174 @@
+"""
+Облік SQL-запитів на HTTP-запит.
+
+``QueryBudgetMiddleware`` рахує запити кожного HTTP-запиту, шукає
+повторювані "форми" запитів (той самий SQL з різними параметрами — ознака
+N+1) і порівнює кількість з бюджетом, оголошеним на view:
+
+    class ProductListView(ListView):
+        query_budget = 9                      # або {'GET': 9, 'POST': 12}
+
+Результат додається до відповіді (``response.query_log``,
+``response.query_budget``, заголовок ``X-Query-Count``) і пишеться в лог
+"query_budget"; з QUERY_BUDGET_STRICT перевищення бюджету — виняток.
+Тести (``marketplace_project.testing``) перевіряють ті самі дані.
+
+Middleware працює і під WSGI, і під ASGI без переходу між потоками: під
+ASGI запити до БД виконуються в потоках sync_to_async, тож активні логи
+передаються через ContextVar (її копіює sync_to_async), а обгортка
+ставиться на з'єднання потоку один раз — у request_started, який Django
+і так виконує в потоці view (close_old_connections).
+"""
+import functools
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+
+logger = logging.getLogger("query_budget")
+
+# скільки однакових за формою запитів уже вважати N+1
+REPEAT_THRESHOLD = 3
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\?|%s)(?:, (?:\?|%s))*\)", re.I)
+# atomic() усередині іншої транзакції (тести, бенчмарк) дає SAVEPOINT/RELEASE —
+# це керування транзакцією, а не запити до даних, тож вони не рахуються
+TRANSACTION_RE = re.compile(r"\s*(SAVEPOINT|RELEASE|ROLLBACK|BEGIN|COMMIT)\b", re.I)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def shape(sql):
+    """SQL без конкретних значень: ``... WHERE id = 5`` -> ``... WHERE id = ?``."""
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    return _IN_LIST_RE.sub("IN (...)", sql)
+
+
+class QueryLog:
+    """execute_wrapper, що складає (sql, тривалість) виконаних запитів (без TRANSACTION_RE)."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if TRANSACTION_RE.match(sql):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """[(форма, скільки разів), ...] для форм, що повторились >= threshold."""
+        counts = Counter(shape(sql) for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count >= threshold]
+
+    def describe(self):
+        return "\n".join(f"{index}. {sql}" for index, (sql, _) in enumerate(self.queries, 1))
+
+
+_active_logs = ContextVar("query_budget_logs", default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    """Постійна обгортка з'єднання: передає запит усім активним логам."""
+    for log in _active_logs.get():
+        execute = functools.partial(log, execute)
+    return execute(sql, params, many, context)
+
+
+def install(**kwargs):
+    """Ставить _dispatch на з'єднання поточного потоку (раз на з'єднання)."""
+    for connection in connections.all():
+        if _dispatch not in connection.execute_wrappers:
+            connection.execute_wrappers.append(_dispatch)
+
+
+@contextmanager
+def recording(log):
+    """Контекст, у якому всі з'єднання БД пишуть запити в ``log``."""
+    install()
+    token = _active_logs.set((*_active_logs.get(), log))
+    try:
+        yield log
+    finally:
+        _active_logs.reset(token)
+
+
+def budget_for(view_func, method):
+    budget = getattr(view_func, "query_budget", None)
+    if budget is None:
+        budget = getattr(getattr(view_func, "view_class", None), "query_budget", None)
+    if isinstance(budget, dict):
+        budget = budget.get(method)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_BUDGET_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        request_started.connect(install, dispatch_uid="query_budget.install")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        log = QueryLog()
+        with recording(log):
+            response = self.get_response(request)
+        return self.report(request, response, log)
+
+    async def __acall__(self, request):
+        log = QueryLog()
+        with recording(log):
+            response = await self.get_response(request)
+        return self.report(request, response, log)
+
+    def report(self, request, response, log):
+        # бюджет — з view, яку знайшов резолвер (process_view під ASGI
+        # довелося б загортати в sync_to_async)
+        match = getattr(request, "resolver_match", None)
+        budget = budget_for(match.func, request.method) if match else None
+        response.query_log = log
+        response.query_budget = budget
+        response["X-Query-Count"] = str(len(log))
+
+        repeated = log.repeated()
+        if repeated:
+            logger.warning(
+                "%s %s: repeated queries (N+1?)\n%s", request.method, request.path,
+                "\n".join(f"  {count}x {sql}" for sql, count in repeated),
+            )
+        if budget is not None and len(log) > budget:
+            message = f"{request.method} {request.path}: {len(log)} queries, budget {budget}"
+            if getattr(settings, "QUERY_BUDGET_STRICT", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -19,9 +19,33 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # IMMEDIATE: транзакція одразу бере блокування запису і чекає
+        # (timeout) замість "database is locked" при одночасному checkout
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
+# Спільний кеш для всіх воркерів (сторінки каталогу, фрагменти, AI-відповіді).
+# Без REDIS_URL (потрібен пакет redis) — кеш у пам'яті процесу: годиться для
+# розробки, але тоді purge кешу сторінок не бачать інші воркери.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "OPTIONS": {"MAX_ENTRIES": 10_000},
+        }
+    }
+
 INSTALLED_APPS = [
     "django.contrib.admin",
     "django.contrib.auth",
@@ -39,6 +63,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # облік SQL-запитів і бюджети view (вмикається QUERY_BUDGET_ENABLED)
+    "marketplace_project.query_budget.QueryBudgetMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -123,4 +149,38 @@ ORDER_NOTIFICATION_EMAIL = os.environ.get("ORDER_NOTIFICATION_EMAIL", EMAIL_HOST
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 
-a = ()
\ No newline at end of file
+# Каталог: keyset-пагінація з токеном "after" замість ?page=N + COUNT(*)
+CATALOG_CURSOR_PAGINATION = os.environ.get("CATALOG_CURSOR_PAGINATION") == "1"
+
+# Скільки секунд кошик тримає резерв складу
+CART_RESERVATION_TTL = 30 * 60
+
+# Індекс схожих товарів для AI-консультанта (build_retrieval_index)
+RETRIEVAL_INDEX_DIR = BASE_DIR / "var" / "retrieval"
+# Кількість вимірів хешованих ознак: менше — більше колізій, розмір файлів від цього не залежить
+RETRIEVAL_DIM = 2 ** 18
+
+# Латентність зовнішніх інтеграцій (marketplace_project.outbound)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {
+        "outbound": {"handlers": ["console"], "level": os.environ.get("OUTBOUND_LOG_LEVEL", "INFO")},
+        "query_budget": {"handlers": ["console"], "level": "WARNING"},
+    },
+}
+
+a = ()
+
+# Кеш сторінок каталогу для анонімів (marketplace_project.page_cache)
+PAGE_CACHE_TTL = 10 * 60
+# "дірки" в кешованих сторінках: назва -> функція(request), що рендерить HTML
+PAGE_CACHE_HOLES = {
+    "cart_badge": "orders.cart.render_cart_badge",
+}
+
+# Облік SQL-запитів на запит і бюджети view (marketplace_project.query_budget);
+# STRICT — перевищення бюджету стає помилкою, а не попередженням у лозі
+QUERY_BUDGET_ENABLED = os.environ.get("QUERY_BUDGET", "1" if DEBUG else "0") == "1"
+QUERY_BUDGET_STRICT = os.environ.get("QUERY_BUDGET_STRICT") == "1"
@@ -0,0 +1,189 @@
+"""
+Контентно-адресоване сховище для завантажених зображень.
+
+Ім'я файлу — SHA-256 його вмісту, розкладене по підкаталогах за префіксом
+хешу: ``products/ab/cd/abcd…ef.jpg``. Однакові завантаження лягають в
+один файл (замість ``IMG_1.jpg``, ``IMG_1_Rqyhhxe.jpg``, …), а вміст за
+таким URL ніколи не змінюється, тож його можна кешувати назавжди
+(``Cache-Control: public, max-age=31536000, immutable``), наприклад у nginx:
+``location ~ "^/media/.+/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\\."``.
+
+Файл спільний для всіх рядків, що на нього посилаються, тому видаляти його
+можна лише коли посилань не лишилось. Лічильник посилань — це запит по
+полях із ``REFERENCES`` (на них є індекс); ``track`` підключає до моделі
+сигнали, які після коміту прибирають старий файл при заміні чи видаленні.
+Похідні (мініатюри з ``images``, ``<хеш>.w320.webp``) видаляються разом
+з оригіналом.
+
+``save`` і ``collect`` одного хешу виконуються під блокуванням між
+процесами. Повторне завантаження наявного вмісту оновлює mtime файлу, а
+``collect`` не чіпає файли, новіші за ``COLLECT_GRACE``: рядок, що
+посилатиметься на файл, може бути ще не закомічений, і лічильник його не
+бачить. Такі файли, якщо вони справді осиротіли, прибирає
+``dedupe_media --gc``.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: лише для розробки, без блокувань між процесами
+    fcntl = None
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+# (модель, поле), чиї файли лежать у цьому сховищі
+REFERENCES = (
+    ("products.Product", "image"),
+    ("users.CustomUser", "avatar"),
+)
+
+HASHED_NAME_RE = re.compile(r"(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.[a-z0-9]+$")
+DERIVATIVE_RE = re.compile(r"\.w\d+\.[a-z0-9]+$")
+COLLECT_GRACE = 10 * 60
+LOCKS_DIR = ".locks"
+
+
+def is_hashed(name):
+    return bool(name and HASHED_NAME_RE.search(name))
+
+
+def reference_count(name):
+    return sum(
+        apps.get_model(label).objects.filter(**{field: name}).count()
+        for label, field in REFERENCES
+    )
+
+
+def referenced_names():
+    names = set()
+    for label, field in REFERENCES:
+        names.update(
+            apps.get_model(label).objects.exclude(**{field: ""})
+            .exclude(**{f"{field}__isnull": True}).values_list(field, flat=True)
+        )
+    return names
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        """``products/photo.JPG`` + вміст -> ``products/ab/cd/<sha256>.jpg``."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), hexdigest[:2], hexdigest[2:4], hexdigest + ext
+        )
+
+    @contextmanager
+    def locked(self, name):
+        """Ексклюзивне блокування хешу (flock; файл-замок на перші два символи)."""
+        if fcntl is None:
+            yield
+            return
+        directory = self.path(LOCKS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, posixpath.basename(name)[:2]), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        with self.locked(name):
+            if self.exists(name):
+                # такий вміст уже є — ще одне посилання; свіжий mtime береже
+                # файл від collect, поки рядок з посиланням не закомічений
+                os.utime(self.path(name))
+                return name
+            return super().save(name, content, max_length=max_length)
+
+    def save_exact(self, name, content, max_length=None):
+        """Запис під заданим ім'ям, без хешування (похідні зображення)."""
+        return super().save(name, content, max_length=max_length)
+
+    def derivatives(self, name):
+        directory, filename = posixpath.split(name)
+        prefix = os.path.splitext(filename)[0] + ".w"
+        try:
+            _, files = self.listdir(directory)
+        except FileNotFoundError:
+            return []
+        return [
+            posixpath.join(directory, item) for item in files
+            if item.startswith(prefix) and DERIVATIVE_RE.search(item)
+        ]
+
+    def collect(self, name):
+        """Видаляє файл і його похідні, якщо на нього більше ніхто не посилається."""
+        if not name:
+            return False
+        with self.locked(name):
+            try:
+                if time.time() - os.path.getmtime(self.path(name)) < COLLECT_GRACE:
+                    return False
+            except FileNotFoundError:
+                pass
+            if reference_count(name):
+                return False
+            for target in [name, *self.derivatives(name)]:
+                try:
+                    self.delete(target)
+                except OSError:
+                    pass
+        return True
+
+
+content_storage = ContentAddressedStorage()
+
+
+def _collect_on_commit(storage, name):
+    if name and hasattr(storage, "collect"):
+        transaction.on_commit(lambda: storage.collect(name))
+
+
+def track(model, field):
+    """Прибирання осиротілих файлів поля ``field`` при заміні і видаленні."""
+    stored = f"_{field}_stored"
+
+    def remember(sender, instance, **kwargs):
+        # сире значення з БД; відкладене поле (.only/.defer) не чіпаємо
+        value = instance.__dict__.get(field)
+        instance.__dict__[stored] = getattr(value, "name", value)
+
+    def replaced(sender, instance, raw=False, update_fields=None, **kwargs):
+        if raw or field not in instance.__dict__:
+            return
+        if update_fields is not None and field not in update_fields:
+            return
+        file = getattr(instance, field)
+        old = instance.__dict__.get(stored)
+        instance.__dict__[stored] = file.name
+        if old and old != file.name:
+            _collect_on_commit(file.storage, old)
+
+    def deleted(sender, instance, **kwargs):
+        file = getattr(instance, field)
+        _collect_on_commit(file.storage, file.name)
+
+    uid = f"storage:{model._meta.label}.{field}"
+    post_init.connect(remember, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(replaced, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=uid)
@@ -0,0 +1,97 @@
+"""
+Тести бюджетів SQL-запитів (див. marketplace_project.query_budget).
+
+``QueryBudgetTestCase`` створює невеликий магазин — кілька продавців,
+товари з відгуками, замовлення — з кількістю рядків більшою за
+REPEAT_THRESHOLD, щоб N+1 проявлявся як повторювані запити. Перевірка
+``assertWithinBudget`` бере бюджет, оголошений на view (``query_budget``),
+і падає зі списком запитів, якщо їх більше або якщо є повтори однакової
+форми. QUERY_BUDGET_STRICT увімкнено, тож перевищення валить і ті запити
+тесту, які assertWithinBudget не перевіряє.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .query_budget import REPEAT_THRESHOLD
+
+
+@override_settings(
+    QUERY_BUDGET_ENABLED=True,
+    QUERY_BUDGET_STRICT=True,
+    LANGUAGE_CODE="uk",
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class QueryBudgetTestCase(TestCase):
+    # скільки рядків кожного виду: більше за поріг повторів
+    ROWS = REPEAT_THRESHOLD + 2
+
+    @classmethod
+    def setUpTestData(cls):
+        from orders.models import Order, OrderItem
+        from products.models import Category, Product, SellerReview, SubCategory
+        from reviews.models import Review
+        from users.models import CustomUser
+
+        cls.password = "budget-pass-123"
+        cls.seller = CustomUser.objects.create_user(
+            "seller", password=cls.password, is_seller=True, store_name="Shop"
+        )
+        cls.buyer = CustomUser.objects.create_user("buyer", password=cls.password)
+        reviewers = [
+            CustomUser.objects.create_user(f"reviewer{i}", password=cls.password)
+            for i in range(cls.ROWS)
+        ]
+        cls.category = Category.objects.create(name="Догляд")
+        cls.subcategory = SubCategory.objects.create(category=cls.category, name="Шампуні")
+
+        cls.products = []
+        for i in range(cls.ROWS * 3):
+            seller = cls.seller if i % 2 == 0 else reviewers[i % cls.ROWS]
+            cls.products.append(Product.objects.create(
+                seller=seller, title=f"Шампунь {i}", description="Шампунь для волосся",
+                price=Decimal("10.00") + i, stock=50,
+                category=cls.category, subcategory=cls.subcategory,
+            ))
+        cls.product = cls.products[0]
+        for product in cls.products[:2]:
+            for reviewer in reviewers:
+                Review.objects.create(product=product, reviewer=reviewer, rating=4, comment="Добре")
+        for reviewer in reviewers:
+            SellerReview.objects.create(seller=cls.seller, reviewer=reviewer, rating=5, comment="Ок")
+
+        cls.order = Order.objects.create(buyer=cls.buyer, total_price=Decimal("100.00"))
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=cls.order, product=product, quantity=1,
+                unit_price=product.price, line_total=product.price,
+            )
+            for product in cls.products[:cls.ROWS]
+        ])
+
+    def setUp(self):
+        # кеш сторінок і фрагментів інакше ховав би справжню кількість запитів
+        cache.clear()
+
+    def login(self, user):
+        self.client.force_login(user)
+
+    def assertWithinBudget(self, response, status=200):
+        self.assertEqual(response.status_code, status)
+        log = getattr(response, "query_log", None)
+        self.assertIsNotNone(log, "QueryBudgetMiddleware не підключений")
+        budget = response.query_budget
+        # AsyncClient кладе запит у asgi_request
+        request = getattr(response, "wsgi_request", None) or response.asgi_request
+        self.assertIsNotNone(budget, f"view для {request.path} не оголошує query_budget")
+        self.assertLessEqual(
+            len(log), budget,
+            f"{len(log)} запитів при бюджеті {budget}:\n{log.describe()}",
+        )
+        repeated = log.repeated()
+        self.assertEqual(
+            repeated, [],
+            "повторювані запити (N+1):\n" + "\n".join(f"{n}x {sql}" for sql, n in repeated),
+        )
+        return log
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+import requests
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from products.models import Product
+from users.models import CustomUser
+
+from .outbound import (
+    AsyncOutboundClient, CircuitBreaker, OutboundClient, Upstream, UpstreamMetrics, UpstreamUnavailable,
+)
+from .storage import COLLECT_GRACE, ContentAddressedStorage
+
+
+def half_open(breaker):
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.cooldown
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_closes_after_successful_probe(self):
+        outbound = OutboundClient(Upstream('test', 'http://upstream.test', retries=0, failure_threshold=2))
+        with mock.patch.object(outbound.session, 'request', side_effect=requests.ConnectionError) as request:
+            for _ in range(2):
+                with self.assertRaises(requests.ConnectionError):
+                    outbound.get('/')
+            # розімкнений: upstream навіть не питаємо
+            with self.assertRaises(UpstreamUnavailable):
+                outbound.get('/')
+            self.assertEqual(request.call_count, 2)
+
+            half_open(outbound.breaker)
+            with self.assertRaises(requests.ConnectionError):
+                outbound.get('/')
+            # невдала проба розмикає знову, без нових двох помилок
+            self.assertEqual(outbound.breaker.state, 'open')
+
+        half_open(outbound.breaker)
+        with mock.patch.object(outbound.session, 'request', return_value=mock.Mock(status_code=200)):
+            self.assertEqual(outbound.get('/').status_code, 200)
+        self.assertEqual((outbound.breaker.state, outbound.breaker.failures), ('closed', 0))
+
+    def test_probe_released_when_request_raises_unexpectedly(self):
+        outbound = OutboundClient(Upstream('test', 'http://upstream.test', retries=0))
+        half_open(outbound.breaker)
+        with mock.patch.object(outbound.session, 'request', side_effect=ValueError('bad header')):
+            with self.assertRaises(ValueError):
+                outbound.get('/')
+        self.assertFalse(outbound.breaker.probing)
+        self.assertTrue(outbound.breaker.allow())
+
+    def test_probe_released_when_stream_cancelled(self):
+        upstream = Upstream('test', 'http://upstream.test', retries=0)
+        breaker = CircuitBreaker(upstream.failure_threshold, upstream.cooldown)
+        half_open(breaker)
+
+        async def cancelled_stream():
+            outbound = AsyncOutboundClient(upstream, breaker, UpstreamMetrics())
+            with mock.patch.object(outbound.http, 'send', side_effect=asyncio.CancelledError):
+                async with outbound.stream('POST', '/'):
+                    pass
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancelled_stream())
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.allow())
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        self.storage = ContentAddressedStorage(location=location)
+
+    def age(self, name, seconds=COLLECT_GRACE + 1):
+        past = time.time() - seconds
+        os.utime(self.storage.path(name), (past, past))
+
+    def test_collect_removes_unreferenced_file_with_derivatives(self):
+        name = self.storage.save('products/a.jpg', ContentFile(b'photo'))
+        derivative = self.storage.save_exact(name[:-len('.jpg')] + '.w320.webp', ContentFile(b'thumb'))
+        self.age(name)
+        self.assertTrue(self.storage.collect(name))
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(self.storage.exists(derivative))
+
+    def test_reupload_protects_file_until_reference_is_committed(self):
+        name = self.storage.save('products/a.jpg', ContentFile(b'photo'))
+        self.age(name)
+        # той самий вміст завантажили знову, а рядок з посиланням ще не закомічений
+        self.assertEqual(self.storage.save('products/b.jpg', ContentFile(b'photo')), name)
+        self.assertFalse(self.storage.collect(name))
+        self.assertTrue(self.storage.exists(name))
+
+    def test_shared_file_survives_until_last_reference_is_deleted(self):
+        seller = CustomUser.objects.create_user('seller', is_seller=True)
+        with override_settings(MEDIA_ROOT=self.storage.location):
+            first, second = (
+                Product.objects.create(
+                    seller=seller, title=title, description='', price=1, stock=1,
+                    image=ContentFile(b'photo', name=f'{title}.jpg'),
+                )
+                for title in ('a', 'b')
+            )
+            name = first.image.name
+            self.assertEqual(second.image.name, name)
+            self.age(name)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+            self.assertTrue(self.storage.exists(name))
+            with self.captureOnCommitCallbacks(execute=True):
+                second.delete()
+            self.assertFalse(self.storage.exists(name))
@@ -4,9 +4,16 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.conf.urls.i18n import i18n_patterns
 from django.shortcuts import redirect
+from django.http import JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+
+from . import outbound
 
 urlpatterns = [
     path("i18n/", include("django.conf.urls.i18n")),
+    # метрики зовнішніх інтеграцій поточного процесу
+    path("outbound-metrics/", staff_member_required(lambda request: JsonResponse(outbound.metrics())),
+         name="outbound-metrics"),
 ]
 
 urlpatterns += i18n_patterns(
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from . import export
+from .models import Cart, CartLine, Notification, Order, OrderItem, RollupWatermark
 
 
 class OrderItemInline(admin.TabularInline):
@@ -12,3 +15,43 @@ class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'buyer', 'status', 'created_at')
     list_filter = ('status',)
     inlines = [OrderItemInline]
+    actions = ['export_csv']
+
+    @admin.action(description='Експортувати в CSV')
+    def export_csv(self, request, queryset):
+        orders = export.export_queryset().filter(pk__in=queryset.values('pk'))
+        response = StreamingHttpResponse(export.export_orders(orders), content_type=export.CONTENT_TYPES['csv'])
+        response['Content-Disposition'] = 'attachment; filename="orders.csv"'
+        return response
+
+
+class CartLineInline(admin.TabularInline):
+    model = CartLine
+    extra = 0
+    raw_id_fields = ('product',)
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'created_at', 'updated_at')
+    raw_id_fields = ('user',)
+    inlines = [CartLineInline]
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'order', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'channel')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry']
+
+    @admin.action(description='Повторити доставку')
+    def retry(self, request, queryset):
+        queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_order_id', 'refreshed_at')
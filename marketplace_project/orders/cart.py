@@ -0,0 +1,216 @@
+"""
+Кошик: таблиці Cart/CartLine і перетворення {product_id: quantity} на
+позиції з цінами.
+
+Кошик анонімного покупця знаходиться за ключем у підписаній cookie,
+залогіненого — за користувачем; при вході анонімний кошик зливається з
+кошиком користувача (сигнал user_logged_in). Кожна зміна — атомарний
+UPDATE одного рядка CartLine, без перезапису сесії.
+
+Весь кошик розв'язується одним запитом (in_bulk). Видалені або недоступні
+товари просто випадають з кошика, а не ламають сторінку 404-кою.
+"""
+import uuid
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from products.models import Product
+from .models import Cart, StockReservation
+from . import inventory
+
+CART_COOKIE = 'cart'
+CART_COOKIE_SALT = 'orders.cart'
+CART_COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+
+
+@dataclass
+class CartLine:
+    product: Product
+    quantity: int
+
+    @property
+    def unit_price(self) -> Decimal:
+        return self.product.price
+
+    @property
+    def subtotal(self) -> Decimal:
+        return self.product.price * self.quantity
+
+
+@dataclass
+class ResolvedCart:
+    lines: list[CartLine] = field(default_factory=list)
+    dropped: list[str] = field(default_factory=list)
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    @property
+    def total(self) -> Decimal:
+        return sum((line.subtotal for line in self.lines), Decimal('0'))
+
+
+def resolve_cart(cart: dict, cart_key: str | None = None) -> ResolvedCart:
+    resolved = ResolvedCart()
+    quantities = {}
+    for key, quantity in cart.items():
+        try:
+            quantities[int(key)] = int(quantity)
+        except (TypeError, ValueError):
+            resolved.dropped.append(key)
+
+    # товар, останні одиниці якого притримав цей кошик, для нього доступний
+    visible = Q(available=True)
+    if cart_key:
+        visible |= Q(pk__in=StockReservation.objects.filter(
+            cart_key=cart_key).values('product_id'))
+    products = Product.objects.filter(visible).in_bulk(list(quantities))
+
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or quantity < 1:
+            resolved.dropped.append(str(product_id))
+            continue
+        resolved.lines.append(CartLine(product=product, quantity=quantity))
+
+    return resolved
+
+
+# ===========================
+#   СХОВИЩЕ КОШИКА
+# ===========================
+def _cart_queryset(request):
+    if request.user.is_authenticated:
+        return Cart.objects.filter(user=request.user)
+    key = request.get_signed_cookie(CART_COOKIE, default=None, salt=CART_COOKIE_SALT)
+    if key is None:
+        return None
+    return Cart.objects.filter(key=key, user__isnull=True)
+
+
+def get_cart(request, create=False) -> Cart | None:
+    """Кошик запиту (один запит, результат кешується на request)."""
+    cart = getattr(request, '_cart', None)
+    if cart is None and create and request.user.is_authenticated:
+        # get_or_create сам шукає кошик — окремий SELECT перед ним зайвий
+        cart, _ = Cart.objects.get_or_create(user=request.user, defaults={'key': uuid.uuid4().hex})
+    elif cart is None:
+        carts = _cart_queryset(request)
+        cart = carts.first() if carts is not None else None
+        if cart is None and create:
+            cart = Cart.objects.create(key=uuid.uuid4().hex)
+    request._cart = cart
+    return cart
+
+
+def remember_cart(request, response):
+    """Ставить cookie з ключем анонімного кошика, якщо його щойно створено."""
+    cart = getattr(request, '_cart', None)
+    if cart is not None and cart.user_id is None:
+        key = request.get_signed_cookie(CART_COOKIE, default=None, salt=CART_COOKIE_SALT)
+        if key != cart.key:
+            response.set_signed_cookie(
+                CART_COOKIE, cart.key, salt=CART_COOKIE_SALT,
+                max_age=CART_COOKIE_MAX_AGE, httponly=True, samesite='Lax',
+            )
+    return response
+
+
+def add_line(cart: Cart, product_id: int, quantity: int = 1) -> None:
+    """Атомарне +quantity: дві вкладки не перетирають одна одну."""
+    with transaction.atomic():
+        updated = cart.lines.filter(product_id=product_id).update(
+            quantity=F('quantity') + quantity
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    cart.lines.create(product_id=product_id, quantity=quantity)
+            except IntegrityError:
+                # рядок щойно створив паралельний запит
+                cart.lines.filter(product_id=product_id).update(
+                    quantity=F('quantity') + quantity
+                )
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+
+
+def remove_line(cart: Cart, product_id: int) -> bool:
+    deleted, _ = cart.lines.filter(product_id=product_id).delete()
+    return bool(deleted)
+
+
+def clear(cart: Cart) -> None:
+    cart.lines.all().delete()
+
+
+def merge_carts(source: Cart, user) -> Cart:
+    """
+    Анонімний кошик після входу: стає кошиком користувача або доливається
+    в нього. Позиції і резерви переносяться сталою кількістю запитів —
+    вхід не дорожчає з розміром кошика.
+    """
+    target = Cart.objects.filter(user=user).first()
+    if target is None:
+        source.user = user
+        source.save(update_fields=['user', 'updated_at'])
+        return source
+    lines = source.lines.all()
+    with transaction.atomic():
+        target.lines.filter(product_id__in=lines.values('product_id')).update(
+            quantity=F('quantity') + Subquery(
+                lines.filter(product_id=OuterRef('product_id')).values('quantity')[:1]
+            )
+        )
+        lines.filter(product_id__in=target.lines.values('product_id')).delete()
+        lines.update(cart=target)
+        Cart.objects.filter(pk=target.pk).update(updated_at=timezone.now())
+        inventory.merge(source.key, target.key)
+        source.delete()
+    return target
+
+
+def resolve_request_cart(request) -> tuple[Cart | None, ResolvedCart]:
+    """Розв'язує кошик запиту та прибирає з нього позиції, що випали."""
+    cart = get_cart(request)
+    if cart is None:
+        return None, ResolvedCart()
+    quantities = {
+        str(product_id): quantity
+        for product_id, quantity in cart.lines.values_list('product_id', 'quantity')
+    }
+    resolved = resolve_cart(quantities, cart.key)
+    if resolved.dropped:
+        cart.lines.filter(product_id__in=resolved.dropped).delete()
+    # лічильнику в навбарі не потрібен окремий SUM — позиції вже прочитані
+    request._cart_size = sum(line.quantity for line in resolved)
+    return cart, resolved
+
+
+def cart_size(request) -> int:
+    """Кількість одиниць у кошику — один запит SUM, без сесії."""
+    size = getattr(request, '_cart_size', None)
+    if size is not None:
+        return size
+    cart = getattr(request, '_cart', None)
+    if cart is not None:
+        return cart.lines.aggregate(total=Sum('quantity'))['total'] or 0
+    carts = _cart_queryset(request)
+    if carts is None:
+        return 0
+    return carts.aggregate(total=Sum('lines__quantity'))['total'] or 0
+
+
+def render_cart_badge(request, oob=False) -> str:
+    """Лічильник у навбарі; "дірка" cart_badge кешу сторінок."""
+    return render_to_string('orders/partials/cart_badge.html', {'count': cart_size(request), 'oob': oob})
@@ -0,0 +1,40 @@
+"""
+Оформлення замовлення: списання складу, замовлення, позиції і
+сповіщення в outbox — в одній транзакції, з повтором при конфлікті
+блокувань.
+"""
+from django.db import transaction
+
+from . import inventory
+from .models import OrderItem
+from .notifications import enqueue_order_notifications
+
+
+def place_order(order, cart, cart_key):
+    """
+    Зберігає ``order`` (ще не збережений) з позиціями кошика.
+    Повертає створені OrderItem; кидає inventory.OutOfStock.
+    """
+    def attempt():
+        # після відкату попередньої спроби об'єкт знову новий
+        order.pk = None
+        order._state.adding = True
+        with transaction.atomic():
+            inventory.commit(
+                cart_key, [(line.product.pk, line.quantity) for line in cart]
+            )
+            order.save()
+            items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=line.product,
+                    quantity=line.quantity,
+                    unit_price=line.unit_price,
+                    line_total=line.subtotal,
+                )
+                for line in cart
+            ])
+            enqueue_order_notifications(order, items)
+            return items
+
+    return inventory.with_retry(attempt)
@@ -0,0 +1,133 @@
+"""
+Потоковий експорт замовлень (CSV / JSONL) для звірки.
+
+Замовлення читаються ``.iterator(chunk_size=...)`` у порядку pk, а позиції
+з товарами й продавцями — ``prefetch_related`` для кожної пачки окремо,
+тож у пам'яті одночасно лише одна пачка, хоч у вибірці 100 замовлень,
+хоч 10 мільйонів. Генератор віддає текст частинами для
+``StreamingHttpResponse``.
+
+Для продавця у вибірку потрапляють лише замовлення з його товарами, і в
+кожному — лише його позиції (чужі покупки в тому ж замовленні не видно);
+``order_total`` — сума саме цих позицій.
+
+У CSV текст, що починається з ``= + - @``, екранується апострофом —
+інакше Excel виконав би ім'я чи місто покупця як формулу.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import Prefetch, Q, Sum
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+CHUNK_SIZE = 1000
+
+# з цих символів Excel / LibreOffice починають формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# CSV: рядок на позицію замовлення
+CSV_COLUMNS = [
+    'order_id', 'created_at', 'status', 'buyer', 'full_name', 'phone', 'city',
+    'delivery_method', 'payment_method', 'order_total',
+    'product_id', 'sku', 'product', 'seller', 'quantity', 'unit_price', 'line_total',
+]
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_queryset(date_from=None, date_to=None, status=None, seller=None):
+    """Замовлення для експорту; ``date_to`` включно (у поточному часовому поясі)."""
+    orders = Order.objects.select_related('buyer').order_by('pk')
+    items = OrderItem.objects.select_related('product__seller').order_by('pk')
+    if date_from:
+        orders = orders.filter(created_at__gte=_day_start(date_from))
+    if date_to:
+        orders = orders.filter(created_at__lt=_day_start(date_to + timedelta(days=1)))
+    if status:
+        orders = orders.filter(status=status)
+    if seller is not None:
+        items = items.filter(product__seller=seller)
+        orders = orders.filter(
+            pk__in=OrderItem.objects.filter(product__seller=seller).values('order_id')
+        ).annotate(seller_total=Sum('items__line_total', filter=Q(items__product__seller=seller)))
+    return orders.prefetch_related(Prefetch('items', queryset=items))
+
+
+def _order_fields(order):
+    return {
+        'order_id': order.pk,
+        'created_at': timezone.localtime(order.created_at).isoformat(),
+        'status': order.status,
+        'buyer': order.buyer.username,
+        'full_name': order.full_name or '',
+        'phone': order.phone or '',
+        'city': order.city or '',
+        'delivery_method': order.delivery_method or '',
+        'payment_method': order.payment_method or '',
+        # продавцю — лише його частина замовлення
+        'order_total': f"{getattr(order, 'seller_total', order.total_price):.2f}",
+    }
+
+
+def _item_fields(item):
+    product = item.product
+    return {
+        'product_id': product.pk,
+        'sku': product.sku,
+        'product': product.title,
+        'seller': product.seller.username,
+        'quantity': item.quantity,
+        'unit_price': str(item.unit_price),
+        'line_total': str(item.line_total),
+    }
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _csv_safe(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_lines(order):
+    fields = _order_fields(order)
+    for item in order.items.all():
+        yield {key: _csv_safe(value) for key, value in {**fields, **_item_fields(item)}.items()}
+
+
+def export_orders(queryset, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Генератор частин файлу; кожна частина — одна пачка замовлень."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(_Echo(), fieldnames=CSV_COLUMNS)
+        # BOM — щоб Excel відкрив кирилицю як UTF-8
+        yield '\ufeff' + writer.writeheader()
+
+        def encode(order):
+            return ''.join(writer.writerow(line) for line in _csv_lines(order))
+    else:
+        def encode(order):
+            record = _order_fields(order)
+            record['items'] = [_item_fields(item) for item in order.items.all()]
+            return json.dumps(record, ensure_ascii=False) + '\n'
+
+    chunk = []
+    for order in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(encode(order))
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
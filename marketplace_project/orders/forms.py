@@ -87,3 +87,19 @@ class OrderCreateForm(forms.ModelForm):
                 self.add_error("card_cvv", "Некоректний CVV.")
 
         return cleaned_data
+
+
+class OrderExportForm(forms.Form):
+    """Фільтри експорту замовлень (GET-параметри)."""
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    status = forms.ChoiceField(choices=[("", "")] + list(Order.STATUS_CHOICES), required=False)
+    seller = forms.IntegerField(required=False, min_value=1)
+    format = forms.ChoiceField(choices=[("csv", "CSV"), ("jsonl", "JSONL")], required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get("date_from"), cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("Початкова дата пізніша за кінцеву.")
+        return cleaned_data
@@ -0,0 +1,212 @@
+"""
+Резервування залишків.
+
+Склад списується лише умовним UPDATE ("stock >= n"), тож два покупці не
+можуть забрати одну й ту саму останню одиницю незалежно від бекенду БД.
+Додавання в кошик притримує одиниці (StockReservation) на
+CART_RESERVATION_TTL; прострочені резерви повертає на склад
+``release_expired`` (команда release_expired_reservations).
+
+Повернення на склад робиться лише тоді, коли DELETE резерву справді
+видалив рядок — так оформлення і прибирання не повернуть ту саму
+одиницю двічі.
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from products.models import Product
+from .models import StockReservation
+
+RETRY_ATTEMPTS = 8
+RETRY_BASE_DELAY = 0.05
+
+
+class OutOfStock(Exception):
+    def __init__(self, products):
+        self.products = list(products)
+        titles = ", ".join(str(product) for product in self.products)
+        super().__init__(f"Недостатньо на складі: {titles}")
+
+
+def reservation_ttl() -> timedelta:
+    return timedelta(seconds=getattr(settings, "CART_RESERVATION_TTL", 30 * 60))
+
+
+def with_retry(func, attempts=RETRY_ATTEMPTS):
+    """
+    Повторює транзакцію при конфлікті блокувань (SQLite "database is locked",
+    deadlock / serialization failure у PostgreSQL) з експоненційною
+    затримкою і jitter, щоб конкуренти не стукали одночасно.
+    """
+    for attempt in range(attempts):
+        try:
+            return func()
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _take(product_id: int, quantity: int) -> bool:
+    return bool(
+        Product.objects.filter(pk=product_id, stock__gte=quantity).update(
+            stock=F("stock") - quantity,
+            available=Case(
+                When(stock__gt=quantity, then=Value(True)), default=Value(False)
+            ),
+        )
+    )
+
+
+def _give_back(product_id: int, quantity: int) -> None:
+    if quantity > 0:
+        Product.objects.filter(pk=product_id).update(
+            stock=F("stock") + quantity, available=True
+        )
+
+
+def adjust(product_id: int, delta: int) -> None:
+    """
+    Ручна зміна залишку продавцем (прихід / списання) як приріст: резерви
+    і продажі, що сталися, поки він редагував, не перезаписуються.
+    Списати більше за вільний залишок не можна — він стає нулем.
+    """
+    if delta:
+        Product.objects.filter(pk=product_id).update(
+            stock=Greatest(F("stock") + delta, 0),
+            available=Case(When(stock__gt=-delta, then=Value(True)), default=Value(False)),
+        )
+
+
+def _drop(reservation) -> bool:
+    deleted, _ = StockReservation.objects.filter(pk=reservation.pk).delete()
+    return bool(deleted)
+
+
+def reserve(cart_key: str, product_id: int, quantity: int = 1) -> None:
+    """Притримує ще ``quantity`` одиниць для кошика або кидає OutOfStock."""
+    expires_at = timezone.now() + reservation_ttl()
+
+    def attempt():
+        with transaction.atomic():
+            if not _take(product_id, quantity):
+                raise OutOfStock(Product.objects.filter(pk=product_id))
+            updated = StockReservation.objects.filter(
+                cart_key=cart_key, product_id=product_id
+            ).update(quantity=F("quantity") + quantity, expires_at=expires_at)
+            if not updated:
+                StockReservation.objects.create(
+                    cart_key=cart_key,
+                    product_id=product_id,
+                    quantity=quantity,
+                    expires_at=expires_at,
+                )
+
+    with_retry(attempt)
+
+
+def release(cart_key: str, product_id: int | None = None) -> None:
+    """Повертає на склад резерви кошика (або лише одного товару)."""
+    reservations = StockReservation.objects.filter(cart_key=cart_key)
+    if product_id is not None:
+        reservations = reservations.filter(product_id=product_id)
+
+    def attempt():
+        with transaction.atomic():
+            for reservation in reservations.order_by("product_id"):
+                if _drop(reservation):
+                    _give_back(reservation.product_id, reservation.quantity)
+
+    with_retry(attempt)
+
+
+def merge(source_key: str, target_key: str) -> None:
+    """
+    Переносить резерви одного кошика на інший (вхід користувача) трьома
+    запитами незалежно від кількості позицій: спільні товари доливаються
+    в резерви цілі, решта резервів переходить на неї одним UPDATE.
+    """
+    expires_at = timezone.now() + reservation_ttl()
+    source = StockReservation.objects.filter(cart_key=source_key)
+    target = StockReservation.objects.filter(cart_key=target_key)
+
+    def attempt():
+        with transaction.atomic():
+            target.filter(product_id__in=source.values("product_id")).update(
+                quantity=F("quantity") + Subquery(
+                    source.filter(product_id=OuterRef("product_id")).values("quantity")[:1]
+                ),
+                expires_at=expires_at,
+            )
+            source.filter(product_id__in=target.values("product_id")).delete()
+            source.update(cart_key=target_key, expires_at=expires_at)
+
+    with_retry(attempt)
+
+
+def touch(cart_key: str) -> None:
+    """Кошик активний — продовжуємо резерви."""
+    StockReservation.objects.filter(cart_key=cart_key).update(
+        expires_at=timezone.now() + reservation_ttl()
+    )
+
+
+def commit(cart_key: str, lines) -> None:
+    """
+    Оформлення: резерви кошика стають продажем, нестача докуповується
+    умовним UPDATE, надлишок повертається. Викликати всередині транзакції
+    замовлення — при OutOfStock вона відкотиться повністю.
+    """
+    wanted = {}
+    for product_id, quantity in lines:
+        wanted[product_id] = wanted.get(product_id, 0) + quantity
+
+    reservations = StockReservation.objects.filter(cart_key=cart_key)
+    held = dict(reservations.values_list("product_id", "quantity"))
+    deleted, _ = reservations.delete()
+    if deleted != len(held):
+        # резерв встиг забрати release_expired — перечитати все заново
+        raise OperationalError("stock reservations changed concurrently")
+
+    missing = []
+    # стабільний порядок блокувань рядків — без взаємних deadlock
+    for product_id in sorted(wanted.keys() | held.keys()):
+        shortfall = wanted.get(product_id, 0) - held.get(product_id, 0)
+        if shortfall > 0 and not _take(product_id, shortfall):
+            missing.append(product_id)
+        elif shortfall < 0:
+            _give_back(product_id, -shortfall)
+
+    if missing:
+        raise OutOfStock(Product.objects.filter(pk__in=missing))
+
+
+def release_expired(now=None, batch_size=500) -> int:
+    """Повертає на склад прострочені резерви покинутих кошиків."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        expired = list(
+            StockReservation.objects.filter(expires_at__lt=now)
+            .order_by("product_id")[:batch_size]
+        )
+        if not expired:
+            return released
+
+        def attempt():
+            count = 0
+            with transaction.atomic():
+                for reservation in expired:
+                    if _drop(reservation):
+                        _give_back(reservation.product_id, reservation.quantity)
+                        count += 1
+            return count
+
+        released += with_retry(attempt)
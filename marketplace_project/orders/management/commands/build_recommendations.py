@@ -0,0 +1,60 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from orders import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Будує \"купують разом\" з історії замовлень. За замовчуванням "
+        "дораховує лише нові замовлення від минулого запуску."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Перерахувати з нуля")
+        parser.add_argument("--metric", choices=("lift", "cosine"), default="lift")
+        parser.add_argument("--top", type=int, default=recommendations.TOP_N)
+        parser.add_argument("--min-support", type=int, default=recommendations.MIN_SUPPORT)
+        parser.add_argument("--chunk-orders", type=int, default=recommendations.ORDERS_PER_CHUNK)
+        parser.add_argument(
+            "--lag", type=int, default=int(recommendations.LAG.total_seconds()),
+            help="Не брати замовлення, молодші за стільки секунд",
+        )
+
+    def handle(self, *args, **options):
+        began = time.perf_counter()
+        full = options["full"]
+        state = recommendations.State() if full else recommendations.State.load()
+
+        def progress(state):
+            self.stdout.write(
+                f"  замовлень: {state.n_orders}, до id {state.last_order_id}"
+            )
+
+        touched = recommendations.consume_orders(
+            state, options["chunk_orders"], progress, timedelta(seconds=options["lag"])
+        )
+        # база lift'а застаріла — переписуємо оцінки всіх товарів
+        full = full or state.needs_rescore()
+        if not full and not len(touched):
+            self.stdout.write(self.style.SUCCESS("Нових замовлень немає"))
+            return
+
+        if full:
+            state.scored_n_orders = state.n_orders
+        edges = recommendations.top_neighbours(
+            *recommendations.score_pairs(
+                state, options["metric"], options["min_support"], state.scored_n_orders
+            ),
+            top_n=options["top"],
+        )
+        products = None if full else recommendations.affected_products(state, touched)
+        written = recommendations.write_neighbours(edges, products)
+        state.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Пар: {len(state.pairs.keys)}, записано сусідів: {written}, "
+            f"{time.perf_counter() - began:.1f}s"
+        ))
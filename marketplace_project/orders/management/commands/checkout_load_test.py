@@ -0,0 +1,121 @@
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from orders.models import OrderItem, StockReservation
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Навантажувальний тест оформлення: N покупців одночасно купують "
+        "товар з обмеженим залишком через справжні view кошика і checkout. "
+        "Перевіряє, що склад не пішов у мінус і продано рівно stock одиниць."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stock", type=int, default=10)
+        parser.add_argument("--buyers", type=int, default=100)
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--keep", action="store_true", help="Не видаляти тестові дані")
+
+    def handle(self, *args, **options):
+        stock, buyers_count = options["stock"], options["buyers"]
+        User = get_user_model()
+        tag = f"loadtest-{uuid.uuid4().hex[:8]}"
+
+        seller = User.objects.create(username=f"{tag}-seller", is_seller=True)
+        product = Product.objects.create(
+            seller=seller, title=tag, description=tag, price=Decimal("1.00"), stock=stock
+        )
+        User.objects.bulk_create(
+            [User(username=f"{tag}-{i}") for i in range(buyers_count)]
+        )
+        buyers = list(User.objects.filter(username__startswith=f"{tag}-").exclude(pk=seller.pk))
+
+        latencies = []
+        results = {"ordered": 0, "rejected": 0, "errors": 0}
+        lock = threading.Lock()
+        start = threading.Barrier(options["threads"])
+        add_url = reverse("add-to-cart", args=[product.pk])
+        checkout_url = reverse("order-create")
+
+        def worker(chunk):
+            start.wait()
+            try:
+                for buyer in chunk:
+                    client = Client(HTTP_HOST="localhost")
+                    client.force_login(buyer)
+                    began = time.perf_counter()
+                    try:
+                        client.post(add_url)
+                        response = client.post(checkout_url, {
+                            "payment_method": "cod",
+                            "full_name": buyer.username,
+                            "delivery_method": "courier",
+                        })
+                        outcome = "ordered" if response.status_code == 302 else "rejected"
+                    except Exception as e:
+                        self.stderr.write(f"{buyer.username}: {e!r}")
+                        outcome = "errors"
+                    with lock:
+                        latencies.append(time.perf_counter() - began)
+                        results[outcome] += 1
+            finally:
+                connections.close_all()
+
+        chunks = [buyers[i::options["threads"]] for i in range(options["threads"])]
+        threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+
+        with override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"):
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - began
+
+        product.refresh_from_db()
+        sold = sum(
+            OrderItem.objects.filter(product=product).values_list("quantity", flat=True)
+        )
+        latencies.sort()
+
+        self.stdout.write(
+            f"buyers={buyers_count} threads={options['threads']} stock={stock}\n"
+            f"ordered={results['ordered']} rejected={results['rejected']} "
+            f"errors={results['errors']} sold={sold} stock_left={product.stock}\n"
+            f"elapsed={elapsed:.2f}s throughput={buyers_count / elapsed:.1f} checkouts/s "
+            f"p50={statistics.median(latencies) * 1000:.0f}ms "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms"
+        )
+
+        problems = []
+        if sold != min(stock, buyers_count):
+            problems.append(f"продано {sold}, очікувалось {min(stock, buyers_count)}")
+        reserved = sum(
+            StockReservation.objects.filter(product=product).values_list("quantity", flat=True)
+        )
+        if product.stock + reserved != stock - sold:
+            problems.append(
+                f"залишок {product.stock} + резерв {reserved} != {stock} - {sold}"
+            )
+        if product.available != (product.stock > 0):
+            problems.append("available не відповідає залишку")
+        if results["errors"]:
+            problems.append(f"помилок: {results['errors']}")
+
+        if not options["keep"]:
+            User.objects.filter(username__startswith=f"{tag}-").delete()
+
+        if problems:
+            raise CommandError("; ".join(problems))
+        self.stdout.write(self.style.SUCCESS("OK: перепродажу немає"))
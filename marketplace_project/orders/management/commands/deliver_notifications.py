@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.notifications import deliver_due
+
+
+class Command(BaseCommand):
+    help = (
+        "Доставляє сповіщення з outbox (email, Telegram). Без --loop робить "
+        "один прохід (для cron), з --loop працює як фоновий воркер."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Працювати безперервно")
+        parser.add_argument("--interval", type=float, default=5.0, help="Пауза між проходами, с")
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        while True:
+            # вигрібаємо все, що вже настало, пачками
+            while True:
+                stats = deliver_due(options["batch_size"])
+                if stats["sent"] or stats["failed"]:
+                    self.stdout.write(
+                        f"Надіслано: {stats['sent']}, помилок: {stats['failed']}"
+                    )
+                if stats["sent"] + stats["failed"] < options["batch_size"]:
+                    break
+
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders import inventory
+from orders.models import Cart, StockReservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Видаляє анонімні кошики, які не змінювались --days днів, "
+        "і повертає на склад їхні резерви (запускати з cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        stale = Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff)
+        purged = 0
+        while True:
+            batch = list(stale.order_by("pk").values_list("pk", "key")[:options["batch_size"]])
+            if not batch:
+                break
+            keys = [key for _, key in batch]
+            # зазвичай резерви вже забрав release_expired, але не покладаємось
+            for key in set(
+                StockReservation.objects.filter(cart_key__in=keys).values_list("cart_key", flat=True)
+            ):
+                inventory.release(key)
+            Cart.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+            purged += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Видалено кошиків: {purged}"))
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from orders import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Дораховує денні підсумки продажів (дашборд продавця) за замовленнями "
+        "після водяного знака. Запускати з cron, наприклад раз на 5 хвилин."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Перерахувати з нуля")
+        parser.add_argument("--batch-size", type=int, default=rollups.BATCH_SIZE)
+        parser.add_argument(
+            "--lag", type=int, default=int(rollups.LAG.total_seconds()),
+            help="Не брати замовлення, свіжіші за стільки секунд",
+        )
+
+    def handle(self, *args, **options):
+        began = time.perf_counter()
+        run = rollups.rebuild if options["rebuild"] else rollups.refresh
+
+        def progress(last_order_id):
+            self.stdout.write(f"  до замовлення {last_order_id}")
+
+        batches = run(
+            batch_size=options["batch_size"],
+            lag=timedelta(seconds=options["lag"]),
+            progress=progress,
+        )
+        if not batches:
+            self.stdout.write(self.style.SUCCESS("Нових замовлень немає"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Пачок: {batches}, за {time.perf_counter() - began:.1f} с"
+        ))
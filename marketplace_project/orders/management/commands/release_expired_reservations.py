@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.inventory import release_expired
+
+
+class Command(BaseCommand):
+    help = "Повертає на склад резерви покинутих кошиків (запускати з cron)."
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f"Звільнено резервів: {released}"))
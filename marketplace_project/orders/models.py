@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from products.models import Product
 
 
@@ -90,5 +91,200 @@ class OrderItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    # 🔹 Ціна на момент замовлення (Product.price може змінитися пізніше)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    line_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
     def __str__(self):
         return f'{self.product.title} x {self.quantity}'
+
+
+class Cart(models.Model):
+    """
+    Кошик: анонімний (ключ у підписаній cookie) або прив'язаний до
+    користувача. ``key`` — він же cart_key резервів складу.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='cart'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    # покинуті анонімні кошики чистить purge_carts
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f'Cart {self.key}'
+
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_line'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} x {self.quantity}'
+
+
+class StockReservation(models.Model):
+    """Одиниці товару, притримані для кошика до оформлення або закінчення TTL."""
+    cart_key = models.CharField(max_length=64)
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations'
+    )
+    quantity = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart_key', 'product'], name='unique_cart_product_reservation'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} x {self.quantity} for {self.cart_key}'
+
+
+class Notification(models.Model):
+    """
+    Outbox сповіщень: рядок пишеться в транзакції замовлення,
+    доставляє його окремий воркер (команда deliver_notifications).
+    """
+    CHANNEL_CHOICES = (
+        ('email', 'Email'),
+        ('telegram', 'Telegram'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Очікує'),
+        ('sent', 'Надіслано'),
+        ('dead', 'Не доставлено'),
+    )
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='notifications'
+    )
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255, blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.channel} #{self.pk} ({self.status})'
+
+
+class ProductNeighbour(models.Model):
+    """
+    "Купують разом": top-N сусідів товару за спільними замовленнями.
+    Таблицю перебудовує команда build_recommendations.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='neighbours'
+    )
+    neighbour = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    co_count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_neighbour_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} -> {self.neighbour_id} ({self.score:.2f})'
+
+
+class SellerDailySales(models.Model):
+    """
+    Денний підсумок продавця: одиниці, виручка і кількість різних замовлень.
+    Заповнюється інкрементально з OrderItem (orders.rollups).
+    """
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_sales'
+    )
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='unique_seller_day_sales'),
+        ]
+
+    def __str__(self):
+        return f'{self.seller_id} {self.day}: {self.revenue}'
+
+
+class ProductDailySales(models.Model):
+    """Те саме в розрізі товару — для топу товарів на дашборді продавця."""
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='daily_sales'
+    )
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day'], name='unique_product_day_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product_id} {self.day}: {self.revenue}'
+
+
+class RollupWatermark(models.Model):
+    """До якого замовлення (pk) дораховані підсумки; один рядок на підсумок."""
+    name = models.CharField(max_length=50, unique=True)
+    last_order_id = models.PositiveBigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.name}: {self.last_order_id}'
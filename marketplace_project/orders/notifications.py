@@ -0,0 +1,227 @@
+"""
+Outbox сповіщень про замовлення.
+
+``enqueue_order_notifications`` викликається в транзакції оформлення —
+замовлення без сповіщення (чи навпаки) не буває. Доставку робить
+``deliver_due`` з команди deliver_notifications: листи йдуть через одне
+SMTP-зʼєднання, а при сплеску Telegram-повідомлення склеюються в дайджести.
+Невдалі спроби повторюються з експоненційною затримкою, після
+MAX_ATTEMPTS рядок переходить у статус "dead".
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Notification
+from .telegram_utils import TELEGRAM_MAX_LENGTH, send_telegram_message, telegram_configured
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=1)
+# скільки секунд рядок належить воркеру, що його взяв
+CLAIM_TIMEOUT = timedelta(minutes=5)
+# від скількох Telegram-повідомлень у пачці шлемо дайджест
+TELEGRAM_DIGEST_THRESHOLD = 5
+
+
+# ===========================
+#   ТЕКСТИ
+# ===========================
+def build_order_email(order, items):
+    lines = [
+        f"Нове замовлення #{order.pk}",
+        f"Статус: {order.status}",
+        f"Спосіб оплати: {order.get_payment_method_display()}",
+        f"Спосіб доставки: {order.get_delivery_method_display() if order.delivery_method else ''}",
+        "",
+        f"Покупець: {order.buyer.username}",
+        f"ПІБ: {order.full_name}",
+        f"Телефон: {order.phone}",
+        f"Адреса: {order.address}, {order.city}, {order.postal_code}",
+        f"Відділення: {order.delivery_department or '-'}",
+        "",
+        "Товари:",
+    ]
+
+    for item in items:
+        lines.append(f"- {item.product.title} x {item.quantity} = {item.line_total} грн")
+
+    lines.append("")
+    lines.append(f"Разом: {order.total_price} грн")
+
+    if order.comment:
+        lines.append("")
+        lines.append(f"Коментар покупця: {order.comment}")
+
+    return f"Нове замовлення #{order.pk}", "\n".join(lines)
+
+
+def build_order_telegram(order, items):
+    text = f"📦 *Нове замовлення #{order.pk}*\n"
+    text += f"👤 Покупець: *{order.full_name}*\n"
+    text += f"📱 Телефон: {order.phone}\n"
+    text += f"🏙️ Місто: {order.city}\n"
+    text += f"📬 Адреса: {order.address}\n"
+    text += f"🏣 Відділення: {order.delivery_department}\n"
+    text += f"💳 Оплата: {order.get_payment_method_display()}\n"
+    text += f"🚚 Доставка: {order.get_delivery_method_display()}\n\n"
+    text += "🛒 *Товари:*\n"
+
+    for item in items:
+        text += f"- {item.product.title} × {item.quantity} = {item.line_total} грн\n"
+
+    text += f"\n💰 *Разом: {order.total_price} грн*\n"
+
+    if order.comment:
+        text += f"\n💬 Коментар: {order.comment}"
+
+    return text
+
+
+def enqueue_order_notifications(order, items):
+    """Пише сповіщення в outbox (викликати в транзакції замовлення)."""
+    notifications = []
+
+    owner_email = getattr(settings, "ORDER_NOTIFICATION_EMAIL", None)
+    if owner_email:
+        subject, body = build_order_email(order, items)
+        notifications.append(Notification(
+            order=order, channel="email", recipient=owner_email,
+            subject=subject, body=body,
+        ))
+
+    if telegram_configured():
+        notifications.append(Notification(
+            order=order, channel="telegram", body=build_order_telegram(order, items),
+        ))
+
+    Notification.objects.bulk_create(notifications)
+
+
+# ===========================
+#   ДОСТАВКА
+# ===========================
+def claim_due(batch_size=100, now=None):
+    """Забирає пачку готових до відправки рядків, щоб інші воркери їх пропустили."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = Notification.objects.filter(
+            status="pending", next_attempt_at__lte=now
+        ).order_by("next_attempt_at", "pk")
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        batch = list(due[:batch_size])
+        Notification.objects.filter(pk__in=[n.pk for n in batch]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    return batch
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _mark_sent(notifications, now):
+    Notification.objects.filter(pk__in=[n.pk for n in notifications]).update(
+        status="sent", sent_at=now, last_error=""
+    )
+
+
+def _mark_failed(notification, error, now):
+    notification.attempts += 1
+    notification.last_error = str(error)[:2000]
+    if notification.attempts >= MAX_ATTEMPTS:
+        notification.status = "dead"
+    else:
+        notification.next_attempt_at = now + _backoff(notification.attempts)
+    notification.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+
+
+def _deliver_emails(notifications, now, stats):
+    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None)
+    try:
+        smtp = get_connection(fail_silently=False)
+        smtp.open()
+    except Exception as e:
+        for notification in notifications:
+            _mark_failed(notification, e, now)
+        stats["failed"] += len(notifications)
+        return
+
+    sent = []
+    try:
+        for notification in notifications:
+            message = EmailMessage(
+                subject=notification.subject,
+                body=notification.body,
+                from_email=from_email or notification.recipient,
+                to=[notification.recipient],
+                connection=smtp,
+            )
+            try:
+                message.send()
+            except Exception as e:
+                _mark_failed(notification, e, now)
+                stats["failed"] += 1
+            else:
+                sent.append(notification)
+    finally:
+        smtp.close()
+
+    _mark_sent(sent, now)
+    stats["sent"] += len(sent)
+
+
+def _digests(notifications):
+    """Склеює повідомлення в дайджести, що влазять у ліміт Telegram."""
+    header = f"🗂 Дайджест: {len(notifications)} сповіщень\n\n"
+    separator = "\n\n———\n\n"
+    chunk, text = [], header
+    for notification in notifications:
+        addition = (separator if chunk else "") + notification.body
+        if chunk and len(text) + len(addition) > TELEGRAM_MAX_LENGTH:
+            yield chunk, text
+            chunk, text = [], header
+            addition = notification.body
+        chunk.append(notification)
+        text += addition
+    if chunk:
+        yield chunk, text
+
+
+def _deliver_telegram(notifications, now, stats):
+    if len(notifications) >= TELEGRAM_DIGEST_THRESHOLD:
+        groups = _digests(notifications)
+    else:
+        groups = (([n], n.body) for n in notifications)
+
+    for group, text in groups:
+        try:
+            send_telegram_message(text)
+        except Exception as e:
+            for notification in group:
+                _mark_failed(notification, e, now)
+            stats["failed"] += len(group)
+        else:
+            _mark_sent(group, now)
+            stats["sent"] += len(group)
+
+
+def deliver_due(batch_size=100, now=None):
+    """Одна ітерація воркера. Повертає {"sent": n, "failed": m}."""
+    now = now or timezone.now()
+    stats = {"sent": 0, "failed": 0}
+    batch = claim_due(batch_size, now)
+
+    emails = [n for n in batch if n.channel == "email"]
+    telegrams = [n for n in batch if n.channel == "telegram"]
+    if emails:
+        _deliver_emails(emails, now, stats)
+    if telegrams:
+        _deliver_telegram(telegrams, now, stats)
+    return stats
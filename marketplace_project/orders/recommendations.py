@@ -0,0 +1,303 @@
+"""
+"Купують разом" з історії замовлень.
+
+Пакетна частина (команда build_recommendations) йде по OrderItem
+шматками за id замовлення і рахує, скільки замовлень містять кожен товар
+і кожну пару товарів. Пари генеруються векторизовано в NumPy, лічильники
+зберігаються як відсортовані масиви ключів (a << 32 | b) і зливаються
+пачками, тож пам'ять залежить від кількості різних пар, а не рядків
+замовлень. Стан (лічильники + last_order_id) лежить у файлі, і наступний
+запуск дораховує лише нові замовлення.
+
+Замовлення, створені останні ``LAG``, не беруться (як у rollups): pk
+видається до коміту, і повільна транзакція могла б закомітити менший pk
+уже після того, як last_order_id пройшов далі.
+
+Пари оцінюються lift'ом (або косинусом), top-N сусідів кожного товару
+пишуться в ProductNeighbour, звідки сторінки читають їх одним запитом.
+Інкрементний запуск переписує лише товари, чиї лічильники змінились, тому
+lift рахується від кількості замовлень на момент останнього повного
+перерахунку (``scored_n_orders``) — інакше оцінки різних товарів, записані
+в різні дні, не можна було б порівнювати (``bought_with_cart``). Порядок
+сусідів одного товару від цього не залежить. Коли замовлень стало більше
+на ``RESCORE_DRIFT``, команда сама робить повний перерахунок.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from products.models import Product
+from .models import Order, OrderItem, ProductNeighbour
+
+TOP_N = 8
+# гігантські кошики (опт, тестові замовлення) дають O(n²) пар і шум
+MAX_BASKET = 50
+# пари, що трапились рідше, не рекомендуємо — lift на одиницях ненадійний
+MIN_SUPPORT = 2
+ORDERS_PER_CHUNK = 50_000
+# скільки ключів накопичувати перед злиттям з основними лічильниками
+MERGE_THRESHOLD = 5_000_000
+LAG = timedelta(minutes=5)
+# на скільки може вирости кількість замовлень до повного перерахунку оцінок
+RESCORE_DRIFT = 0.1
+
+
+def state_path():
+    return getattr(
+        settings, "RECOMMENDATIONS_STATE",
+        settings.BASE_DIR / "var" / "recommendations" / "state.npz",
+    )
+
+
+# ===========================
+#   ЛІЧИЛЬНИКИ
+# ===========================
+class Counter:
+    """Розріджений лічильник int64-ключів: відсортовані keys + counts."""
+
+    def __init__(self, keys=None, counts=None):
+        self.keys = keys if keys is not None else np.zeros(0, dtype=np.int64)
+        self.counts = counts if counts is not None else np.zeros(0, dtype=np.int64)
+        self._pending = []
+        self._pending_size = 0
+
+    def add(self, keys):
+        """Додає по одиниці на кожен ключ (ключі можуть повторюватись)."""
+        if len(keys):
+            self._pending.append(keys)
+            self._pending_size += len(keys)
+            if self._pending_size >= MERGE_THRESHOLD:
+                self.merge()
+
+    def merge(self):
+        if not self._pending:
+            return
+        fresh, fresh_counts = np.unique(np.concatenate(self._pending), return_counts=True)
+        self._pending, self._pending_size = [], 0
+        keys = np.concatenate([self.keys, fresh])
+        counts = np.concatenate([self.counts, fresh_counts])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts, minlength=len(self.keys)).astype(np.int64)
+
+    def get(self, keys):
+        self.merge()
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, self.counts[positions], 0)
+
+
+def basket_pairs(order_ids, product_ids):
+    """
+    Масиви рядків (order_id, product_id) -> (унікальні товари кошиків,
+    ключі пар a < b). Усе без циклу Python по кошиках.
+    """
+    if not len(order_ids):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    # унікальні (замовлення, товар), відсортовані за замовленням і товаром
+    rows = np.unique(np.stack([order_ids, product_ids], axis=1), axis=0)
+    orders, products = rows[:, 0], rows[:, 1]
+
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(orders)])
+    keep = np.repeat(sizes <= MAX_BASKET, sizes)
+    orders, products = orders[keep], products[keep]
+    sizes = sizes[sizes <= MAX_BASKET]
+    ends = np.repeat(np.cumsum(sizes), sizes)
+
+    # кожен товар утворює пари з усіма наступними в своєму кошику
+    index = np.arange(len(products))
+    per_item = ends - index - 1
+    left = np.repeat(index, per_item)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(per_item) - per_item, per_item)
+    right = left + 1 + offsets
+    keys = (products[left] << 32) | products[right]
+    return products, keys
+
+
+# ===========================
+#   СТАН
+# ===========================
+class State:
+    def __init__(self, items=None, pairs=None, n_orders=0, last_order_id=0, scored_n_orders=0):
+        self.items = items or Counter()
+        self.pairs = pairs or Counter()
+        self.n_orders = n_orders
+        self.last_order_id = last_order_id
+        # n_orders на момент останнього повного запису оцінок
+        self.scored_n_orders = scored_n_orders
+
+    def needs_rescore(self, drift=RESCORE_DRIFT):
+        return not self.scored_n_orders or self.n_orders > self.scored_n_orders * (1 + drift)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or state_path()
+        try:
+            data = np.load(path)
+        except FileNotFoundError:
+            return cls()
+        return cls(
+            Counter(data["item_keys"], data["item_counts"]),
+            Counter(data["pair_keys"], data["pair_counts"]),
+            int(data["n_orders"]),
+            int(data["last_order_id"]),
+            int(data["scored_n_orders"]) if "scored_n_orders" in data.files else 0,
+        )
+
+    def save(self, path=None):
+        path = path or state_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.items.merge()
+        self.pairs.merge()
+        tmp = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp,
+            item_keys=self.items.keys, item_counts=self.items.counts,
+            pair_keys=self.pairs.keys, pair_counts=self.pairs.counts,
+            n_orders=self.n_orders, last_order_id=self.last_order_id,
+            scored_n_orders=self.scored_n_orders,
+        )
+        tmp.replace(path)
+
+
+def consume_orders(state, chunk_orders=ORDERS_PER_CHUNK, progress=None, lag=LAG):
+    """Дораховує в ``state`` замовлення з id > state.last_order_id, старші за ``lag``."""
+    ceiling = Order.objects.filter(created_at__lt=timezone.now() - lag).aggregate(pk=Max("pk"))["pk"] or 0
+    touched = []
+    while state.last_order_id < ceiling:
+        # id замовлення, яким закінчується шматок
+        upper = list(
+            Order.objects.filter(pk__gt=state.last_order_id, pk__lte=ceiling)
+            .order_by("pk").values_list("pk", flat=True)[chunk_orders - 1:chunk_orders]
+        )
+        upper = upper[0] if upper else ceiling
+        lines = OrderItem.objects.filter(order_id__gt=state.last_order_id, order_id__lte=upper)
+        rows = np.array(list(lines.values_list("order_id", "product_id")), dtype=np.int64)
+        state.last_order_id = upper
+        if not len(rows):
+            continue
+
+        products, pair_keys = basket_pairs(rows[:, 0], rows[:, 1])
+        state.items.add(products)
+        state.pairs.add(pair_keys)
+        state.n_orders += len(np.unique(rows[:, 0]))
+        touched.append(np.unique(products))
+        if progress:
+            progress(state)
+
+    state.items.merge()
+    state.pairs.merge()
+    if touched:
+        return np.unique(np.concatenate(touched))
+    return np.zeros(0, dtype=np.int64)
+
+
+# ===========================
+#   ОЦІНКА І ЗАПИС
+# ===========================
+def score_pairs(state, metric="lift", min_support=MIN_SUPPORT, n_orders=None):
+    """
+    Орієнтовані ребра (src, dst, score, co_count) для обох напрямків пари.
+    ``n_orders`` — база lift'а (за замовчуванням state.n_orders).
+    """
+    keep = state.pairs.counts >= min_support
+    keys, co = state.pairs.keys[keep], state.pairs.counts[keep]
+    a, b = keys >> 32, keys & 0xFFFFFFFF
+    count_a = state.items.get(a).astype(np.float64)
+    count_b = state.items.get(b).astype(np.float64)
+    if metric == "cosine":
+        score = co / np.sqrt(count_a * count_b)
+    else:
+        score = co * (n_orders or state.n_orders) / (count_a * count_b)
+    return (
+        np.concatenate([a, b]),
+        np.concatenate([b, a]),
+        np.concatenate([score, score]),
+        np.concatenate([co, co]),
+    )
+
+
+def top_neighbours(src, dst, score, co, top_n=TOP_N):
+    order = np.lexsort((-co, -score, src))
+    src, dst, score, co = src[order], dst[order], score[order], co[order]
+    starts = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+    sizes = np.diff(np.r_[starts, len(src)])
+    rank = np.arange(len(src)) - np.repeat(starts, sizes)
+    keep = rank < top_n
+    return src[keep], dst[keep], score[keep], co[keep], rank[keep]
+
+
+def write_neighbours(edges, products=None, batch_size=5000):
+    """
+    Переписує ProductNeighbour. ``products`` — масив товарів, чиї рядки
+    треба замінити (None — вся таблиця).
+    """
+    src, dst, score, co, rank = edges
+    existing = np.array(sorted(Product.objects.values_list("pk", flat=True)), dtype=np.int64)
+    valid = np.isin(src, existing) & np.isin(dst, existing)
+    if products is not None:
+        valid &= np.isin(src, products)
+    src, dst, score, co, rank = src[valid], dst[valid], score[valid], co[valid], rank[valid]
+
+    with transaction.atomic():
+        stale = ProductNeighbour.objects.all()
+        if products is not None:
+            stale = stale.filter(product_id__in=products.tolist())
+        stale.delete()
+        for start in range(0, len(src), batch_size):
+            end = start + batch_size
+            ProductNeighbour.objects.bulk_create([
+                ProductNeighbour(
+                    product_id=int(s), neighbour_id=int(d), score=float(sc),
+                    co_count=int(c), rank=int(r),
+                )
+                for s, d, sc, c, r in zip(
+                    src[start:end], dst[start:end], score[start:end],
+                    co[start:end], rank[start:end],
+                )
+            ])
+    return len(src)
+
+
+def affected_products(state, touched):
+    """Товари з нових замовлень і всі, хто з ними в парі: їхні оцінки змінились."""
+    if not len(touched):
+        return touched
+    a, b = state.pairs.keys >> 32, state.pairs.keys & 0xFFFFFFFF
+    partners = np.concatenate([b[np.isin(a, touched)], a[np.isin(b, touched)]])
+    return np.unique(np.concatenate([touched, partners]))
+
+
+# ===========================
+#   ЧИТАННЯ
+# ===========================
+def bought_together(product, limit=4):
+    """Сусіди товару, які зараз у наявності (один індексований запит)."""
+    return [
+        row.neighbour for row in
+        ProductNeighbour.objects.filter(product=product, neighbour__available=True)
+        .select_related("neighbour").order_by("rank")[:limit]
+    ]
+
+
+def bought_with_cart(product_ids, limit=4):
+    """Рекомендації до кошика: найкращі сусіди його товарів, яких у кошику ще немає."""
+    if not product_ids:
+        return []
+    rows = (
+        ProductNeighbour.objects.filter(product_id__in=product_ids, neighbour__available=True)
+        .exclude(neighbour_id__in=product_ids)
+        .select_related("neighbour").order_by("-score")[:limit * len(product_ids)]
+    )
+    picked = {}
+    for row in rows:
+        picked.setdefault(row.neighbour_id, row.neighbour)
+        if len(picked) == limit:
+            break
+    return list(picked.values())
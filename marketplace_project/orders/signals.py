@@ -0,0 +1,17 @@
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .cart import CART_COOKIE, CART_COOKIE_SALT, merge_carts
+from .models import Cart
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    if request is None:
+        return
+    key = request.get_signed_cookie(CART_COOKIE, default=None, salt=CART_COOKIE_SALT)
+    if key is None:
+        return
+    anonymous = Cart.objects.filter(key=key, user__isnull=True).first()
+    if anonymous is not None:
+        request._cart = merge_carts(anonymous, user)
@@ -1,21 +1,27 @@
-import requests
 import os
 
+from marketplace_project import outbound
+
+# ліміт довжини повідомлення Bot API
+TELEGRAM_MAX_LENGTH = 4096
+
+
+def telegram_configured():
+    return bool(os.environ.get("TELEGRAM_BOT_TOKEN") and os.environ.get("TELEGRAM_CHAT_ID"))
+
+
 def send_telegram_message(text):
+    """Надсилає повідомлення; при помилці кидає виняток (повтор робить outbox)."""
     token = os.environ.get("TELEGRAM_BOT_TOKEN")
     chat_id = os.environ.get("TELEGRAM_CHAT_ID")
 
     if not token or not chat_id:
-        print("Telegram: Missing token or chat_id!")
-        return
+        raise RuntimeError("Telegram: Missing token or chat_id!")
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
     payload = {
         "chat_id": chat_id,
-        "text": text
+        "text": text[:TELEGRAM_MAX_LENGTH]
     }
 
-    try:
-        requests.post(url, data=payload)
-    except Exception as e:
-        print("Telegram Error:", e)
\ No newline at end of file
+    response = outbound.client("telegram").post(f"/bot{token}/sendMessage", data=payload)
+    response.raise_for_status()
@@ -1,3 +1,407 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from marketplace_project.testing import QueryBudgetTestCase
+
+from products.models import Product
+
+from . import inventory, notifications, recommendations, rollups
+from .export import export_orders, export_queryset
+from .models import (
+    Cart, Notification, Order, OrderItem, ProductDailySales, RollupWatermark, SellerDailySales, StockReservation,
+)
+
+
+class OrderQueryBudgetTests(QueryBudgetTestCase):
+    def fill_cart(self):
+        for product in self.products[:self.ROWS]:
+            self.assertWithinBudget(self.client.post(reverse('add-to-cart', args=[product.pk])), status=302)
+
+    def test_cart(self):
+        self.assertWithinBudget(self.client.get(reverse('cart')))
+        self.fill_cart()
+        self.assertWithinBudget(self.client.get(reverse('cart')))
+
+    def test_cart_logged_in(self):
+        self.login(self.buyer)
+        self.assertWithinBudget(self.client.get(reverse('cart')))
+        self.fill_cart()
+        self.assertWithinBudget(self.client.get(reverse('cart')))
+
+    def test_login_with_anonymous_cart(self):
+        self.fill_cart()
+        response = self.client.post(reverse('login'), {'username': 'buyer', 'password': self.password})
+        self.assertWithinBudget(response, status=302)
+        self.assertWithinBudget(self.client.get(reverse('cart')))
+
+    def test_add_and_remove_htmx(self):
+        htmx = {'HX-Request': 'true'}
+        self.assertWithinBudget(
+            self.client.post(reverse('add-to-cart', args=[self.product.pk]), headers=htmx)
+        )
+        self.assertWithinBudget(
+            self.client.post(reverse('add-to-cart', args=[self.product.pk]), headers=htmx)
+        )
+        self.assertWithinBudget(
+            self.client.post(reverse('remove-from-cart', args=[self.product.pk]), headers=htmx)
+        )
+
+    def test_checkout(self):
+        self.login(self.buyer)
+        self.fill_cart()
+        self.assertWithinBudget(self.client.get(reverse('order-create')))
+        response = self.client.post(reverse('order-create'), {
+            'payment_method': 'cod', 'full_name': 'Покупець', 'delivery_method': 'courier',
+        })
+        self.assertWithinBudget(response, status=302)
+
+    def test_order_list_and_detail(self):
+        self.login(self.buyer)
+        self.assertWithinBudget(self.client.get(reverse('order-list')))
+        self.assertWithinBudget(self.client.get(reverse('order-detail', args=[self.order.pk])))
+
+    def test_order_export(self):
+        self.login(self.seller)
+        response = self.client.get(reverse('order-export'))
+        self.assertWithinBudget(response)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        # у замовленні покупця товари різних продавців — продавець бачить лише свої
+        own = [p for p in self.products[:self.ROWS] if p.seller_id == self.seller.pk]
+        self.assertEqual(sorted(int(row['product_id']) for row in rows), sorted(p.pk for p in own))
+        self.assertEqual({row['seller'] for row in rows}, {self.seller.username})
+
+    def test_seller_dashboard(self):
+        rollups.refresh(lag=timedelta(0))
+        self.login(self.seller)
+        for days in (30, 365):
+            response = self.client.get(reverse('seller-dashboard'), {'days': days})
+            self.assertWithinBudget(response)
+        self.assertEqual(len(response.context['series']), 365)
+        self.assertEqual(len(response.context['top_products']), 3)
+
+
+class OrderExportTests(QueryBudgetTestCase):
+    def export(self, fmt='jsonl', **filters):
+        return [
+            json.loads(line)
+            for line in ''.join(export_orders(export_queryset(**filters), fmt)).splitlines()
+        ]
+
+    def test_filters(self):
+        old = Order.objects.create(buyer=self.buyer, status='delivered')
+        Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        today = timezone.localdate()
+
+        self.assertEqual([o['order_id'] for o in self.export()], [self.order.pk, old.pk])
+        self.assertEqual([o['order_id'] for o in self.export(date_from=today)], [self.order.pk])
+        self.assertEqual(
+            [o['order_id'] for o in self.export(date_to=today - timedelta(days=30))], [old.pk]
+        )
+        self.assertEqual([o['order_id'] for o in self.export(status='delivered')], [old.pk])
+        self.assertEqual(len(self.export(seller=self.seller.pk)[0]['items']), 3)
+
+    def test_seller_sees_only_own_part_of_order_total(self):
+        record = self.export(seller=self.seller.pk)[0]
+        self.assertEqual(record['order_total'], '36.00')
+        self.assertEqual(self.export()[0]['order_total'], '100.00')
+
+    def test_csv_escapes_formulas(self):
+        Order.objects.filter(pk=self.order.pk).update(full_name='=HYPERLINK("http://x")', city='@SUM(A1)')
+        rows = list(csv.DictReader(io.StringIO(''.join(export_orders(export_queryset(), 'csv')).lstrip('\ufeff'))))
+        self.assertEqual(rows[0]['full_name'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(rows[0]['city'], "'@SUM(A1)")
+        self.assertEqual(rows[0]['order_total'], '100.00')
+        # JSONL читають програми, а не таблиці — там значення як є
+        self.assertEqual(self.export()[0]['city'], '@SUM(A1)')
+
+    def test_queries_per_chunk_do_not_depend_on_order_size(self):
+        for _ in range(4):
+            Order.objects.create(buyer=self.buyer)
+        with CaptureQueriesContext(connection) as queries:
+            chunks = list(export_orders(export_queryset(), 'csv', chunk_size=2))
+        # заголовок + 5 замовлень по 2 = 3 пачки; курсор замовлень один,
+        # позиції — окремим запитом на кожну пачку
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(queries), 1 + 3)
+
+    def test_buyers_cannot_export(self):
+        self.login(self.buyer)
+        self.assertEqual(self.client.get(reverse('order-export')).status_code, 403)
+
+    def test_invalid_filters(self):
+        self.login(self.seller)
+        response = self.client.get(reverse('order-export'), {'date_from': '2024-02-01', 'date_to': '2024-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SalesRollupTests(QueryBudgetTestCase):
+    def place(self, items, days_ago=0):
+        order = Order.objects.create(buyer=self.buyer)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity,
+                      unit_price=product.price, line_total=product.price * quantity)
+            for product, quantity in items
+        ])
+        if days_ago:
+            Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def seller_totals(self):
+        return list(
+            SellerDailySales.objects.filter(seller=self.seller)
+            .order_by('day').values_list('day', 'units', 'revenue', 'orders')
+        )
+
+    def test_incremental_refresh(self):
+        today = timezone.localdate()
+        self.assertEqual(rollups.refresh(lag=timedelta(0)), 1)
+        # у замовленні з setUpTestData — товари 0, 2, 4 продавця (10 + 12 + 14)
+        self.assertEqual(self.seller_totals(), [(today, 3, Decimal('36.00'), 1)])
+
+        order = self.place([(self.products[0], 2), (self.products[1], 1)])
+        self.assertEqual(rollups.refresh(lag=timedelta(0)), 1)
+        self.assertEqual(self.seller_totals(), [(today, 5, Decimal('56.00'), 2)])
+        product = ProductDailySales.objects.get(product=self.products[0], day=today)
+        self.assertEqual((product.units, product.revenue, product.orders), (3, Decimal('30.00'), 2))
+        self.assertEqual(RollupWatermark.objects.get(name=rollups.WATERMARK).last_order_id, order.pk)
+
+        # повторний запуск нічого не додає
+        self.assertEqual(rollups.refresh(lag=timedelta(0)), 0)
+        self.assertEqual(self.seller_totals(), [(today, 5, Decimal('56.00'), 2)])
+
+    def test_fresh_orders_wait_for_lag(self):
+        self.assertEqual(rollups.refresh(), 0)
+        self.assertFalse(SellerDailySales.objects.exists())
+
+    def test_batches_match_rebuild(self):
+        for days_ago in (0, 1, 1, 3):
+            self.place([(self.products[2], 1), (self.products[4], 2)], days_ago=days_ago)
+        self.assertEqual(rollups.refresh(batch_size=2, lag=timedelta(0)), 3)
+        incremental = self.seller_totals()
+        rollups.rebuild(lag=timedelta(0))
+        self.assertEqual(self.seller_totals(), incremental)
+        self.assertEqual([orders for *_, orders in incremental], [1, 2, 2])
+
+    def test_period_comparison(self):
+        self.place([(self.products[0], 4)], days_ago=10)
+        rollups.refresh(lag=timedelta(0))
+        with self.assertNumQueries(3):
+            dashboard = rollups.seller_dashboard(self.seller, 7)
+        comparison = {item['metric']: item for item in dashboard['comparison']}
+        self.assertEqual(comparison['revenue']['current'], Decimal('36.00'))
+        self.assertEqual(comparison['revenue']['previous'], Decimal('40.00'))
+        self.assertEqual(comparison['revenue']['change'], Decimal('-10'))
+        self.assertEqual(comparison['orders']['change'], 0)
+        self.assertEqual([point['height'] for point in dashboard['series']], [0] * 6 + [100])
+
+    def test_buyers_have_no_dashboard(self):
+        self.login(self.buyer)
+        self.assertEqual(self.client.get(reverse('seller-dashboard')).status_code, 403)
+
+
+class RecommendationsTests(QueryBudgetTestCase):
+    def test_recent_orders_wait_for_lag(self):
+        state = recommendations.State()
+        self.assertEqual(len(recommendations.consume_orders(state)), 0)
+        self.assertEqual(state.last_order_id, 0)
+
+        touched = recommendations.consume_orders(state, lag=timedelta(0))
+        self.assertEqual(state.last_order_id, self.order.pk)
+        self.assertEqual(sorted(touched), sorted(p.pk for p in self.products[:self.ROWS]))
+
+    def test_incremental_lift_uses_scored_order_count(self):
+        state = recommendations.State()
+        recommendations.consume_orders(state, lag=timedelta(0))
+        a, b = self.products[0].pk, self.products[1].pk
+
+        def lift(n_orders):
+            src, dst, score, _ = recommendations.score_pairs(state, min_support=1, n_orders=n_orders)
+            return dict(zip(zip(src.tolist(), dst.tolist()), score))[(a, b)]
+
+        self.assertEqual(lift(4), lift(1) * 4)
+        self.assertFalse(recommendations.State(n_orders=105, scored_n_orders=100).needs_rescore())
+        self.assertTrue(recommendations.State(n_orders=111, scored_n_orders=100).needs_rescore())
+
+    def test_build_command_writes_neighbours(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(RECOMMENDATIONS_STATE=Path(directory) / 'state.npz'):
+            call_command('build_recommendations', lag=0, min_support=1, stdout=io.StringIO())
+            state = recommendations.State.load()
+        self.assertEqual((state.n_orders, state.scored_n_orders), (1, 1))
+        self.assertEqual(
+            [p.pk for p in recommendations.bought_together(self.product)],
+            [p.pk for p in self.products[1:self.ROWS]],
+        )
+
+
+class InventoryTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        Product.objects.filter(pk=self.product.pk).update(stock=3, available=True)
+
+    def stock(self):
+        return Product.objects.values_list('stock', 'available').get(pk=self.product.pk)
+
+    def test_last_units_cannot_be_reserved_twice(self):
+        inventory.reserve('cart-a', self.product.pk, 2)
+        with self.assertRaises(inventory.OutOfStock):
+            inventory.reserve('cart-b', self.product.pk, 2)
+        inventory.reserve('cart-b', self.product.pk, 1)
+        self.assertEqual(self.stock(), (0, False))
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('cart_key', 'quantity')), {'cart-a': 2, 'cart-b': 1}
+        )
+
+    def test_commit_buys_shortfall_and_returns_surplus(self):
+        inventory.reserve('cart', self.product.pk, 2)
+        inventory.reserve('cart', self.products[1].pk, 1)
+        with transaction.atomic():
+            inventory.commit('cart', [(self.product.pk, 3)])
+        self.assertEqual(self.stock(), (0, False))
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).stock, 50)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_commit_fails_whole_order_when_short(self):
+        inventory.reserve('other', self.product.pk, 2)
+        with self.assertRaises(inventory.OutOfStock) as error, transaction.atomic():
+            inventory.commit('cart', [(self.products[1].pk, 1), (self.product.pk, 2)])
+        self.assertEqual(error.exception.products, [self.product])
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).stock, 50)
+        self.assertEqual(self.stock(), (1, True))
+
+    def test_expired_reservations_return_stock_once(self):
+        inventory.reserve('cart', self.product.pk, 3)
+        later = timezone.now() + inventory.reservation_ttl() + timedelta(seconds=1)
+        self.assertEqual(inventory.release_expired(now=later), 1)
+        self.assertEqual(inventory.release_expired(now=later), 0)
+        inventory.release('cart')
+        self.assertEqual(self.stock(), (3, True))
+
+    def test_adjust_never_goes_below_zero(self):
+        inventory.reserve('cart', self.product.pk, 1)
+        inventory.adjust(self.product.pk, -5)
+        self.assertEqual(self.stock(), (0, False))
+        inventory.adjust(self.product.pk, 4)
+        self.assertEqual(self.stock(), (4, True))
+
+
+class NotificationOutboxTests(QueryBudgetTestCase):
+    def telegram(self, count=1):
+        return Notification.objects.bulk_create([
+            Notification(order=self.order, channel='telegram', body=f'Замовлення {i}') for i in range(count)
+        ])
+
+    @override_settings(ORDER_NOTIFICATION_EMAIL='owner@example.com')
+    def test_email_delivered_once(self):
+        Notification.objects.all().delete()
+        notifications.enqueue_order_notifications(self.order, self.order.items.select_related('product'))
+        self.assertEqual(notifications.deliver_due(), {'sent': 1, 'failed': 0})
+        self.assertEqual(notifications.deliver_due(), {'sent': 0, 'failed': 0})
+        self.assertEqual([message.to for message in mail.outbox], [['owner@example.com']])
+        self.assertEqual(Notification.objects.get().status, 'sent')
+
+    def test_failure_is_retried_with_backoff_then_dead_lettered(self):
+        notification, = self.telegram()
+        now = timezone.now()
+        with mock.patch.object(notifications, 'send_telegram_message', side_effect=ConnectionError('down')):
+            self.assertEqual(notifications.deliver_due(now=now), {'sent': 0, 'failed': 1})
+            notification.refresh_from_db()
+            self.assertEqual((notification.status, notification.attempts), ('pending', 1))
+            self.assertGreater(notification.next_attempt_at, now)
+            # до кінця затримки рядок не береться
+            self.assertEqual(notifications.deliver_due(now=now), {'sent': 0, 'failed': 0})
+
+            for _ in range(notifications.MAX_ATTEMPTS - 1):
+                now += notifications.BACKOFF_MAX * 2
+                notifications.deliver_due(now=now)
+        notification.refresh_from_db()
+        self.assertEqual((notification.status, notification.attempts), ('dead', notifications.MAX_ATTEMPTS))
+        self.assertEqual(notification.last_error, 'down')
+        self.assertEqual(notifications.deliver_due(now=now + timedelta(days=1)), {'sent': 0, 'failed': 0})
+
+    def test_claimed_rows_skipped_until_claim_expires(self):
+        self.telegram()
+        now = timezone.now()
+        self.assertEqual(len(notifications.claim_due(now=now)), 1)
+        self.assertEqual(notifications.claim_due(now=now), [])
+        self.assertEqual(len(notifications.claim_due(now=now + notifications.CLAIM_TIMEOUT)), 1)
+
+    def test_burst_goes_out_as_digest(self):
+        self.telegram(notifications.TELEGRAM_DIGEST_THRESHOLD)
+        with mock.patch.object(notifications, 'send_telegram_message') as send:
+            stats = notifications.deliver_due()
+        self.assertEqual(stats, {'sent': notifications.TELEGRAM_DIGEST_THRESHOLD, 'failed': 0})
+        send.assert_called_once()
+        self.assertIn('Замовлення 4', send.call_args.args[0])
+
+
+class CartMergeTests(QueryBudgetTestCase):
+    def add(self, product, times=1):
+        for _ in range(times):
+            self.client.post(reverse('add-to-cart', args=[product.pk]))
+
+    def log_in(self):
+        response = self.client.post(reverse('login'), {'username': 'buyer', 'password': self.password})
+        return self.assertWithinBudget(response, 302)
+
+    def lines(self, cart):
+        return dict(cart.lines.values_list('product_id', 'quantity'))
+
+    def test_anonymous_cart_merges_into_existing_user_cart(self):
+        self.login(self.buyer)
+        self.add(self.product)
+        self.client.logout()
+        self.add(self.product, 2)
+        self.add(self.products[1])
+        anonymous = Cart.objects.get(user__isnull=True)
+
+        self.log_in()
+        cart = Cart.objects.get(user=self.buyer)
+        self.assertEqual(self.lines(cart), {self.product.pk: 3, self.products[1].pk: 1})
+        self.assertFalse(Cart.objects.filter(pk=anonymous.pk).exists())
+        self.assertEqual(
+            dict(StockReservation.objects.values_list('product_id', 'quantity')),
+            {self.product.pk: 3, self.products[1].pk: 1},
+        )
+        self.assertEqual(set(StockReservation.objects.values_list('cart_key', flat=True)), {cart.key})
+        self.assertContains(self.client.get(reverse('cart')), 'Шампунь 1')
+
+    def test_merge_cost_does_not_grow_with_cart_size(self):
+        self.login(self.buyer)
+        self.add(self.product)
+        self.client.logout()
+        self.add(self.product)
+        self.add(self.products[1])
+        small = len(self.log_in())
+
+        self.client.logout()
+        for product in self.products[:10]:
+            self.add(product)
+        self.assertEqual(len(self.log_in()), small)
+        cart = Cart.objects.get(user=self.buyer)
+        self.assertEqual(self.lines(cart)[self.product.pk], 3)
+        self.assertEqual(len(self.lines(cart)), 10)
+        self.assertEqual(StockReservation.objects.filter(cart_key=cart.key).count(), 10)
+
+    def test_anonymous_cart_becomes_user_cart(self):
+        self.add(self.product)
+        anonymous = Cart.objects.get()
+        self.log_in()
+        cart = Cart.objects.get(user=self.buyer)
+        self.assertEqual((cart.pk, self.lines(cart)), (anonymous.pk, {self.product.pk: 1}))
@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
     CartView, AddToCartView, RemoveFromCartView,
-    OrderCreateView, OrderListView, OrderDetailView
+    OrderCreateView, OrderListView, OrderDetailView, OrderExportView,
+    SellerDashboardView,
 )
 
 urlpatterns = [
@@ -10,5 +11,7 @@ urlpatterns = [
     path('cart/remove/<int:pk>/', RemoveFromCartView.as_view(), name='remove-from-cart'),
     path('create/', OrderCreateView.as_view(), name='order-create'),
     path('', OrderListView.as_view(), name='order-list'),
+    path('dashboard/', SellerDashboardView.as_view(), name='seller-dashboard'),
+    path('export/', OrderExportView.as_view(), name='order-export'),
     path('<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
 ]
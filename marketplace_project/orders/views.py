@@ -1,140 +1,65 @@
 from django.views import View
-from django.views.generic import CreateView, ListView, DetailView
+from django.views.generic import CreateView, ListView, DetailView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
-from django.shortcuts import get_object_or_404, redirect, render
-from django.http import HttpResponse, JsonResponse
-from django.core.mail import send_mail
-from django.conf import settings
-
-from .models import Order, OrderItem
-from .forms import OrderCreateForm
-from products.models import Product
-
-from .telegram_utils import send_telegram_message
+from django.shortcuts import redirect, render
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, StreamingHttpResponse
+from django.core.exceptions import PermissionDenied
+from django.contrib import messages
+
+from .models import Order
+from .forms import OrderCreateForm, OrderExportForm
+from .cart import (
+    add_line, clear, get_cart, remember_cart, remove_line, render_cart_badge,
+    resolve_request_cart,
+)
+from .checkout import place_order
+from .inventory import OutOfStock
+from .recommendations import bought_with_cart
+from products.views import SellerRequiredMixin
+from . import export, inventory, rollups
 
 
 # ===========================
 #   СТВОРЕННЯ ЗАМОВЛЕННЯ
 # ===========================
 class OrderCreateView(LoginRequiredMixin, CreateView):
+    query_budget = {'GET': 3, 'POST': 10}
     template_name = 'orders/order_create.html'
     form_class = OrderCreateForm
     success_url = reverse_lazy('order-list')
 
     def form_valid(self, form):
-        form.instance.buyer = self.request.user
+        stored, cart = resolve_request_cart(self.request)
+        if not cart:
+            form.add_error(None, "Кошик порожній.")
+            return self.form_invalid(form)
+
+        order = form.save(commit=False)
+        order.buyer = self.request.user
+        order.total_price = cart.total
         payment_method = form.cleaned_data.get("payment_method")
+        order.status = "paid" if payment_method == "card" else "new"
 
-        response = super().form_valid(form)
-
-        cart = self.request.session.get('cart', {})
-        total = 0
-
-        for product_id, quantity in cart.items():
-            product = Product.objects.get(pk=product_id)
-            subtotal = product.price * quantity
-            total += subtotal
-
-            OrderItem.objects.create(
-                order=self.object,
-                product=product,
-                quantity=quantity
-            )
-
-        self.object.total_price = total
-
-        if payment_method == "card":
-            self.object.status = "paid"
-        else:
-            self.object.status = "new"
-
-        self.object.save()
-
-        self.request.session['cart'] = {}
-
-        self.send_order_email()
-        self.send_telegram_notification()
-
-        return response
-
-    def send_order_email(self):
-        owner_email = getattr(settings, "ORDER_NOTIFICATION_EMAIL", None)
-        if not owner_email:
-            return
-
-        order = self.object
-
-        lines = [
-            f"Нове замовлення #{order.pk}",
-            f"Статус: {order.status}",
-            f"Спосіб оплати: {order.get_payment_method_display()}",
-            f"Спосіб доставки: {order.get_delivery_method_display() if order.delivery_method else ''}",
-            "",
-            f"Покупець: {order.buyer.username}",
-            f"ПІБ: {order.full_name}",
-            f"Телефон: {order.phone}",
-            f"Адреса: {order.address}, {order.city}, {order.postal_code}",
-            f"Відділення: {order.delivery_department or '-'}",
-            "",
-            "Товари:",
-        ]
-
-        for item in order.items.select_related("product"):
-            lines.append(f"- {item.product.title} x {item.quantity} = {item.product.price * item.quantity} грн")
-
-        lines.append("")
-        lines.append(f"Разом: {order.total_price} грн")
-
-        if order.comment:
-            lines.append("")
-            lines.append(f"Коментар покупця: {order.comment}")
+        # склад, замовлення і всі позиції — одна транзакція
+        try:
+            self.items = place_order(order, cart, stored.key)
+        except OutOfStock as e:
+            form.add_error(None, str(e))
+            return self.form_invalid(form)
+        self.object = order
 
-        message = "\n".join(lines)
+        clear(stored)
 
-        try:
-            send_mail(
-                subject=f"Нове замовлення #{order.pk}",
-                message=message,
-                from_email=getattr(settings, "DEFAULT_FROM_EMAIL", owner_email),
-                recipient_list=[owner_email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print("EMAIL ERROR:", e)
-
-    def send_telegram_notification(self):
-        order = self.object
-        items = order.items.all()
-
-        text = f"📦 *Нове замовлення #{order.pk}*\n"
-        text += f"👤 Покупець: *{order.full_name}*\n"
-        text += f"📱 Телефон: {order.phone}\n"
-        text += f"🏙️ Місто: {order.city}\n"
-        text += f"📬 Адреса: {order.address}\n"
-        text += f"🏣 Відділення: {order.delivery_department}\n"
-        text += f"💳 Оплата: {order.get_payment_method_display()}\n"
-        text += f"🚚 Доставка: {order.get_delivery_method_display()}\n\n"
-        text += "🛒 *Товари:*\n"
-
-        total = 0
-        for item in items:
-            subtotal = item.product.price * item.quantity
-            total += subtotal
-            text += f"- {item.product.title} × {item.quantity} = {subtotal} грн\n"
-
-        text += f"\n💰 *Разом: {total} грн*\n"
-
-        if order.comment:
-            text += f"\n💬 Коментар: {order.comment}"
-
-        send_telegram_message(text)
+        # листи і Telegram доставляє воркер з outbox (deliver_notifications)
+        return HttpResponseRedirect(self.get_success_url())
 
 
 # ===========================
 #   СПИСОК ЗАМОВЛЕНЬ
 # ===========================
 class OrderListView(LoginRequiredMixin, ListView):
+    query_budget = 6
     template_name = 'orders/order_list.html'
     model = Order
     context_object_name = 'orders'
@@ -143,64 +68,128 @@ class OrderListView(LoginRequiredMixin, ListView):
         return Order.objects.filter(buyer=self.request.user).prefetch_related('items__product')
 
 
+# ===========================
+#   ЕКСПОРТ
+# ===========================
+class OrderExportView(LoginRequiredMixin, View):
+    """
+    Потоковий CSV/JSONL для звірки: ?date_from=&date_to=&status=&format=.
+    Продавець бачить лише свої позиції; персонал — усе або ?seller=<id>.
+    """
+    query_budget = 3
+
+    def get(self, request):
+        user = request.user
+        if not (user.is_staff or user.is_seller):
+            raise PermissionDenied
+        form = OrderExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text())
+
+        filters = form.cleaned_data
+        seller = filters['seller'] if user.is_staff else user.pk
+        orders = export.export_queryset(
+            date_from=filters['date_from'],
+            date_to=filters['date_to'],
+            status=filters['status'],
+            seller=seller,
+        )
+        fmt = filters['format'] or 'csv'
+        response = StreamingHttpResponse(
+            export.export_orders(orders, fmt), content_type=export.CONTENT_TYPES[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders.{fmt}"'
+        return response
+
+
+# ===========================
+#   ДАШБОРД ПРОДАВЦЯ
+# ===========================
+class SellerDashboardView(SellerRequiredMixin, TemplateView):
+    """Продажі за ?days=7/30/90/365 проти попереднього періоду — з денних підсумків."""
+    query_budget = 6
+    template_name = 'orders/seller_dashboard.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            days = int(self.request.GET.get('days', 30))
+        except ValueError:
+            days = 30
+        if days not in rollups.PERIODS:
+            days = 30
+        context.update(rollups.seller_dashboard(self.request.user, days))
+        context['days'] = days
+        context['periods'] = rollups.PERIODS
+        return context
+
+
 # ===========================
 #   ДЕТАЛІ ЗАМОВЛЕННЯ
 # ===========================
 class OrderDetailView(LoginRequiredMixin, DetailView):
+    query_budget = 6
     template_name = 'orders/order_detail.html'
     model = Order
     context_object_name = 'order'
 
     def get_queryset(self):
-        return Order.objects.filter(buyer=self.request.user)
+        return Order.objects.filter(buyer=self.request.user).prefetch_related('items__product')
 
 
 # ===========================
 #   КОШИК
 # ===========================
 class CartView(View):
+    # + сесія і користувач для залогіненого покупця
+    query_budget = 7
     template_name = 'orders/cart.html'
 
     def get(self, request):
-        cart = request.session.get('cart', {})
-        cart_items = []
-        total = 0
-
-        for product_id, quantity in cart.items():
-            product = get_object_or_404(Product, pk=product_id)
-            subtotal = product.price * quantity
-            total += subtotal
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'subtotal': subtotal,
-            })
+        stored, cart = resolve_request_cart(request)
+        if cart:
+            inventory.touch(stored.key)
 
         context = {
-            'cart_items': cart_items,
-            'total': total,
+            'cart_items': cart.lines,
+            'total': cart.total,
+            'recommended': bought_with_cart([line.product.pk for line in cart]),
         }
         return render(request, self.template_name, context)
 
 
 class AddToCartView(View):
+    query_budget = 10
+
     def post(self, request, pk):
-        cart = request.session.get('cart', {})
-        cart[str(pk)] = cart.get(str(pk), 0) + 1
-        request.session['cart'] = cart
+        cart = get_cart(request, create=True)
+        try:
+            inventory.reserve(cart.key, pk)
+        except OutOfStock:
+            if request.headers.get('HX-Request'):
+                return remember_cart(request, HttpResponse('<button disabled>Немає в наявності</button>'))
+            messages.error(request, 'Товару немає в наявності.')
+            return remember_cart(request, redirect('cart'))
+
+        add_line(cart, pk)
 
         if request.headers.get('HX-Request'):
-            return HttpResponse('<button disabled>Додано</button>')
-        return redirect('cart')
+            # разом з кнопкою оновлюємо лічильник у навбарі (hx-swap-oob)
+            response = HttpResponse('<button disabled>Додано</button>' + render_cart_badge(request, oob=True))
+        else:
+            response = redirect('cart')
+        return remember_cart(request, response)
 
 
 class RemoveFromCartView(View):
+    query_budget = 8
+
     def post(self, request, pk):
-        cart = request.session.get('cart', {})
-        if str(pk) in cart:
-            del cart[str(pk)]
-            request.session['cart'] = cart
+        cart = get_cart(request)
+        if cart is not None and remove_line(cart, pk):
+            inventory.release(cart.key, pk)
 
         if request.headers.get('HX-Request'):
-            return JsonResponse({'message': 'Товар видалено'})
+            # рядок кошика зникає (outerHTML порожнім), лічильник оновлюється
+            return HttpResponse(render_cart_badge(request, oob=True))
         return redirect('cart')
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, SubCategory, Product
+from .models import Category, SubCategory, Product, ProductImportJob
 
 
 
@@ -16,10 +16,18 @@ class SubCategoryAdmin(admin.ModelAdmin):
 
 
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('title', 'get_seller', 'price', 'created_at')
+    list_display = ('title', 'get_seller', 'price', 'stock', 'available', 'created_at')
 
     def get_seller(self, obj):
         return obj.seller.username
     get_seller.short_description = 'Продавець'
 
 admin.site.register(Product, ProductAdmin)
+
+
+@admin.register(ProductImportJob)
+class ProductImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'seller', 'status', 'rows_done', 'created_count', 'updated_count', 'error_count', 'created_at')
+    list_filter = ('status',)
+    raw_id_fields = ('seller',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'errors', 'message')
@@ -0,0 +1,153 @@
+"""
+Кеш відповідей AI-консультанта.
+
+Ключ — товар + версія його вмісту + нормалізоване питання ("Чи він
+водонепроникний?" і "чи він водонепроникний" дають один ключ). Версія —
+хеш полів, які бачить модель, тож після редагування товару продавцем
+старі відповіді просто перестають знаходитись і вичищаються по TTL.
+
+Однакові питання, що прийшли одночасно, обслуговує один запит до
+OpenAI (singleflight): у межах процесу — спільний "політ", який стрімить
+ті самі шматки всім очікувачам, між процесами — блокування cache.add,
+поки інший процес не покладе відповідь у кеш.
+"""
+import asyncio
+import hashlib
+import weakref
+
+from django.core.cache import cache
+
+from .search import analyze
+
+ANSWER_TTL = 60 * 60 * 24
+LOCK_TTL = 60
+WAIT_TIMEOUT = 30
+POLL_INTERVAL = 0.25
+# змінювати разом із промптом, щоб не віддавати відповіді на старий
+PROMPT_VERSION = 2
+
+
+def normalize_question(question: str) -> str:
+    return analyze(question)
+
+
+def content_version(product) -> str:
+    raw = "\x1f".join(str(value) for value in (
+        PROMPT_VERSION,
+        product.title,
+        product.description,
+        product.price,
+        product.category_id,
+        product.subcategory_id,
+        product.available,
+    ))
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def answer_key(product, question: str) -> str:
+    digest = hashlib.sha1(normalize_question(question).encode()).hexdigest()
+    return f"products:ai:{product.pk}:{content_version(product)}:{digest}"
+
+
+class _Flight:
+    """Один запит до upstream, на результат якого можуть підписатися багато клієнтів."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.failed = False
+        self.changed = asyncio.Condition()
+
+    async def publish(self, chunk):
+        async with self.changed:
+            self.chunks.append(chunk)
+            self.changed.notify_all()
+
+    async def finish(self, failed=False):
+        async with self.changed:
+            self.done, self.failed = True, failed
+            self.changed.notify_all()
+
+    async def follow(self):
+        seen = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: len(self.chunks) > seen or self.done)
+                fresh = self.chunks[seen:]
+                done, failed = self.done, self.failed
+            seen += len(fresh)
+            for chunk in fresh:
+                yield chunk
+            if done and seen == len(self.chunks):
+                if failed:
+                    raise RuntimeError("AI answer generation failed")
+                return
+
+
+# політ живе в event loop, у якому його запустили
+_flights = weakref.WeakKeyDictionary()
+
+
+async def _fly(key, flight, produce, lock_key):
+    try:
+        async for chunk in produce():
+            await flight.publish(chunk)
+        answer = "".join(flight.chunks)
+        if answer:
+            await cache.aset(key, answer, ANSWER_TTL)
+        await flight.finish()
+    except Exception:
+        await flight.finish(failed=True)
+    finally:
+        _flights[asyncio.get_running_loop()].pop(key, None)
+        if lock_key:
+            await cache.adelete(lock_key)
+
+
+async def _wait_for_other_process(key, lock_key):
+    waited = 0
+    while waited < WAIT_TIMEOUT:
+        await asyncio.sleep(POLL_INTERVAL)
+        waited += POLL_INTERVAL
+        answer = await cache.aget(key)
+        if answer is not None:
+            return answer
+        if await cache.aget(lock_key) is None:
+            return None
+    return None
+
+
+async def cached_answer(product, question, produce):
+    """
+    Асинхронно віддає шматки відповіді: з кешу, з чужого польоту або
+    запускаючи ``produce()`` (async-ітератор шматків від upstream).
+    Запит до upstream не обривається, якщо клієнт пішов, — відповідь
+    однаково потрапить у кеш для наступних.
+    """
+    key = answer_key(product, question)
+    answer = await cache.aget(key)
+    if answer is not None:
+        yield answer
+        return
+
+    flights = _flights.setdefault(asyncio.get_running_loop(), {})
+    flight = flights.get(key)
+    if flight is None:
+        lock_key = f"{key}:lock"
+        acquired = await cache.aadd(lock_key, 1, LOCK_TTL)
+        flight = flights.get(key)
+        if flight is None and not acquired:
+            answer = await _wait_for_other_process(key, lock_key)
+            if answer is not None:
+                yield answer
+                return
+            # інший процес не впорався — питаємо самі
+            flight = flights.get(key)
+        if flight is None:
+            flight = flights[key] = _Flight()
+            flight.task = asyncio.create_task(
+                _fly(key, flight, produce, lock_key if acquired else None)
+            )
+
+    async for chunk in flight.follow():
+        yield chunk
@@ -0,0 +1,83 @@
+"""
+AI-консультант на сторінці товару.
+
+``stream_answer`` віддає відповідь OpenAI шматками в міру генерації
+(Responses API зі stream=true), тож async view може одразу пересилати
+їх у браузер як server-sent events. У промпт додаються схожі товари
+магазину з локального індексу (``retrieval``), щоб модель радила лише те,
+що тут справді продається.
+"""
+import json
+
+from django.conf import settings
+
+from marketplace_project import outbound
+
+MODEL = "gpt-4o-mini"
+FALLBACK_ANSWER = "Вибачте, я не зміг згенерувати відповідь 😔"
+
+
+def format_alternatives(alternatives):
+    if not alternatives:
+        return "        - (схожих товарів у магазині зараз немає)"
+    return "\n".join(
+        f"        - {item.title} — {item.price} грн" for item in alternatives
+    )
+
+
+def build_prompt(product, question, alternatives=()):
+    """``alternatives`` — схожі товари магазину з ``retrieval.similar_products``."""
+    return f"""
+        Ти — AI-консультант мого інтернет-магазину.
+
+        ВАЖЛИВІ ПРАВИЛА (ОБОВʼЯЗКОВО):
+        - ❌ ЗАБОРОНЕНО рекомендувати або згадувати будь-які інші інтернет-магазини (Rozetka, Amazon, OLX тощо)
+        - ❌ ЗАБОРОНЕНО давати зовнішні посилання
+        - ✅ МОЖНА рекомендувати ТІЛЬКИ товари, які є в цьому магазині
+        - ✅ Якщо немає альтернатив у магазині — чесно скажи: "На даний момент у магазині немає аналогів"
+        - ✅ Якщо користувач питає про альтернативи — описуй їх ЗАГАЛЬНО, без брендів і без посилань
+
+        Контекст магазину:
+        - Це маркетплейс з товарами продавців
+        - Всі рекомендації повинні звучати так, ніби товар купується ТУТ
+
+        Опис поточного товару:
+        {product.description}
+
+        Схожі товари, які Є в цьому магазині (альтернативи бери ТІЛЬКИ звідси):
+{format_alternatives(alternatives)}
+
+        Питання покупця:
+        {question}
+
+        Відповідай українською мовою, коротко, корисно, без посилань.
+        """
+
+
+async def stream_answer(prompt):
+    """Асинхронно віддає шматки тексту відповіді; кидає виняток при збої."""
+    async with outbound.aclient("openai").stream(
+        "POST",
+        "/v1/responses",
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+        },
+        json={"model": MODEL, "input": prompt, "stream": True},
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            kind = event.get("type")
+            if kind == "response.output_text.delta":
+                yield event["delta"]
+            elif kind in ("error", "response.failed"):
+                raise outbound.UpstreamError(f"openai: {kind}")
+            elif kind == "response.completed":
+                return
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
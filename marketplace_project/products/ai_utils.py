@@ -1,61 +1,120 @@
+"""
+Простий "AI-помічник", який будує пояснення на основі полів товару.
+
+Підказки за ключовими словами описані таблицею ``RULES`` і компілюються
+в один регулярний вираз, тож текст товару сканується один раз, а не
+окремою перевіркою ``in`` на кожне слово. Статична частина відповіді
+(все, крім питання покупця) рахується при збереженні товару і лежить у
+``Product.ai_summary`` з версією ``AI_SUMMARY_VERSION``; зміна таблиці
+правил змінює версію, і старі тексти перебудовуються (на льоту або
+командою regenerate_ai_descriptions).
+"""
+import json
+import re
+import zlib
 from typing import Optional
 
+# (ключові слова, підказка) — порядок підказок у відповіді як у таблиці
+RULES = (
+    (
+        ("вітамін", "vitamin", "біодобав"),
+        "⚕️ Це виглядає як товар для здоровʼя або добавка. "
+        "Зазвичай такі засоби варто приймати згідно інструкції "
+        "та рекомендацій лікаря.",
+    ),
+    (
+        ("шампунь", "hair", "волосся"),
+        "💇‍♀️ Це засіб для догляду за волоссям. "
+        "Зверни увагу, для якого типу волосся він підходить "
+        "(сухе, жирне, фарбоване тощо).",
+    ),
+    (
+        ("крем", "skin", "шкіри", "spf"),
+        "🧴 Ймовірно, це засіб для догляду за шкірою. "
+        "Перевір, чи підходить він для твого типу шкіри "
+        "та чи є захист від сонця (SPF), якщо це важливо.",
+    ),
+)
+
+AI_SUMMARY_VERSION = zlib.crc32(json.dumps(RULES, ensure_ascii=False).encode()) & 0x7FFFFFFF
+
+
+def _compile(rules):
+    # lookahead шукає з кожної позиції найдовше слово, тож збіги можуть
+    # перекриватись; слово -> правила всіх слів, що в ньому містяться
+    # (коротше слово з тієї ж позиції інакше загубилось би)
+    words = {}
+    for index, (keywords, _) in enumerate(rules):
+        for keyword in keywords:
+            words.setdefault(keyword.lower(), set()).add(index)
+    owner = {
+        word: frozenset().union(*(indexes for other, indexes in words.items() if other in word))
+        for word in words
+    }
+    alternatives = sorted(owner, key=len, reverse=True)
+    pattern = re.compile("(?=(%s))" % "|".join(re.escape(word) for word in alternatives))
+    return pattern, owner
 
-def generate_ai_description(product, question: Optional[str] = None) -> str:
-    """
-    Простий "AI-помічник", який будує пояснення на основі полів товару.
-    Тут немає справжнього ШІ, але виглядає як розумна відповідь :)
-    """
 
+_PATTERN, _KEYWORD_RULES = _compile(RULES)
+
+
+def matched_rules(text: str) -> list[int]:
+    """Номери правил, ключові слова яких зустрічаються в тексті."""
+    found = set()
+    for match in _PATTERN.finditer(text.lower()):
+        found |= _KEYWORD_RULES[match.group(1)]
+    return sorted(found)
+
+
+def render_summary(title, description, category_name, price) -> str:
+    """Статична частина відповіді — лише з простих значень (для пулу процесів)."""
+    description = description or ""
     lines: list[str] = []
 
     # Базова інформація
-    lines.append(f"🛍️ Товар: {product.title}")
+    lines.append(f"🛍️ Товар: {title}")
 
     # Опис товару
-    description = getattr(product, "description", "") or ""
     if description:
         lines.append("")
         lines.append(f"📄 Опис: {description}")
 
-    # Категорія (якщо є таке поле)
-    category = getattr(product, "category", None)
-    if category:
-        # category може бути об'єктом або рядком
-        category_name = getattr(category, "name", None) or str(category)
+    if category_name:
         lines.append(f"🏷️ Категорія: {category_name}")
 
-    # Ціна
-    price = getattr(product, "price", None)
     if price is not None:
         lines.append(f"💰 Ціна: {price} грн")
 
     # Трохи "розумних" припущень по ключових словах
-    text_all = (description + " " + product.title).lower()
-
-    if any(word in text_all for word in ["вітамін", "vitamin", "біодобав"]):
+    for index in matched_rules(description + " " + title):
         lines.append("")
-        lines.append(
-            "⚕️ Це виглядає як товар для здоровʼя або добавка. "
-            "Зазвичай такі засоби варто приймати згідно інструкції "
-            "та рекомендацій лікаря."
-        )
+        lines.append(RULES[index][1])
 
-    if any(word in text_all for word in ["шампунь", "hair", "волосся"]):
-        lines.append("")
-        lines.append(
-            "💇‍♀️ Це засіб для догляду за волоссям. "
-            "Зверни увагу, для якого типу волосся він підходить "
-            "(сухе, жирне, фарбоване тощо)."
-        )
+    return "\n".join(lines)
 
-    if any(word in text_all for word in ["крем", "skin", "шкіри", "spf"]):
-        lines.append("")
-        lines.append(
-            "🧴 Ймовірно, це засіб для догляду за шкірою. "
-            "Перевір, чи підходить він для твого типу шкіри "
-            "та чи є захист від сонця (SPF), якщо це важливо."
-        )
+
+def build_summary(product) -> str:
+    # category може бути об'єктом або рядком
+    category = getattr(product, "category", None)
+    category_name = (getattr(category, "name", None) or str(category)) if category else None
+    return render_summary(
+        product.title,
+        getattr(product, "description", ""),
+        category_name,
+        getattr(product, "price", None),
+    )
+
+
+def generate_ai_description(product, question: Optional[str] = None) -> str:
+    """
+    Пояснення про товар: збережена статична частина + відповідь на питання.
+    Тут немає справжнього ШІ, але виглядає як розумна відповідь :)
+    """
+    if getattr(product, "ai_summary_version", None) == AI_SUMMARY_VERSION:
+        lines = [product.ai_summary]
+    else:
+        lines = [build_summary(product)]
 
     # Відповідь на конкретне питання користувача
     if question:
@@ -75,4 +134,4 @@ def generate_ai_description(product, question: Optional[str] = None) -> str:
             "«Поясни, що входить у склад і кому підійде цей продукт»)."
         )
 
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
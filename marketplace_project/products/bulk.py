@@ -0,0 +1,396 @@
+"""
+Масовий імпорт і експорт каталогу продавця.
+
+Імпорт (``ProductImportJob``) читає CSV або JSONL потоково, рядок за
+рядком, і перевіряє кожен рядок тими ж правилами, що й ``ProductForm``
+(категорії — за назвою зі словника, без запиту на рядок). Валідні рядки
+пишуться пачками: існуючі товари продавця (за ``sku``) — ``bulk_update``,
+нові — ``bulk_create``; побічні ефекти, які зазвичай роблять сигнали
+post_save (пошуковий індекс, мініатюри, кеш сторінок), виконуються тут
+же для всієї пачки. Рядок з помилкою записується в job і не зупиняє файл.
+
+Колонка ``stock`` — фізичний залишок: вільний (``Product.stock``) — це
+він мінус одиниці, притримані в кошиках (``orders.StockReservation``).
+Рядки товарів блокуються на час запису пачки, тож резерв не загубиться.
+
+Прогрес зберігається після кожної пачки в тій самій транзакції, тож
+job, який підхопив інший воркер після падіння, продовжує з ``rows_done``
+— у ньому лише рядки, які вже записані.
+
+Експорт віддає ті самі колонки генератором поверх ``.iterator()`` —
+пам'ять не залежить від розміру каталогу, а файл можна імпортувати назад.
+У CSV текст, що починається з ``= + - @``, екранується апострофом (інакше
+Excel виконає його як формулу); імпорт CSV цей апостроф знімає.
+"""
+import csv
+import functools
+import io
+import json
+import os
+import posixpath
+import zipfile
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from marketplace_project import images, page_cache
+from marketplace_project.storage import content_storage, is_hashed
+
+from . import facets, retrieval, search
+from .forms import IMPORT_FORMATS, ProductForm
+from .models import Category, Product, ProductImportJob, SubCategory
+from orders.models import StockReservation
+
+BATCH_SIZE = 500
+# скільки помилкових рядків зберігати в job (рахуються всі)
+MAX_ERRORS = 500
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# колонки файлу: і для імпорту, і для експорту
+COLUMNS = ['sku', 'title', 'description', 'price', 'stock', 'category', 'subcategory', 'image']
+FORM_FIELDS = ['sku', 'title', 'description', 'price', 'stock', 'category', 'subcategory']
+UPDATE_FIELDS = [
+    'title', 'description', 'price', 'stock', 'available', 'category', 'subcategory',
+    'image', 'ai_summary', 'ai_summary_version', 'updated_at',
+]
+# з цих символів Excel / LibreOffice починають формулу
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+# ===========================
+#   ВАЛІДАЦІЯ РЯДКА
+# ===========================
+class LookupChoiceField(forms.ModelChoiceField):
+    """ModelChoiceField, що шукає об'єкт за назвою або pk у готовому словнику."""
+
+    def __init__(self, objects, **kwargs):
+        self.objects = objects
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[str(value).strip().casefold()]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+
+
+def _lookup(model):
+    objects = {}
+    for obj in model.objects.all():
+        objects[str(obj.pk)] = obj
+        objects[obj.name.casefold()] = obj
+    return objects
+
+
+class ProductRowForm(ProductForm):
+    def __init__(self, *args, lookups, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lookups = lookups
+        for name, objects in lookups.items():
+            field = self.fields[name]
+            self.fields[name] = LookupChoiceField(
+                objects, queryset=field.queryset.none(), required=field.required, label=field.label,
+            )
+
+    def clean_sku(self):
+        # артикул у файлі — ключ оновлення, а не конфлікт
+        return self.cleaned_data['sku'].strip()
+
+    def _get_validation_exclusions(self):
+        # категорії вже знайдено в словнику: model.full_clean не перевіряє їх SELECT-ом
+        return {*super()._get_validation_exclusions(), *self.lookups}
+
+
+def _form_data(row):
+    data = {}
+    for key, value in row.items():
+        key = str(key or '').strip().lower()
+        if key in COLUMNS:
+            data[key] = '' if value is None else str(value).strip()
+    return data
+
+
+# ===========================
+#   ЧИТАННЯ
+# ===========================
+def import_format(name):
+    return IMPORT_FORMATS.get(os.path.splitext(name)[1].lower())
+
+
+def _csv_unescape(value):
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def read_rows(file, fmt):
+    """(номер рядка у файлі, dict) або (номер, ValueError) для зіпсованих рядків."""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, {key: _csv_unescape(value) for key, value in row.items()}
+        return
+    for number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f'Некоректний JSON: {e}')
+            continue
+        if not isinstance(row, dict):
+            row = ValueError('Рядок має бути JSON-обʼєктом')
+        yield number, row
+
+
+class Importer:
+    def __init__(self, job, batch_size=BATCH_SIZE):
+        self.job = job
+        self.batch_size = batch_size
+        self.lookups = {'category': _lookup(Category), 'subcategory': _lookup(SubCategory)}
+        self.image_field = Product._meta.get_field('image')
+
+    def run(self):
+        job = self.job
+        fmt = import_format(job.source.name)
+        if fmt is None:
+            raise ValueError(f'Невідомий формат файлу: {job.source.name}')
+
+        archive_file = job.images.open('rb') if job.images else nullcontext()
+        with job.source.open('rb') as source, archive_file as raw_archive:
+            self.archive = zipfile.ZipFile(raw_archive) if raw_archive else None
+            self.members = {}
+            if self.archive:
+                for info in self.archive.infolist():
+                    if not info.is_dir():
+                        self.members[posixpath.normpath(info.filename).lstrip('/')] = info
+
+            job.bytes_total = job.source.size
+            skip = rows = job.rows_done
+            batch, skus = [], set()
+            for number, row in read_rows(source, fmt):
+                if skip:
+                    skip -= 1
+                    continue
+                parsed = self.validate(number, row)
+                if parsed is None:
+                    rows += 1
+                    continue
+                sku = parsed[1]['sku']
+                if sku and sku in skus:
+                    # повтор артикула у файлі: спершу записуємо попередню версію
+                    self.flush(batch, rows, source.tell())
+                    batch, skus = [], set()
+                batch.append(parsed)
+                rows += 1
+                if sku:
+                    skus.add(sku)
+                if len(batch) >= self.batch_size:
+                    self.flush(batch, rows, source.tell())
+                    batch, skus = [], set()
+            self.flush(batch, rows, job.bytes_total)
+
+    def error(self, number, sku, errors):
+        self.job.error_count += 1
+        if len(self.job.errors) < MAX_ERRORS:
+            self.job.errors.append({'line': number, 'sku': sku, 'errors': errors})
+
+    def validate(self, number, row):
+        """(номер, cleaned_data, ім'я фото або None) або None, якщо рядок з помилками."""
+        if isinstance(row, Exception):
+            self.error(number, '', {'__all__': [str(row)]})
+            return None
+        data = _form_data(row)
+        image_value = data.pop('image', '')
+        files, image = {}, None
+        if image_value:
+            member = self.members.get(posixpath.normpath(image_value).lstrip('/'))
+            if member is not None:
+                if member.file_size > MAX_IMAGE_BYTES:
+                    self.error(number, data.get('sku', ''), {'image': ['Фото більше за 10 МБ.']})
+                    return None
+                files['image'] = SimpleUploadedFile(
+                    posixpath.basename(member.filename), self.archive.read(member)
+                )
+            elif is_hashed(image_value) and content_storage.exists(image_value):
+                # ім'я з експорту: файл уже в сховищі
+                image = image_value
+            else:
+                self.error(number, data.get('sku', ''), {'image': [f'Файл {image_value} не знайдено в архіві.']})
+                return None
+
+        form = ProductRowForm(data, files, lookups=self.lookups)
+        if not form.is_valid():
+            errors = {field: [str(message) for message in messages] for field, messages in form.errors.items()}
+            self.error(number, data.get('sku', ''), errors)
+            return None
+
+        if 'image' in files and form.cleaned_data.get('image'):
+            upload = form.cleaned_data['image']
+            upload.seek(0)
+            image = content_storage.save(self.image_field.generate_filename(None, upload.name), upload)
+        return number, form.cleaned_data, image
+
+    def flush(self, batch, rows, position):
+        """Пише пачку; ``rows`` — скільки рядків файлу оброблено разом з нею."""
+        job = self.job
+        now = timezone.now()
+        with transaction.atomic():
+            skus = [data['sku'] for _, data, _ in batch if data['sku']]
+            existing, reserved = {}, {}
+            if skus:
+                existing = {
+                    product.sku: product
+                    for product in Product.objects.select_for_update().filter(seller_id=job.seller_id, sku__in=skus)
+                }
+                reserved = dict(
+                    StockReservation.objects.filter(product__in=existing.values())
+                    .values('product_id').annotate(quantity=Sum('quantity'))
+                    .values_list('product_id', 'quantity').order_by()
+                )
+
+            created, updated, replaced = [], [], []
+            for _, data, image in batch:
+                product = existing.get(data['sku']) if data['sku'] else None
+                if product is None:
+                    product = Product(seller_id=job.seller_id)
+                old_image = product.image.name if product.pk else None
+                for field in FORM_FIELDS:
+                    setattr(product, field, data[field])
+                if image:
+                    product.image = image
+                product.stock = max(product.stock - reserved.get(product.pk, 0), 0)
+                product.available = product.stock > 0
+                product.updated_at = now
+                product.refresh_ai_summary()
+                if product.pk:
+                    updated.append(product)
+                    if old_image and old_image != product.image.name:
+                        replaced.append(old_image)
+                else:
+                    created.append(product)
+
+            Product.objects.bulk_create(created)
+            Product.objects.bulk_update(updated, UPDATE_FIELDS)
+
+            # те, що для одного товару роблять сигнали post_save
+            search.index_batch(created + updated)
+            for product in created + updated:
+                images.schedule(product, 'image', 'image_variants', images.PRODUCT_WIDTHS)
+                transaction.on_commit(functools.partial(retrieval.update_product, product))
+            for name in replaced:
+                transaction.on_commit(functools.partial(content_storage.collect, name))
+            if created or updated:
+                facets.invalidate()
+                page_cache.purge('products', *[f'product:{product.pk}' for product in updated])
+
+            job.rows_done = rows
+            job.created_count += len(created)
+            job.updated_count += len(updated)
+            job.bytes_done = position
+            job.claimed_until = now + CLAIM_TIMEOUT
+            job.save(update_fields=[
+                'rows_done', 'created_count', 'updated_count', 'error_count', 'errors',
+                'bytes_done', 'bytes_total', 'claimed_until',
+            ])
+
+
+# ===========================
+#   ВОРКЕР
+# ===========================
+def claim_next(now=None):
+    """Бере найстаріший job, що чекає або покинутий воркером, який упав."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = ProductImportJob.objects.filter(
+            Q(status='pending') | Q(status='running', claimed_until__lt=now)
+        ).order_by('created_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        job = due.first()
+        if job is None:
+            return None
+        job.status = 'running'
+        job.started_at = job.started_at or now
+        job.claimed_until = now + CLAIM_TIMEOUT
+        job.save(update_fields=['status', 'started_at', 'claimed_until'])
+    return job
+
+
+def run_job(job):
+    try:
+        Importer(job).run()
+    except Exception as e:
+        job.status = 'failed'
+        job.message = str(e)[:2000]
+    else:
+        job.status = 'done'
+        # файли більше не потрібні: результат — у лічильниках і списку помилок
+        job.source.delete(save=False)
+        if job.images:
+            job.images.delete(save=False)
+    job.finished_at = timezone.now()
+    job.claimed_until = None
+    job.save()
+    return job
+
+
+# ===========================
+#   ЕКСПОРТ
+# ===========================
+class _Echo:
+    """"Файл" для csv.writer, що просто повертає записаний рядок."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_safe(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_rows(queryset, fmt='csv', chunk_size=2000):
+    """Генератор частин файлу експорту; рядки читаються з БД пачками."""
+    # фізичний залишок — як очікує імпорт
+    on_hand = F('stock') + Coalesce(Sum('reservations__quantity'), 0)
+    rows = queryset.annotate(on_hand=on_hand).order_by('pk').values_list(
+        'sku', 'title', 'description', 'price', 'on_hand', 'category__name', 'subcategory__name', 'image',
+    )
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        # BOM — щоб Excel відкрив кирилицю як UTF-8
+        yield '\ufeff' + writer.writerow(COLUMNS)
+
+        def encode(row):
+            return writer.writerow([_csv_safe(value) for value in row])
+    else:
+        def encode(row):
+            return json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, default=str) + '\n'
+
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(encode(['' if value is None else value for value in row]))
+        if len(chunk) >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
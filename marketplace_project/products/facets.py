@@ -0,0 +1,170 @@
+"""
+Фасети каталогу: скільки товарів відповідає кожному значенню фільтра
+за поточного вибору (без урахування самого цього фасета).
+
+Один GROUP BY-запит на фасет; результат кешується за "підписом" фільтра
+і версією каталогу, яку скидають сигнали збереження товарів/категорій.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .filters import PRICE_BUCKETS
+from .search import search_products
+
+FACETS_TIMEOUT = 60 * 10
+VERSION_KEY = "products:facets:version"
+
+# фасет -> параметри ProductFilter, які він задає
+FACET_PARAMS = {
+    "category": ("category", "subcategory"),
+    "subcategory": ("subcategory",),
+    "price": ("min_price", "max_price"),
+}
+
+
+def catalog_version() -> int:
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+def invalidate() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def filter_signature(filterset, q: str = "") -> str:
+    filterset.is_valid()
+    cleaned = {
+        name: str(getattr(value, "pk", value))
+        for name, value in filterset.form.cleaned_data.items()
+        if value not in (None, "")
+    }
+    cleaned["q"] = (q or "").strip().lower()
+    raw = json.dumps(cleaned, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _base_queryset(queryset, q):
+    if q:
+        queryset = search_products(queryset, q, ranked=False)
+    return queryset
+
+
+def _filtered_without(filterset, facet, queryset):
+    # уже провалідовані значення основного фільтра: без повторних
+    # запитів ModelChoiceField за вибраною категорією на кожен фасет
+    for name, value in filterset.form.cleaned_data.items():
+        if name not in FACET_PARAMS[facet]:
+            queryset = filterset.filters[name].filter(queryset, value)
+    return queryset.order_by()
+
+
+def _category_facet(queryset, selected):
+    rows = (
+        queryset.filter(category__isnull=False)
+        .values("category_id", "category__name")
+        .annotate(count=Count("id"))
+        .order_by("category__name")
+    )
+    return [
+        {
+            "value": row["category_id"],
+            "label": row["category__name"],
+            "count": row["count"],
+            "selected": str(row["category_id"]) == selected,
+        }
+        for row in rows
+    ]
+
+
+def _subcategory_facet(queryset, selected):
+    rows = (
+        queryset.filter(subcategory__isnull=False)
+        .values("subcategory_id", "subcategory__name")
+        .annotate(count=Count("id"))
+        .order_by("subcategory__name")
+    )
+    return [
+        {
+            "value": row["subcategory_id"],
+            "label": row["subcategory__name"],
+            "count": row["count"],
+            "selected": str(row["subcategory_id"]) == selected,
+        }
+        for row in rows
+    ]
+
+
+def _price_label(low, high):
+    if low is None:
+        return f"до {high} грн"
+    if high is None:
+        return f"від {low} грн"
+    return f"{low}–{high} грн"
+
+
+def _price_facet(queryset, min_price, max_price):
+    whens = []
+    for index, (low, high) in enumerate(PRICE_BUCKETS):
+        bounds = {}
+        if low is not None:
+            bounds["price__gte"] = low
+        if high is not None:
+            bounds["price__lt"] = high
+        whens.append(When(then=Value(index), **bounds))
+
+    counts = dict(
+        queryset.annotate(price_bucket=Case(*whens, output_field=IntegerField()))
+        .values_list("price_bucket")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    facet = []
+    for index, (low, high) in enumerate(PRICE_BUCKETS):
+        selected = (
+            str(low or "") == (min_price or "")
+            and str(high or "") == (max_price or "")
+        )
+        if not counts.get(index) and not selected:
+            continue
+        facet.append({
+            "min_price": low,
+            "max_price": high,
+            "label": _price_label(low, high),
+            "count": counts.get(index, 0),
+            "selected": selected,
+        })
+    return facet
+
+
+def compute_facets(filterset, queryset, q=""):
+    filterset.is_valid()
+    data = filterset.data
+    base = _base_queryset(queryset, q)
+    return {
+        "category": _category_facet(
+            _filtered_without(filterset, "category", base), data.get("category")
+        ),
+        "subcategory": _subcategory_facet(
+            _filtered_without(filterset, "subcategory", base), data.get("subcategory")
+        ),
+        "price": _price_facet(
+            _filtered_without(filterset, "price", base),
+            data.get("min_price"),
+            data.get("max_price"),
+        ),
+    }
+
+
+def get_facets(filterset, queryset, q=""):
+    """Фасети для поточного ``ProductFilter`` (з кешу, якщо є)."""
+    key = f"products:facets:{catalog_version()}:{filter_signature(filterset, q)}"
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(filterset, queryset, q)
+        cache.set(key, facets, FACETS_TIMEOUT)
+    return facets
@@ -1,10 +1,19 @@
 import django_filters
 from .models import Product
 
+# Цінові діапазони для фасетів каталогу (грн, [від, до): товар за 500 — лише в другому)
+PRICE_BUCKETS = [
+    (None, 500),
+    (500, 1000),
+    (1000, 5000),
+    (5000, None),
+]
+
 
 class ProductFilter(django_filters.FilterSet):
     min_price = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
-    max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
+    # верхня межа не включно — як у PRICE_BUCKETS, щоб діапазони не перетинались
+    max_price = django_filters.NumberFilter(field_name='price', lookup_expr='lt')
     title = django_filters.CharFilter(lookup_expr='icontains')
 
     class Meta:
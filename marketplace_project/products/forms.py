@@ -1,10 +1,67 @@
+import os
+import zipfile
+
 from django import forms
-from .models import Product
+from .models import Product, ProductImportJob
+
+# розширення файлу імпорту -> формат
+IMPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
 
 class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
-        fields = ['title', 'description', 'price', 'category', 'subcategory', 'image', 'available']
+        fields = ['title', 'sku', 'description', 'price', 'stock', 'category', 'subcategory', 'image']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
         }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # залишок, який бачив продавець, повертається прихованим полем:
+        # правка застосовується як приріст (див. orders.inventory.adjust)
+        self.fields['stock'].show_hidden_initial = True
+
+    def stock_delta(self):
+        """На скільки продавець змінив залишок відносно показаного у формі."""
+        field = self.fields['stock']
+        try:
+            seen = field.to_python(self.data.get(self.add_initial_prefix('stock')))
+        except forms.ValidationError:
+            seen = None
+        if seen is None:
+            seen = self.initial.get('stock') or 0
+        return self.cleaned_data['stock'] - seen
+
+    def clean_sku(self):
+        # seller не входить у форму, тож унікальність (seller, sku) перевіряємо тут
+        sku = self.cleaned_data['sku'].strip()
+        if sku and self.instance.seller_id:
+            duplicates = Product.objects.filter(seller_id=self.instance.seller_id, sku=sku)
+            if self.instance.pk:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise forms.ValidationError('Товар з таким артикулом уже є.')
+        return sku
+
+
+class ProductImportForm(forms.ModelForm):
+    class Meta:
+        model = ProductImportJob
+        fields = ['source', 'images']
+        labels = {
+            'source': 'Файл CSV або JSONL',
+            'images': 'Zip-архів з фото (необовʼязково)',
+        }
+
+    def clean_source(self):
+        source = self.cleaned_data['source']
+        if os.path.splitext(source.name)[1].lower() not in IMPORT_FORMATS:
+            raise forms.ValidationError('Підтримуються файли .csv, .jsonl і .ndjson.')
+        return source
+
+    def clean_images(self):
+        images = self.cleaned_data.get('images')
+        if images and not zipfile.is_zipfile(images):
+            raise forms.ValidationError('Це не zip-архів.')
+        return images
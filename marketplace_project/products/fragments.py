@@ -0,0 +1,25 @@
+"""
+Версіоновані фрагменти шаблонів (``{% cache %}``): картки товарів і відгуки.
+
+Ключ — назва фрагмента + pk + ``updated_at`` об'єкта + мова, тож після
+збереження об'єкт просто отримує новий ключ, а старий доживає TTL.
+Видалений об'єкт прибирається з кешу одразу (сигнали post_delete).
+Усе, що залежить від користувача (кнопки продавця), — поза фрагментом.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+# те саме значення стоїть у тегах {% cache %} шаблонів
+FRAGMENT_TTL = 60 * 60 * 24
+
+
+def fragment_keys(name, obj):
+    return [
+        make_template_fragment_key(name, [obj.pk, obj.updated_at, code])
+        for code, _ in settings.LANGUAGES
+    ]
+
+
+def invalidate(name, obj):
+    cache.delete_many(fragment_keys(name, obj))
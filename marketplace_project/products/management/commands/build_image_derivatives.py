@@ -0,0 +1,79 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from marketplace_project import images, page_cache
+from products import workers
+from products.models import Product
+from users.models import CustomUser
+
+# (модель, поле, JSON-поле похідних, ширини)
+TARGETS = (
+    (Product, "image", "image_variants", images.PRODUCT_WIDTHS),
+    (CustomUser, "avatar", "avatar_variants", images.AVATAR_WIDTHS),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерує WebP/JPEG-мініатюри для наявних фото товарів і аватарів "
+        "у пулі процесів (media/products, media/avatars)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Перегенерувати навіть актуальні")
+        parser.add_argument("--workers", type=int, default=None)
+
+    def handle(self, *args, **options):
+        processes = options["workers"] or os.cpu_count() or 1
+        done = failed = 0
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=workers.setup) as pool:
+            for model, field, variants_field, widths in TARGETS:
+                rows = (
+                    model.objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True})
+                    .only(field, variants_field).order_by("pk")
+                )
+                # кілька файлів у роботі, а не всі оригінали в пам'яті одразу
+                pending = deque()
+                for instance in rows.iterator(chunk_size=200):
+                    file = getattr(instance, field)
+                    variants = getattr(instance, variants_field) or {}
+                    if variants.get("src") == file.name and not options["force"]:
+                        continue
+                    try:
+                        with file.open("rb") as source:
+                            data = source.read()
+                    except OSError as e:
+                        self.stderr.write(f"{file.name}: {e}")
+                        failed += 1
+                        continue
+                    pending.append((instance, file, variants, pool.submit(workers.render_image, data, widths)))
+                    if len(pending) >= processes * 2:
+                        ok = self._save(model, field, variants_field, *pending.popleft())
+                        done, failed = done + ok, failed + (not ok)
+                while pending:
+                    ok = self._save(model, field, variants_field, *pending.popleft())
+                    done, failed = done + ok, failed + (not ok)
+
+        if done:
+            # картки товарів у списках тепер мають srcset
+            page_cache.purge("products")
+        self.stdout.write(self.style.SUCCESS(f"Оброблено: {done}, помилок: {failed}"))
+
+    def _save(self, model, field, variants_field, instance, file, old, future):
+        try:
+            rendered = future.result()
+        except Exception as e:
+            self.stderr.write(f"{file.name}: {e}")
+            return False
+        variants = images.save_rendered(file.storage, file.name, rendered)
+        # новий updated_at скидає кешовані фрагменти, а тег — сторінку товару
+        if images.store_variants(model, instance.pk, field, file.name, variants_field, variants) and model is Product:
+            page_cache.purge(f"product:{instance.pk}")
+        if old.get("src") and old["src"] != file.name and hasattr(file.storage, "collect"):
+            file.storage.collect(old["src"])
+        self.stdout.write(f"  {file.name}: {variants['widths']}")
+        return True
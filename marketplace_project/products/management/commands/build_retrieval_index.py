@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from products import retrieval
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Будує індекс схожих товарів для AI-консультанта (нове покоління "
+        "файлів у RETRIEVAL_INDEX_DIR; воркери підхоплять його самі)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dim", type=int, help="кількість вимірів (типово RETRIEVAL_DIM)")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        products = (
+            Product.objects.filter(available=True)
+            .select_related("category", "subcategory")
+            .only("title", "description", "category__name", "subcategory__name")
+            .order_by("pk")
+        )
+        rows = (
+            (product.pk, retrieval.product_text(product))
+            for product in products.iterator(chunk_size=options["chunk_size"])
+        )
+        count = retrieval.build(rows, products.count(), dim=options["dim"])
+        self.stdout.write(self.style.SUCCESS(f"Проіндексовано товарів: {count}"))
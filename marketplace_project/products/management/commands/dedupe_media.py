@@ -0,0 +1,124 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from marketplace_project import images
+from marketplace_project.storage import DERIVATIVE_RE, content_storage, is_hashed, referenced_names
+from products.models import Product
+from users.models import CustomUser
+
+# (модель, поле, JSON-поле похідних)
+TARGETS = (
+    (Product, "image", "image_variants"),
+    (CustomUser, "avatar", "avatar_variants"),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносить наявні фото товарів і аватари в контентно-адресоване сховище "
+        "(однакові файли стають одним) і видаляє файли, на які ніхто не посилається."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--gc", action="store_true", help="Лише прибрати осиротілі файли")
+        parser.add_argument("--dry-run", action="store_true", help="Показати, що буде видалено")
+        parser.add_argument(
+            "--min-age", type=int, default=60,
+            help="Не чіпати файли, молодші за стільки хвилин (завантаження в процесі)",
+        )
+
+    def handle(self, *args, **options):
+        if not options["gc"] and not options["dry_run"]:
+            self.relink()
+        self.sweep(options["min_age"], options["dry_run"])
+
+    # ===========================
+    #   ПЕРЕНЕСЕННЯ
+    # ===========================
+    def relink(self):
+        moved = 0
+        for model, field, variants_field in TARGETS:
+            rows = (
+                model.objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True})
+                .only(field, variants_field).order_by("pk")
+            )
+            for instance in rows.iterator(chunk_size=200):
+                old = getattr(instance, field).name
+                if is_hashed(old):
+                    continue
+                try:
+                    with content_storage.open(old, "rb") as source:
+                        new = content_storage.save(old, source)
+                except OSError as e:
+                    self.stderr.write(f"{old}: {e}")
+                    continue
+                variants = self.move_derivatives(old, new, getattr(instance, variants_field) or {})
+                model.objects.filter(pk=instance.pk, **{field: old}).update(
+                    **{field: new, variants_field: variants}
+                )
+                moved += 1
+                self.stdout.write(f"  {old} -> {new}")
+        self.stdout.write(self.style.SUCCESS(f"Перенесено: {moved}"))
+
+    def move_derivatives(self, old, new, variants):
+        """Копіює готові мініатюри під нове ім'я, щоб не рендерити їх знову."""
+        if variants.get("src") != old:
+            return {}
+        for width in variants.get("widths", ()):
+            for ext, _ in images.FORMATS:
+                source = images.derivative_name(old, width, ext)
+                target = images.derivative_name(new, width, ext)
+                if content_storage.exists(target):
+                    continue
+                try:
+                    with content_storage.open(source, "rb") as file:
+                        content_storage.save_exact(target, ContentFile(file.read()))
+                except OSError:
+                    # неповний набір — хай build_image_derivatives перегенерує
+                    return {}
+        return {"src": new, "widths": variants["widths"]}
+
+    # ===========================
+    #   ПРИБИРАННЯ
+    # ===========================
+    def walk(self, directory):
+        try:
+            dirs, files = content_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in dirs:
+            yield from self.walk(posixpath.join(directory, name))
+
+    def sweep(self, min_age, dry_run):
+        referenced = referenced_names()
+        stems = {posixpath.splitext(name)[0] for name in referenced}
+        cutoff = timezone.now() - timedelta(minutes=min_age)
+        roots = {model._meta.get_field(field).upload_to.strip("/") for model, field, _ in TARGETS}
+
+        removed = freed = 0
+        for root in sorted(roots):
+            for name in self.walk(root):
+                if DERIVATIVE_RE.search(name):
+                    orphan = DERIVATIVE_RE.sub("", name) not in stems
+                else:
+                    orphan = name not in referenced
+                if not orphan:
+                    continue
+                # під замком хешу: повторне завантаження того ж вмісту оновлює mtime
+                with content_storage.locked(name):
+                    if content_storage.get_modified_time(name) > cutoff:
+                        continue
+                    freed += content_storage.size(name)
+                    removed += 1
+                    self.stdout.write(f"  - {name}")
+                    if not dry_run:
+                        content_storage.delete(name)
+
+        verb = "Буде видалено" if dry_run else "Видалено"
+        self.stdout.write(self.style.SUCCESS(f"{verb}: {removed} файлів, {freed / 1024:.0f} КБ"))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.bulk import claim_next, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Обробляє масові імпорти товарів. Без --loop розбирає всі, що чекають "
+        "(для cron), з --loop працює як фоновий воркер."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Працювати безперервно")
+        parser.add_argument("--interval", type=float, default=5.0, help="Пауза між перевірками, с")
+
+    def handle(self, *args, **options):
+        while True:
+            while (job := claim_next()) is not None:
+                run_job(job)
+                self.stdout.write(
+                    f"Імпорт #{job.pk}: {job.get_status_display()}, створено {job.created_count}, "
+                    f"оновлено {job.updated_count}, помилок {job.error_count}"
+                )
+
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import search
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Перебудовує повнотекстовий індекс товарів з нуля."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.clear_index()
+            count = search.index_products(Product.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Проіндексовано товарів: {count}"))
@@ -0,0 +1,63 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from products import workers
+from products.ai_utils import AI_SUMMARY_VERSION
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Перебудовує збережені відповіді AI-помічника (Product.ai_summary) "
+        "у пулі процесів. За замовчуванням — лише застарілі версії."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Перебудувати всі товари")
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        products = Product.objects.order_by("pk")
+        if not options["all"]:
+            products = products.exclude(ai_summary_version=AI_SUMMARY_VERSION)
+        rows = products.values_list("pk", "title", "description", "category__name", "price")
+
+        chunk_size = options["chunk_size"]
+
+        def next_chunk(after):
+            return list(rows.filter(pk__gt=after)[:chunk_size])
+
+        def save(rendered):
+            Product.objects.bulk_update(
+                [
+                    Product(pk=pk, ai_summary=text, ai_summary_version=AI_SUMMARY_VERSION)
+                    for pk, text in rendered
+                ],
+                ["ai_summary", "ai_summary_version"],
+            )
+            return len(rendered)
+
+        updated = 0
+        last_pk = 0
+        processes = options["workers"] or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=processes, initializer=workers.setup) as pool:
+            # кілька шматків у роботі одночасно, а не весь каталог у пам'яті
+            window = processes * 2
+            pending = deque()
+            while True:
+                while len(pending) < window:
+                    chunk = next_chunk(last_pk)
+                    if not chunk:
+                        break
+                    last_pk = chunk[-1][0]
+                    pending.append(pool.submit(workers.render_summaries, chunk))
+                if not pending:
+                    break
+                updated += save(pending.popleft().result())
+                self.stdout.write(f"Оновлено: {updated}")
+
+        self.stdout.write(self.style.SUCCESS(f"Готово, товарів: {updated}"))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+def stock_from_availability(apps, schema_editor):
+    # кількостей досі не було: доступний товар — одна одиниця на складі
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(available=True).update(stock=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(stock_from_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:03
+
+import marketplace_project.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=marketplace_project.storage.ContentAddressedStorage(), upload_to='products/'),
+        ),
+    ]
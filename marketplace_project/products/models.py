@@ -1,6 +1,15 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
+from marketplace_project.storage import content_storage
+
+from .ai_utils import AI_SUMMARY_VERSION, build_summary
+
+# поля, з яких складається Product.ai_summary
+AI_SUMMARY_SOURCE_FIELDS = {'title', 'description', 'price', 'category'}
+# агрегати відгуків: їх змінює лише reviews.ratings F-оновленнями
+RATING_FIELDS = {'rating_avg', 'rating_count', *(f'rating_{stars}' for stars in range(1, 6))}
+
 
 class Category(models.Model):
     name = models.CharField(max_length=64, unique=True)
@@ -16,6 +25,8 @@ class Product(models.Model):
         related_name='products'
     )
     title = models.CharField(max_length=255)
+    # 🔹 Артикул продавця: ключ оновлення при масовому імпорті (див. products.bulk)
+    sku = models.CharField(max_length=64, blank=True)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     category = models.ForeignKey(
@@ -31,13 +42,73 @@ class Product(models.Model):
         blank=True,
         related_name='products'
     )
-    image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image = models.ImageField(
+        upload_to='products/', storage=content_storage, blank=True, null=True, db_index=True,
+    )
+    # 🔹 Згенеровані мініатюри (див. marketplace_project.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # 🔹 Залишок на складі; available = stock > 0 (див. save та orders.inventory)
+    stock = models.PositiveIntegerField(default=0)
     available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # 🔹 Версія для кешованих фрагментів шаблонів (див. products.fragments)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # 🔹 Агрегати відгуків (оновлює reviews.ratings)
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    # 🔹 Статична частина відповіді AI-помічника (див. ai_utils)
+    ai_summary = models.TextField(blank=True, editable=False)
+    ai_summary_version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # keyset-пагінація каталогу: ORDER BY title, id
+            models.Index(fields=['title', 'id'], name='product_title_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['seller', 'sku'], condition=~models.Q(sku=''), name='unique_seller_sku',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.available = self.stock > 0
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # застарілий екземпляр не перетирає відгуки, що прийшли після його читання
+            update_fields = {
+                field.name for field in self._meta.concrete_fields if not field.primary_key
+            } - RATING_FIELDS - self.get_deferred_fields()
+        if update_fields is not None:
+            update_fields = {'updated_at', *update_fields}
+            if 'stock' in update_fields:
+                update_fields.add('available')
+            if update_fields & AI_SUMMARY_SOURCE_FIELDS:
+                update_fields |= {'ai_summary', 'ai_summary_version'}
+            kwargs['update_fields'] = update_fields
+        if update_fields is None or 'ai_summary' in update_fields:
+            self.refresh_ai_summary()
+        super().save(*args, **kwargs)
+
+    def refresh_ai_summary(self):
+        self.ai_summary = build_summary(self)
+        self.ai_summary_version = AI_SUMMARY_VERSION
+
+    @property
+    def rating_histogram(self):
+        """[(зірки, кількість), ...] від 5 до 1"""
+        return [(stars, getattr(self, f'rating_{stars}')) for stars in range(5, 0, -1)]
+
 class SubCategory(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='subcategories')
     name = models.CharField(max_length=64, unique=True)
@@ -63,4 +134,64 @@ class SellerReview(models.Model):
     def __str__(self):
         return f"Review for {self.seller} by {self.reviewer}"
 
+    def save(self, *args, **kwargs):
+        # відгук і репутація продавця (post_save) пишуться в одній транзакції
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class ProductImportJob(models.Model):
+    """
+    Масовий імпорт товарів продавця з CSV/JSONL (і zip з фото). Обробляє
+    окремий воркер (команда process_import_jobs), прогрес пишеться сюди ж.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Очікує'),
+        ('running', 'Виконується'),
+        ('done', 'Завершено'),
+        ('failed', 'Помилка'),
+    )
+
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='import_jobs'
+    )
+    source = models.FileField(upload_to='imports/')
+    images = models.FileField(upload_to='imports/', blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    # 🔹 Прогрес: рядки (з помилковими) і прочитані байти джерела
+    rows_done = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    bytes_done = models.PositiveBigIntegerField(default=0)
+    bytes_total = models.PositiveBigIntegerField(default=0)
+    # [{"line": 12, "sku": "...", "errors": {"price": ["..."]}}, ...] — перші bulk.MAX_ERRORS
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # до коли job належить воркеру, що його взяв (далі його може підхопити інший)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'Import #{self.pk} ({self.status})'
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
 
+    @property
+    def percent(self):
+        if self.status == 'done':
+            return 100
+        if not self.bytes_total:
+            return 0
+        return min(99, int(self.bytes_done * 100 / self.bytes_total))
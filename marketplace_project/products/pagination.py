@@ -0,0 +1,101 @@
+"""
+Keyset (cursor) пагінація для каталогу.
+
+Замість OFFSET + COUNT(*) кожна сторінка — це "WHERE (ключ) > (останній
+ключ попередньої сторінки) ORDER BY ключ LIMIT n+1", тож вартість не росте
+з номером сторінки. Позиція передається непрозорим підписаним токеном
+``after``; загальна кількість не рахується.
+"""
+import json
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404
+
+
+class CursorSerializer:
+    """JSON-серіалізатор для signing, що вміє datetime / Decimal."""
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"), cls=DjangoJSONEncoder).encode("latin-1")
+
+    def loads(self, data):
+        return json.loads(data.decode("latin-1"))
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor, has_previous):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    ``ordering`` — поля сортування (з "-" для спадання); останнє поле
+    має бути унікальним (зазвичай "pk"), а поля — без NULL.
+    """
+
+    salt = "products.cursor"
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+
+    @property
+    def _salt(self):
+        # токен від іншого сортування не підходить
+        return f"{self.salt}:{','.join(self.ordering)}"
+
+    def encode(self, obj) -> str:
+        values = [getattr(obj, field.lstrip("-")) for field in self.ordering]
+        return signing.dumps(values, salt=self._salt, serializer=CursorSerializer, compress=True)
+
+    def decode(self, token: str) -> list:
+        try:
+            values = signing.loads(token, salt=self._salt, serializer=CursorSerializer)
+        except signing.BadSignature:
+            raise Http404("Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise Http404("Invalid cursor")
+        return values
+
+    def _after(self, values) -> Q:
+        # (a, b, c) > (va, vb, vc) з урахуванням напрямку кожного поля
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            branch = Q(**{f"{name}__{lookup}": values[i]})
+            for prev_field, prev_value in zip(self.ordering[:i], values[:i]):
+                branch &= Q(**{prev_field.lstrip("-"): prev_value})
+            condition |= branch
+        return condition
+
+    def page(self, token=None) -> CursorPage:
+        queryset = self.queryset
+        if token:
+            queryset = queryset.filter(self._after(self.decode(token)))
+
+        rows = list(queryset[: self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        next_cursor = self.encode(rows[-1]) if has_next else None
+        return CursorPage(rows, next_cursor, has_previous=bool(token))
@@ -0,0 +1,440 @@
+"""
+Локальний індекс схожих товарів для AI-консультанта.
+
+Кожен доступний товар — нормований вектор хешованих ознак (основи слів
+і пари сусідніх основ з ``search``) з IDF-вагами. Вимірів багато
+(``RETRIEVAL_DIM``, типово 2**18), щоб різні ознаки рідко потрапляли в
+один вимір, тож вектори дуже розріджені і зберігаються двічі:
+
+* інвертовано (CSR по вимірах): ``offsets-<postings>.npy`` — межі списку
+  кожного виміру в ``rows-<postings>.npy`` (рядки товарів) і
+  ``values-<postings>.npy`` (ваги). Запит має до ``QUERY_DIMS``
+  ненульових вимірів, і пошук читає тільки їхні списки, а не весь індекс;
+* по товарах: рядок фіксованої ширини ``FEATURES`` (``dims-`` /
+  ``weights-<generation>.npy``) поруч з ``ids-`` і ``changed-<generation>.npy``.
+
+Ознаки понад ``FEATURES`` (хвіст довгого опису) відкидаються — лишаються
+найчастіші, назва завжди серед них. ``meta.json`` вказує на поточні файли.
+
+Індекс будує команда build_retrieval_index, воркери відкривають файли
+через memmap (спільні сторінки ОС, без копії в кожен процес). Списки
+вимірів незмінні до перебудови: збереження товару під файловим
+блокуванням переписує лише його рядок і позначає його в ``changed`` —
+такі рядки пошук рахує з рядка, а не зі списків. Їх мало між
+перебудовами, тож і ціна пошуку від них майже не росте.
+"""
+import json
+import logging
+import os
+import threading
+import uuid
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+from .search import stem, tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: оновлення без міжпроцесного блокування
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DIM = 2 ** 18
+# скільки ознак товару зберігати (рядок фіксованої ширини)
+FEATURES = 128
+# запас вільних рядків для нових товарів між перебудовами
+GROWTH = 1.25
+# скільки найвагоміших вимірів запиту враховувати при пошуку
+QUERY_DIMS = 32
+MIN_SCORE = 0.05
+
+
+def index_dir():
+    return getattr(settings, "RETRIEVAL_INDEX_DIR", settings.BASE_DIR / "var" / "retrieval")
+
+
+def default_dim():
+    return getattr(settings, "RETRIEVAL_DIM", DIM)
+
+
+# ===========================
+#   ВЕКТОРИ
+# ===========================
+def _features(text):
+    terms = [stem(token) for token in tokenize(text) if len(token) >= 2]
+    return terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+
+
+def hashed_counts(text, dim, width=FEATURES):
+    """
+    Текст -> (виміри, частоти) ознак (signed hashing trick); не більше
+    ``width`` найчастіших.
+    """
+    counts = {}
+    for feature in _features(text):
+        h = zlib.crc32(feature.encode())
+        counts[h % dim] = counts.get(h % dim, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    dims = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    nonzero = values != 0
+    dims, values = dims[nonzero], values[nonzero]
+    if len(dims) > width:
+        top = np.argpartition(-np.abs(values), width - 1)[:width]
+        dims, values = dims[top], values[top]
+    return dims, values
+
+
+def _weigh(dims, counts, idf):
+    """Частоти -> IDF-ваги з одиничною нормою по останній осі."""
+    weights = np.sign(counts) * np.log1p(np.abs(counts)) * idf[dims]
+    norms = np.linalg.norm(weights, axis=-1, keepdims=True)
+    np.divide(weights, norms, out=weights, where=norms > 0)
+    return weights
+
+
+def product_text(product):
+    parts = [product.title, product.title]  # назва важить більше за опис
+    if product.category_id:
+        parts.append(product.category.name)
+    if product.subcategory_id:
+        parts.append(product.subcategory.name)
+    parts.append(product.description)
+    return " ".join(parts)
+
+
+# ===========================
+#   ІНДЕКС
+# ===========================
+class RetrievalIndex:
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        generation, postings = meta["generation"], meta["postings"]
+        self.dims = np.load(path / f"dims-{generation}.npy", mmap_mode="r+")
+        self.weights = np.load(path / f"weights-{generation}.npy", mmap_mode="r+")
+        self.ids = np.load(path / f"ids-{generation}.npy", mmap_mode="r+")
+        self.changed = np.load(path / f"changed-{generation}.npy", mmap_mode="r+")
+        self.offsets = np.load(path / f"offsets-{postings}.npy", mmap_mode="r")
+        self.posting_rows = np.load(path / f"rows-{postings}.npy", mmap_mode="r")
+        self.posting_values = np.load(path / f"values-{postings}.npy", mmap_mode="r")
+        self.idf = np.load(path / f"idf-{postings}.npy")
+
+    @property
+    def generation(self):
+        return self.meta["generation"]
+
+    @property
+    def dim(self):
+        return self.meta["dim"]
+
+    def embed(self, text):
+        """Текст -> (виміри, ваги) у тому ж вигляді, що й рядки індексу."""
+        dims, counts = hashed_counts(text, self.dim, self.dims.shape[1])
+        return dims, _weigh(dims, counts, self.idf)
+
+    def _changed_scores(self, rows, dims, weights):
+        """Скори рядків, змінених після перебудови, — з їхніх рядків."""
+        order = np.argsort(dims)
+        dims, weights = dims[order], weights[order]
+        row_dims = self.dims[rows]
+        at = np.minimum(np.searchsorted(dims, row_dims), len(dims) - 1)
+        query = np.where(dims[at] == row_dims, weights[at], 0)
+        return (query * self.weights[rows]).sum(axis=1)
+
+    def search(self, vector, k=5, exclude=()):
+        """Top-k (product_id, score) за косинусною схожістю."""
+        dims, weights = vector
+        if len(dims) > QUERY_DIMS:
+            top = np.argpartition(-np.abs(weights), QUERY_DIMS - 1)[:QUERY_DIMS]
+            dims, weights = dims[top], weights[top]
+        if not len(dims):
+            return []
+
+        rows, values = [], []
+        for dim, weight in zip(dims.tolist(), weights.tolist()):
+            start, end = self.offsets[dim], self.offsets[dim + 1]
+            if start < end:
+                rows.append(self.posting_rows[start:end])
+                values.append(self.posting_values[start:end] * weight)
+        changed = np.flatnonzero(self.changed)
+        hits = np.concatenate(rows + [changed]).astype(np.int64)
+        if not len(hits):
+            return []
+        candidates, at = np.unique(hits, return_inverse=True)
+        posted = sum(len(chunk) for chunk in rows)
+        scores = np.bincount(
+            at[:posted], weights=np.concatenate(values) if values else None, minlength=len(candidates)
+        )
+        if len(changed):
+            # списки для цих рядків застарілі — рахуємо заново з рядка
+            scores[at[posted:]] = self._changed_scores(changed, dims, weights)
+
+        ids = self.ids[candidates]
+        scores[ids == 0] = -1.0
+        if exclude:
+            scores[np.isin(ids, list(exclude))] = -1.0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (int(ids[i]), float(scores[i]))
+            for i in top if scores[i] >= MIN_SCORE
+        ]
+
+    def _row(self, product_id):
+        rows = np.flatnonzero(self.ids == product_id)
+        return int(rows[0]) if len(rows) else None
+
+    def upsert(self, product_id, text):
+        """Повертає False, якщо вільних рядків немає (потрібне нове покоління)."""
+        row = self._row(product_id)
+        if row is None:
+            free = np.flatnonzero(self.ids == 0)
+            if not len(free):
+                return False
+            row = int(free[0])
+        dims, weights = self.embed(text)
+        # спершу вектор, потім id — читач не побачить id зі старим вектором
+        self.weights[row] = 0
+        self.dims[row, :len(dims)] = dims
+        self.dims[row, len(dims):] = 0
+        self.weights[row, :len(weights)] = weights
+        self.changed[row] = True
+        self.ids[row] = product_id
+        self.flush()
+        return True
+
+    def remove(self, product_id):
+        row = self._row(product_id)
+        if row is not None:
+            self.ids[row] = 0
+            self.flush()
+
+    def flush(self):
+        for array in (self.dims, self.weights, self.changed, self.ids):
+            array.flush()
+
+
+FORWARD_FILES = ("dims", "weights", "ids", "changed")
+POSTING_FILES = ("offsets", "rows", "values", "idf")
+
+
+def _new_generation(path, capacity, width):
+    generation = uuid.uuid4().hex[:12]
+    arrays = [
+        np.lib.format.open_memmap(
+            path / f"{name}-{generation}.npy", mode="w+", dtype=dtype, shape=shape
+        )
+        for name, dtype, shape in (
+            ("dims", np.int32, (capacity, width)),
+            ("weights", np.float32, (capacity, width)),
+            ("ids", np.int64, (capacity,)),
+            ("changed", np.bool_, (capacity,)),
+        )
+    ]
+    return generation, *arrays
+
+
+def _switch(path, meta):
+    """Атомарно перемикає meta.json і прибирає файли попереднього покоління."""
+    previous = _read_meta(path)
+    tmp = path / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, path / "meta.json")
+    # відкриті memmap інших процесів тримають свої inode до перезавантаження
+    if previous:
+        stale = [f"{name}-{previous['generation']}.npy" for name in FORWARD_FILES]
+        postings = previous.get("postings")
+        if postings and postings != meta["postings"]:
+            stale += [f"{name}-{postings}.npy" for name in POSTING_FILES]
+        for name in stale:
+            try:
+                os.remove(path / name)
+            except FileNotFoundError:
+                pass
+
+
+def _read_meta(path):
+    try:
+        return json.loads((path / "meta.json").read_text())
+    except FileNotFoundError:
+        return None
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path / "update.lock"
+
+    def __enter__(self):
+        self.file = open(self.path, "a")
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _fill(rows, count, dims, weights, ids, df):
+    """Пише частоти ознак у рядки індексу; повертає кількість товарів."""
+    capacity, width = dims.shape
+    total = 0
+    for product_id, text in rows:
+        if total == capacity:
+            logger.warning("retrieval index: більше товарів, ніж очікувалось (%s)", count)
+            break
+        row_dims, counts = hashed_counts(text, len(df), width)
+        df[row_dims] += 1
+        dims[total, :len(row_dims)] = row_dims
+        weights[total, :len(counts)] = counts
+        ids[total] = product_id
+        total += 1
+    return total
+
+
+def _write_postings(path, name, dims, weights, total, dim, chunk_size):
+    """Інвертує рядки [0, total) у списки (рядок, вага) по вимірах (CSR)."""
+    counts = np.zeros(dim, dtype=np.int64)
+    for start in range(0, total, chunk_size):
+        block = slice(start, min(start + chunk_size, total))
+        counts += np.bincount(dims[block][weights[block] != 0], minlength=dim)
+    offsets = np.zeros(dim + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    # порожній memmap numpy не відкриє — тримаємо хоч один елемент
+    size = max(int(offsets[-1]), 1)
+    rows = np.lib.format.open_memmap(path / f"rows-{name}.npy", mode="w+", dtype=np.int32, shape=(size,))
+    values = np.lib.format.open_memmap(path / f"values-{name}.npy", mode="w+", dtype=np.float32, shape=(size,))
+    cursor = offsets[:-1].copy()
+    for start in range(0, total, chunk_size):
+        block_weights = weights[start:start + chunk_size]
+        row, column = np.nonzero(block_weights)
+        block_dims = dims[start:start + chunk_size][row, column]
+        order = np.argsort(block_dims, kind="stable")
+        block_dims = block_dims[order]
+        # місце в списку виміру: курсор виміру + номер серед однакових у шматку
+        at = cursor[block_dims] + np.arange(len(block_dims)) - np.searchsorted(block_dims, block_dims)
+        rows[at] = row[order] + start
+        values[at] = block_weights[row, column][order]
+        cursor += np.bincount(block_dims, minlength=dim)
+    rows.flush()
+    values.flush()
+    np.save(path / f"offsets-{name}.npy", offsets)
+
+
+def build(rows, count, path=None, dim=None, chunk_size=10_000):
+    """
+    Будує нове покоління індексу з ітератора (product_id, text), де
+    ``count`` — очікувана кількість рядків. Частоти пишуться одразу в
+    memmap-файли, IDF, нормування і списки вимірів — окремими проходами
+    шматками, тож пам'яті потрібно на один шматок, а не на весь каталог.
+    """
+    path = path or index_dir()
+    path.mkdir(parents=True, exist_ok=True)
+    dim = dim or default_dim()
+
+    capacity = max(int(count * GROWTH), count + 64)
+    generation, dims, weights, ids, changed = _new_generation(path, capacity, FEATURES)
+    df = np.zeros(dim, dtype=np.float64)
+    total = _fill(rows, count, dims, weights, ids, df)
+
+    idf = np.log((1 + total) / (1 + df)).astype(np.float32) + 1.0
+    for start in range(0, total, chunk_size):
+        block = slice(start, start + chunk_size)
+        weights[block] = _weigh(dims[block], weights[block], idf)
+    _write_postings(path, generation, dims, weights, total, dim, chunk_size)
+    np.save(path / f"idf-{generation}.npy", idf)
+    for array in (dims, weights, ids, changed):
+        array.flush()
+
+    meta = {"generation": generation, "postings": generation, "dim": dim, "capacity": capacity}
+    with _FileLock(path):
+        _switch(path, meta)
+    return total
+
+
+def _grow(index):
+    """Копіює рядки в більше покоління, коли вільні скінчились; списки вимірів спільні."""
+    old, width = index.dims.shape
+    generation, dims, weights, ids, changed = _new_generation(index.path, old * 2, width)
+    dims[:old] = index.dims
+    weights[:old] = index.weights
+    ids[:old] = index.ids
+    changed[:old] = index.changed
+    for array in (dims, weights, ids, changed):
+        array.flush()
+    _switch(index.path, {**index.meta, "generation": generation, "capacity": old * 2})
+
+
+# ===========================
+#   ІНДЕКС ПРОЦЕСУ
+# ===========================
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Відкритий індекс поточного покоління або None, якщо його ще не збудовано."""
+    global _index
+    path = index_dir()
+    meta = _read_meta(path)
+    if meta is None or "postings" not in meta:
+        # індекс ще не збудовано (або він старого формату — до перебудови)
+        return None
+    if _index is None or _index.generation != meta["generation"] or _index.path != path:
+        with _index_lock:
+            if _index is None or _index.generation != meta["generation"] or _index.path != path:
+                try:
+                    _index = RetrievalIndex(path, meta)
+                except FileNotFoundError:
+                    # покоління щойно змінилось — наступний виклик відкриє нове
+                    return _index
+    return _index
+
+
+def update_product(product):
+    """Оновлює рядок товару на місці; недоступні товари з індексу прибираються."""
+    index = get_index()
+    if index is None:
+        return
+    with _FileLock(index.path):
+        index = get_index()
+        if not product.available:
+            index.remove(product.pk)
+            return
+        if not index.upsert(product.pk, product_text(product)):
+            _grow(index)
+            get_index().upsert(product.pk, product_text(product))
+
+
+def remove_product(product_id):
+    index = get_index()
+    if index is None:
+        return
+    with _FileLock(index.path):
+        get_index().remove(product_id)
+
+
+def similar_products(product, question="", k=5):
+    """Доступні товари магазину, схожі на ``product`` з урахуванням питання."""
+    from .models import Product
+
+    index = get_index()
+    if index is None:
+        return []
+    # опис товару в запит не йде — лише назва, категорії і саме питання
+    parts = [product.title]
+    if product.category_id:
+        parts.append(product.category.name)
+    if product.subcategory_id:
+        parts.append(product.subcategory.name)
+    vector = index.embed(" ".join(parts + [question]))
+    # беремо із запасом: склад міг закінчитись без перебудови індексу
+    hits = index.search(vector, k * 2, exclude=(product.pk,))
+    found = Product.objects.filter(available=True).in_bulk([pk for pk, _ in hits])
+    return [found[pk] for pk, _ in hits if pk in found][:k]
@@ -0,0 +1,242 @@
+"""
+Повнотекстовий пошук по товарах.
+
+SQLite: віртуальна таблиця FTS5 ``products_product_fts`` (rowid = id товару).
+PostgreSQL: колонка ``products_product.search_vector`` (tsvector) з GIN-індексом.
+
+Обидві бази отримують уже "застемлений" текст (див. ``analyze``), тому
+українська та англійська морфологія працює однаково на будь-якому бекенді,
+а запит шукає по префіксах основ.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "products_product_fts"
+
+# Ваги полів: назва > категорія > опис
+SQLITE_BM25 = f"bm25({FTS_TABLE}, 10.0, 4.0, 1.0)"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-яіїєґ]")
+
+# Закінчення від довших до коротших — відрізаємо лише одне
+UK_ENDINGS = sorted(
+    [
+        "ами", "ями", "ові", "еві", "єві", "ого", "ому", "ими", "іми",
+        "ати", "ити", "ути", "ють", "ять", "ємо", "имо", "ете",
+        "ите", "ший", "шої", "ий", "ій", "ої", "ою", "ею", "єю", "им",
+        "их", "іх", "ів", "їв", "ах", "ях", "ам", "ям", "ом", "ем", "єм",
+        "ла", "ло", "ли", "ть",
+        "а", "я", "о", "е", "є", "у", "ю", "и", "і", "ї", "ь", "й",
+    ],
+    key=len,
+    reverse=True,
+)
+UK_REFLEXIVE = ("ся", "сь")
+
+EN_SUFFIXES = ("ingly", "edly", "ing", "ies", "ied", "ed", "ly", "s")
+EN_ES_STEMS = ("s", "x", "z", "ch", "sh")
+
+
+def _stem_uk(word: str) -> str:
+    for suffix in UK_REFLEXIVE:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            word = word[: -len(suffix)]
+            break
+    for ending in UK_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[: -len(ending)]
+    return word
+
+
+def _stem_en(word: str) -> str:
+    if word.endswith("ss") or len(word) <= 3:
+        return word
+    # boxes -> box, але shoes -> shoe
+    if word.endswith("es") and word[:-2].endswith(EN_ES_STEMS):
+        return word[:-2]
+    for suffix in EN_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            stem = word[: -len(suffix)]
+            if suffix in ("ies", "ied"):
+                return stem + "y"
+            # running -> runn -> run
+            if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in "lsz":
+                stem = stem[:-1]
+            return stem
+    return word
+
+
+def stem(word: str) -> str:
+    if _CYRILLIC_RE.search(word):
+        return _stem_uk(word)
+    return _stem_en(word)
+
+
+def tokenize(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    # український апостроф не розриває слово: "пʼять" -> "пять"
+    text = re.sub(r"['ʼ’`]", "", text)
+    return _TOKEN_RE.findall(text)
+
+
+def analyze(text: str) -> str:
+    """Текст -> рядок основ, розділених пробілами (для індексу)."""
+    return " ".join(stem(token) for token in tokenize(text))
+
+
+def query_terms(q: str) -> list[str]:
+    terms = []
+    for token in tokenize(q):
+        term = stem(token)
+        if len(term) >= 2 and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _documents(product) -> tuple[str, str, str]:
+    category_names = " ".join(
+        obj.name for obj in (product.category, product.subcategory) if obj
+    )
+    return (
+        analyze(product.title),
+        analyze(category_names),
+        analyze(product.description),
+    )
+
+
+# ---------- індексація ----------
+
+def index_product(product) -> None:
+    title, category, body = _documents(product)
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, category, body) "
+                "VALUES (%s, %s, %s, %s)",
+                [product.pk, title, category, body],
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                "UPDATE products_product SET search_vector = "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C') "
+                "WHERE id = %s",
+                [title, category, body, product.pk],
+            )
+
+
+def unindex_product(product_id: int) -> None:
+    if connection.vendor != "sqlite":
+        # у PostgreSQL tsvector видаляється разом із рядком товару
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def index_batch(products) -> None:
+    """``index_product`` для пачки: кожен запит — один executemany на всю пачку."""
+    rows = [(product.pk, *_documents(product)) for product in products]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk, *_ in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, category, body) "
+                "VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+        elif connection.vendor == "postgresql":
+            cursor.executemany(
+                "UPDATE products_product SET search_vector = "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C') "
+                "WHERE id = %s",
+                [(title, category, body, pk) for pk, title, category, body in rows],
+            )
+
+
+def index_products(queryset, chunk_size: int = 1000) -> int:
+    count = 0
+    batch = []
+    queryset = queryset.select_related("category", "subcategory")
+    for product in queryset.iterator(chunk_size=chunk_size):
+        batch.append(product)
+        if len(batch) >= chunk_size:
+            index_batch(batch)
+            count += len(batch)
+            batch = []
+    index_batch(batch)
+    return count + len(batch)
+
+
+def clear_index() -> None:
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        elif connection.vendor == "postgresql":
+            cursor.execute("UPDATE products_product SET search_vector = NULL")
+
+
+# ---------- пошук ----------
+
+def search_products(queryset, q: str, ranked: bool = True):
+    """
+    Фільтрує queryset за пошуковим запитом і додає анотацію ``search_rank``
+    (більше — релевантніше), відсортувавши результат за нею.
+    ``ranked=False`` — лише фільтр (для COUNT / GROUP BY).
+    """
+    terms = query_terms(q)
+    if not terms:
+        return queryset
+
+    if connection.vendor == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        queryset = queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+            [match],
+        ))
+        if not ranked:
+            return queryset
+        return (
+            queryset
+            .annotate(search_rank=RawSQL(
+                f"SELECT -{SQLITE_BM25} FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid = products_product.id",
+                [match],
+            ))
+            .order_by("-search_rank", "pk")
+        )
+
+    if connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        queryset = queryset.filter(pk__in=RawSQL(
+            "SELECT id FROM products_product "
+            "WHERE search_vector @@ to_tsquery('simple', %s)",
+            [tsquery],
+        ))
+        if not ranked:
+            return queryset
+        return (
+            queryset
+            .annotate(search_rank=RawSQL(
+                "ts_rank_cd(products_product.search_vector, "
+                "to_tsquery('simple', %s))",
+                [tsquery],
+            ))
+            .order_by("-search_rank", "pk")
+        )
+
+    # інші бекенди — без індексу
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    return queryset.filter(condition)
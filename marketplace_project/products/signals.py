@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from marketplace_project import images, page_cache, storage
+
+from .models import Category, Product, SubCategory
+from . import facets, fragments, retrieval, search
+
+
+@receiver(post_save, sender=Product)
+def index_product_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product_on_delete(sender, instance, **kwargs):
+    search.unindex_product(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+def update_retrieval_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(lambda: retrieval.update_product(instance))
+
+
+@receiver(post_save, sender=Product)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    images.schedule(instance, 'image', 'image_variants', images.PRODUCT_WIDTHS)
+
+
+@receiver(images.variants_stored, sender=Product)
+def refresh_pages_with_new_image(sender, instance, **kwargs):
+    # у картці й на сторінці товару з'явився srcset
+    fragments.invalidate('product_card', instance)
+    page_cache.purge('products', f'product:{instance.pk}')
+
+
+# фото (і його похідні) видаляється, коли на нього не лишилось посилань
+storage.track(Product, 'image')
+
+
+@receiver(post_delete, sender=Product)
+def drop_cached_card(sender, instance, **kwargs):
+    fragments.invalidate('product_card', instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_retrieval_on_delete(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(lambda: retrieval.remove_product(product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    # назва категорії входить у пошуковий документ товару
+    if raw or created:
+        return
+    search.index_products(instance.products.all())
+    if sender is Category:
+        # назва категорії є і в статичній відповіді AI-помічника
+        products = list(instance.products.select_related('category'))
+        for product in products:
+            product.refresh_ai_summary()
+        Product.objects.bulk_update(products, ['ai_summary', 'ai_summary_version'], batch_size=500)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_facets(sender, **kwargs):
+    facets.invalidate()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def purge_product_pages(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    page_cache.purge('products', f'product:{instance.pk}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=SubCategory)
+def purge_catalog_pages(sender, raw=False, **kwargs):
+    # назви категорій — у фасетах списку товарів
+    if raw:
+        return
+    page_cache.purge('products')
@@ -1,3 +1,697 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import iscoroutinefunction
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+from PIL import Image
+
+from marketplace_project import images
+from marketplace_project.query_budget import QueryBudgetMiddleware
+from marketplace_project.testing import QueryBudgetTestCase
+
+from . import ai_utils, fragments, retrieval, search, workers
+from .ai_cache import cached_answer
+from .ai_utils import AI_SUMMARY_VERSION, render_summary
+from .bulk import Importer, claim_next, run_job
+from .facets import compute_facets, get_facets
+from .filters import ProductFilter
+from .models import Category, Product, ProductImportJob, SubCategory
+from .pagination import CursorPaginator, CursorSerializer
+from .search import search_products
+from orders.models import StockReservation
+from users.models import CustomUser
+
+
+class ProductQueryBudgetTests(QueryBudgetTestCase):
+    def test_product_list(self):
+        self.assertWithinBudget(self.client.get(reverse('product-list')))
+
+    def test_product_list_search_and_filter(self):
+        url = reverse('product-list')
+        self.assertWithinBudget(self.client.get(url, {'q': 'шампунь'}))
+        self.assertWithinBudget(self.client.get(url, {'category': self.category.pk}))
+
+    def test_product_list_as_seller(self):
+        self.login(self.seller)
+        self.assertWithinBudget(self.client.get(reverse('product-list')))
+
+    def test_product_list_served_from_page_cache(self):
+        url = reverse('product-list')
+        self.client.get(url)
+        log = self.assertWithinBudget(self.client.get(url))
+        self.assertEqual(len(log), 0)
+
+    def test_product_detail(self):
+        self.assertWithinBudget(self.client.get(reverse('product-detail', args=[self.product.pk])))
+
+    def test_product_detail_as_seller(self):
+        self.login(self.seller)
+        self.assertWithinBudget(self.client.get(reverse('product-detail', args=[self.product.pk])))
+
+    def test_product_forms(self):
+        self.login(self.seller)
+        self.assertWithinBudget(self.client.get(reverse('product-add')))
+        self.assertWithinBudget(self.client.get(reverse('product-edit', args=[self.product.pk])))
+        self.assertWithinBudget(self.client.get(reverse('product-delete', args=[self.product.pk])))
+
+    def test_product_edit_keeps_concurrent_changes(self):
+        self.login(self.seller)
+        product = self.product
+        # поки продавець редагував, кошик притримав одиницю, а відгук оновив рейтинг
+        Product.objects.filter(pk=product.pk).update(stock=F('stock') - 1, rating_count=42)
+        data = {
+            'title': 'Нова назва', 'sku': product.sku, 'description': product.description,
+            'price': product.price, 'stock': 60, 'initial-stock': 50,
+            'category': product.category_id, 'subcategory': product.subcategory_id,
+        }
+        response = self.client.post(reverse('product-edit', args=[product.pk]), data)
+        self.assertWithinBudget(response, status=302)
+        product.refresh_from_db()
+        self.assertEqual(product.title, 'Нова назва')
+        self.assertEqual(product.stock, 59)
+        self.assertEqual(product.rating_count, 42)
+
+        # списати більше за вільний залишок не можна
+        data.update(stock=0, **{'initial-stock': 100})
+        self.client.post(reverse('product-edit', args=[product.pk]), data)
+        product.refresh_from_db()
+        self.assertEqual((product.stock, product.available), (0, False))
+
+    def test_price_buckets_do_not_overlap(self):
+        # межі діапазонів: кожен товар рахується рівно в одному
+        Product.objects.update(price=10)
+        Product.objects.filter(pk__in=[p.pk for p in self.products[:3]]).update(price=500)
+        Product.objects.filter(pk=self.products[3].pk).update(price=1000)
+        Product.objects.filter(pk=self.products[4].pk).update(price=5000)
+        facets = compute_facets(ProductFilter({}, queryset=Product.objects.all()), Product.objects.all())
+        counts = {(item['min_price'], item['max_price']): item['count'] for item in facets['price']}
+        self.assertEqual(counts, {(None, 500): 10, (500, 1000): 3, (1000, 5000): 1, (5000, None): 1})
+
+        response = self.client.get(reverse('product-list'), {'min_price': 500, 'max_price': 1000})
+        self.assertEqual(
+            sorted(p.pk for p in response.context['products']), [p.pk for p in self.products[:3]]
+        )
+
+    def test_ai_help(self):
+        url = reverse('product-ai-help', args=[self.product.pk])
+        self.assertWithinBudget(self.client.post(url, {'question': 'Кому підійде?'}))
+
+    async def test_ai_chat_async_middleware(self):
+        # під ASGI middleware не загортає async view в sync_to_async, а запити
+        # з потоків sync_to_async все одно потрапляють у лог запиту
+        url = reverse('product-ai-chat', args=[self.product.pk])
+        response = await self.async_client.post(url, {'question': ''})
+        self.assertWithinBudget(response)
+        self.assertEqual(len(response.query_log), 1)
+        self.assertIn('products_product', response.query_log.queries[0][0])
+
+        async def get_response(request):
+            return None
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(get_response)))
+
+    def test_import_pages(self):
+        self.login(self.seller)
+        self.assertWithinBudget(self.client.get(reverse('product-import')))
+        job = ProductImportJob.objects.create(seller=self.seller, source='imports/x.csv')
+        url = reverse('product-import-job', args=[job.pk])
+        self.assertWithinBudget(self.client.get(url))
+        self.assertWithinBudget(self.client.get(url, HTTP_HX_REQUEST='true'))
+
+    def test_export(self):
+        self.login(self.seller)
+        response = self.client.get(reverse('product-export'))
+        self.assertWithinBudget(response)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), self.ROWS * 3 // 2 + 2)
+
+    def test_seller_reviews(self):
+        response = self.client.get(reverse('seller-feedback', args=[self.seller.pk]))
+        self.assertWithinBudget(response)
+        self.assertEqual(len(response.context['reviews']), self.ROWS)
+
+
+class ProductBulkImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('bulk-seller', password='x', is_seller=True)
+        cls.category = Category.objects.create(name='Догляд')
+        cls.subcategory = SubCategory.objects.create(category=cls.category, name='Шампуні')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(self.seller)
+
+    def upload(self, name, content, images=None):
+        data = {'source': SimpleUploadedFile(name, content.encode())}
+        if images is not None:
+            data['images'] = SimpleUploadedFile('images.zip', images)
+        response = self.client.post(reverse('product-import'), data)
+        job = ProductImportJob.objects.latest('pk')
+        self.assertRedirects(response, reverse('product-import-job', args=[job.pk]))
+        self.assertEqual(claim_next().pk, job.pk)
+        return run_job(job)
+
+    def zip_with_image(self, name):
+        buffer, image = io.BytesIO(), io.BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(image, 'PNG')
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr(name, image.getvalue())
+        return buffer.getvalue()
+
+    def test_csv_import_reports_bad_rows_and_upserts_by_sku(self):
+        job = self.upload('catalog.csv', (
+            'sku,title,description,price,stock,category,subcategory,image\n'
+            'A-1,Шампунь,Для волосся,100.50,3,догляд,Шампуні,photos/a.png\n'
+            'A-2,Без ціни,Опис,,1,Догляд,,\n'
+            'A-3,Бальзам,Опис,20,0,Невідома,,\n'
+            ',Без артикула,Опис,5,1,1,,\n'
+        ), images=self.zip_with_image('photos/a.png'))
+
+        self.assertEqual(job.status, 'done')
+        self.assertEqual((job.rows_done, job.created_count, job.error_count), (4, 2, 2))
+        self.assertEqual([error['line'] for error in job.errors], [3, 4])
+        self.assertIn('price', job.errors[0]['errors'])
+        self.assertIn('category', job.errors[1]['errors'])
+
+        product = Product.objects.get(seller=self.seller, sku='A-1')
+        self.assertEqual(product.subcategory, self.subcategory)
+        self.assertTrue(product.image.name.startswith('products/'))
+        self.assertTrue(product.ai_summary)
+
+        job = self.upload('update.jsonl', json.dumps(
+            {'sku': 'A-1', 'title': 'Шампунь 2', 'description': 'Новий', 'price': 90, 'stock': 0, 'category': 'Догляд'}
+        ) + '\n{broken\n')
+        self.assertEqual((job.created_count, job.updated_count, job.error_count), (0, 1, 1))
+        product.refresh_from_db()
+        self.assertEqual(product.title, 'Шампунь 2')
+        self.assertFalse(product.available)
+        self.assertTrue(product.image)
+
+    def test_duplicate_sku_in_file_applies_last_row(self):
+        job = self.upload('catalog.csv', (
+            'sku,title,description,price,stock,category\n'
+            'B-1,Перший,Опис,1,1,Догляд\n'
+            'B-1,Другий,Опис,2,1,Догляд\n'
+        ))
+        self.assertEqual((job.created_count, job.updated_count), (1, 1))
+        self.assertEqual(Product.objects.get(sku='B-1').title, 'Другий')
+
+    def test_resume_after_crash_skips_only_written_rows(self):
+        flush = Importer.flush
+
+        def crash_on_second_batch(importer, batch, rows, position):
+            if importer.job.created_count:
+                raise RuntimeError('worker died')
+            flush(importer, batch, rows, position)
+
+        content = (
+            'sku,title,description,price,stock,category\n'
+            'E-1,Перший,Опис,1,1,Догляд\n'
+            'E-1,Другий,Опис,2,1,Догляд\n'
+            'E-2,Третій,Опис,3,1,Догляд\n'
+        )
+        with mock.patch.object(Importer, 'flush', crash_on_second_batch):
+            job = self.upload('catalog.csv', content)
+        self.assertEqual((job.status, job.rows_done), ('failed', 1))
+
+        job.source = SimpleUploadedFile('catalog.csv', content.encode())
+        job.status = 'pending'
+        job.save()
+        job = run_job(claim_next())
+        self.assertEqual((job.rows_done, job.created_count, job.updated_count), (3, 2, 1))
+        self.assertEqual(Product.objects.get(sku='E-1').title, 'Другий')
+
+    def test_export_round_trip(self):
+        Product.objects.create(
+            seller=self.seller, sku='C-1', title='Крем', description='Опис',
+            price='12.00', stock=2, category=self.category,
+        )
+        # одиниця в чужому кошику: у файлі фізичний залишок, вільний не змінюється
+        StockReservation.objects.create(
+            cart_key='cart', product=Product.objects.get(sku='C-1'), quantity=1, expires_at=timezone.now(),
+        )
+        response = self.client.get(reverse('product-export'), {'format': 'jsonl'})
+        exported = b''.join(response.streaming_content).decode()
+        self.assertEqual(json.loads(exported)['category'], 'Догляд')
+        self.assertEqual(json.loads(exported)['stock'], 3)
+
+        job = self.upload('export.jsonl', exported)
+        self.assertEqual((job.updated_count, job.error_count), (1, 0))
+        self.assertEqual(Product.objects.filter(seller=self.seller).count(), 1)
+        self.assertEqual(Product.objects.get(sku='C-1').stock, 2)
+
+    def test_csv_export_escapes_formulas_and_imports_back(self):
+        Product.objects.create(
+            seller=self.seller, sku='F-1', title='=HYPERLINK("http://x")', description='- без парабенів',
+            price='5.00', stock=1, category=self.category,
+        )
+        response = self.client.get(reverse('product-export'), {'format': 'csv'})
+        exported = b''.join(response.streaming_content).decode()
+        row = next(csv.DictReader(io.StringIO(exported.lstrip('\ufeff'))))
+        self.assertEqual(row['title'], '\'=HYPERLINK("http://x")')
+        self.assertEqual(row['description'], "'- без парабенів")
+
+        job = self.upload('export.csv', exported)
+        self.assertEqual((job.updated_count, job.error_count), (1, 0))
+        product = Product.objects.get(sku='F-1')
+        self.assertEqual((product.title, product.description), ('=HYPERLINK("http://x")', '- без парабенів'))
+
+    def test_product_form_rejects_duplicate_sku(self):
+        Product.objects.create(seller=self.seller, sku='D-1', title='x', description='x', price=1, stock=1)
+        response = self.client.post(reverse('product-add'), {
+            'title': 'y', 'sku': 'D-1', 'description': 'y', 'price': '1', 'stock': '1',
+            'category': self.category.pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('sku', response.context['form'].errors)
+
+
+class ImageDerivativeTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_backfill_refreshes_cached_product_page(self):
+        image = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(image, 'PNG')
+        self.product.image = SimpleUploadedFile('photo.png', image.getvalue())
+        self.product.save()
+        stamp = Product.objects.get(pk=self.product.pk).updated_at
+
+        url = reverse('product-detail', args=[self.product.pk])
+        self.client.get(url)
+        self.assertEqual(len(self.client.get(url).query_log), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('build_image_derivatives', workers=1, stdout=io.StringIO())
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.image_variants['widths'], [320, 640])
+        self.assertGreater(product.updated_at, stamp)
+        response = self.client.get(url)
+        self.assertGreater(len(response.query_log), 0)
+        self.assertContains(response, '.w320.webp')
+
+    def test_upload_refreshes_cached_pages_once_derivatives_are_ready(self):
+        image = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(image, 'PNG')
+        self.product.image = SimpleUploadedFile('photo.png', image.getvalue())
+        self.product.save()
+
+        urls = [reverse('product-detail', args=[self.product.pk]), reverse('product-list')]
+        for url in urls:
+            self.assertNotContains(self.client.get(url), 'srcset')
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+
+        # те, що після коміту збереження робить пул потоків
+        with self.captureOnCommitCallbacks(execute=True):
+            images._process(Product, self.product.pk, 'image', 'image_variants', images.PRODUCT_WIDTHS)
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'miss')
+            self.assertContains(response, 'srcset')
+
+
+class ProcessPoolWorkerTests(QueryBudgetTestCase):
+    def test_render_summaries_under_spawn(self):
+        # так стартують процеси на macOS/Windows: модуль завдання імпортується заново
+        row = (1, 'Шампунь', 'Опис', 'Догляд', Decimal('10.00'))
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(1, mp_context=context, initializer=workers.setup) as pool:
+            rendered = pool.submit(workers.render_summaries, [row]).result()
+        self.assertEqual(rendered, [(1, render_summary(*row[1:]))])
+
+    def test_render_image_under_spawn(self):
+        image = io.BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(image, 'PNG')
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(1, mp_context=context, initializer=workers.setup) as pool:
+            rendered = pool.submit(workers.render_image, image.getvalue(), (320, 640)).result()
+        self.assertEqual({width for width, *_ in rendered}, {320})
+
+    def test_regenerate_ai_descriptions(self):
+        Product.objects.update(ai_summary='', ai_summary_version=0)
+        call_command('regenerate_ai_descriptions', workers=1, stdout=io.StringIO())
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.ai_summary_version, AI_SUMMARY_VERSION)
+        self.assertIn(product.title, product.ai_summary)
+
+
+class RetrievalIndexTests(TestCase):
+    ROWS = [
+        (1, 'Шампунь для сухого волосся з аргановою олією'),
+        (2, 'Шампунь для жирного волосся'),
+        (3, 'Крем для рук зволожувальний'),
+        (4, 'Зубна паста відбілювальна'),
+    ]
+
+    def setUp(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        settings = override_settings(RETRIEVAL_INDEX_DIR=Path(path))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        retrieval.build(iter(self.ROWS), len(self.ROWS))
+        self.index = retrieval.get_index()
+
+    def search(self, text, **kwargs):
+        return [pk for pk, _ in self.index.search(self.index.embed(text), **kwargs)]
+
+    def test_default_dimension_keeps_files_small(self):
+        self.assertEqual(self.index.dim, retrieval.DIM)
+        self.assertEqual(self.index.dims.shape[1], retrieval.FEATURES)
+        self.assertEqual(self.search('шампунь для волосся', k=2), [2, 1])
+        self.assertEqual(self.search('крем для рук', k=1), [3])
+
+    def test_long_text_keeps_most_frequent_features(self):
+        text = 'шампунь шампунь ' + ' '.join(f'слово{i}' for i in range(300))
+        dims, counts = retrieval.hashed_counts(text, 2 ** 18, 16)
+        self.assertEqual(len(dims), 16)
+        self.assertIn(2.0, np.abs(counts))
+
+    def test_upsert_grows_index_and_remove_hides_product(self):
+        capacity = len(self.index.ids)
+        for pk in range(10, 10 + capacity):
+            with retrieval._FileLock(self.index.path):
+                index = retrieval.get_index()
+                if not index.upsert(pk, f'Крем для рук {pk}'):
+                    retrieval._grow(index)
+                    retrieval.get_index().upsert(pk, f'Крем для рук {pk}')
+        self.index = retrieval.get_index()
+        self.assertEqual(len(self.index.ids), capacity * 2)
+        self.assertIn(3, self.search('крем для рук', k=capacity + 5))
+
+        self.index.remove(3)
+        self.assertNotIn(3, self.search('крем для рук', k=capacity + 5))
+
+    def test_search_reads_only_postings_of_query_dimensions(self):
+        class Untouchable:
+            def __getitem__(self, key):
+                raise AssertionError('пошук не має читати рядки індексу')
+
+        read = []
+
+        class Recorded:
+            def __init__(self, array):
+                self.array = array
+
+            def __getitem__(self, key):
+                chunk = self.array[key]
+                read.append(len(chunk))
+                return chunk
+
+        dims, weights = self.index.embed('шампунь для волосся')
+        self.index.dims = self.index.weights = Untouchable()
+        self.index.posting_rows = Recorded(self.index.posting_rows)
+        self.index.search((dims, weights), k=2)
+
+        offsets = self.index.offsets
+        expected = sum(int(offsets[d + 1] - offsets[d]) for d in dims)
+        self.assertEqual(sum(read), expected)
+        self.assertLess(expected, np.count_nonzero(np.asarray(self.index.posting_values)))
+
+    def test_upserted_product_is_scored_from_its_new_row(self):
+        self.index.upsert(4, 'Крем для ніг')
+        self.assertEqual(self.search('зубна паста', k=4), [])
+        self.assertIn(4, self.search('крем для ніг', k=4))
+
+
+class SearchTests(QueryBudgetTestCase):
+    def found(self, q):
+        return [product.pk for product in search_products(Product.objects.all(), q)]
+
+    def test_stemming(self):
+        self.assertEqual(search.stem('шампунями'), search.stem('шампунь'))
+        self.assertEqual(search.stem('boxes'), 'box')
+        self.assertEqual(search.stem('running'), 'run')
+        self.assertEqual(search.analyze("П'ять ЗУБНИХ"), search.analyze('пʼять зубна'))
+
+    def test_inflected_query_finds_product_and_title_ranks_first(self):
+        mask = Product.objects.create(
+            seller=self.seller, title='Маска для волосся', description='Після шампуню', price=5, stock=1,
+        )
+        found = self.found('шампунями')
+        self.assertEqual(len(found), len(self.products) + 1)
+        self.assertEqual(found[-1], mask.pk)
+
+    def test_index_follows_saves_deletes_and_category_renames(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.title = 'Кондиціонер'
+        product.save()
+        self.assertEqual(self.found('кондиціонери'), [product.pk])
+
+        self.category.name = 'Косметика'
+        self.category.save()
+        self.assertEqual(len(self.found('косметики')), len(self.products))
+
+        product.delete()
+        self.assertEqual(self.found('кондиціонер'), [])
+
+
+@override_settings(CATALOG_CURSOR_PAGINATION=True)
+class CursorPaginationTests(QueryBudgetTestCase):
+    def page(self, **params):
+        response = self.client.get(reverse('product-list'), params)
+        return response, response.context['page_obj'] if response.status_code == 200 else None
+
+    def test_pages_cover_catalog_once_with_duplicate_titles(self):
+        # однакові назви: порядок і межа сторінки тримаються на pk
+        Product.objects.filter(pk__in=[p.pk for p in self.products[10:14]]).update(title='Шампунь 1')
+        expected = list(Product.objects.order_by('title', 'pk').values_list('pk', flat=True))
+        seen, after = [], None
+        while True:
+            response, page = self.page(**({'after': after} if after else {}))
+            self.assertWithinBudget(response)
+            seen += [product.pk for product in page]
+            if not page.has_next():
+                break
+            after = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_tampered_or_foreign_cursor_is_rejected(self):
+        _, page = self.page()
+        token = page.next_cursor
+        payload, signature = token.rsplit(':', 1)
+        self.assertEqual(self.page(after=payload + ':' + signature[::-1])[0].status_code, 404)
+        self.assertEqual(self.page(after='garbage')[0].status_code, 404)
+        # токен каталогу не підходить до сортування пошуку
+        self.assertEqual(self.page(after=token, q='шампунь')[0].status_code, 404)
+
+        paginator = CursorPaginator(Product.objects.all(), 12, ('title', 'pk'))
+        short = signing.dumps(['Шампунь 1'], salt=paginator._salt, serializer=CursorSerializer, compress=True)
+        self.assertEqual(self.page(after=short)[0].status_code, 404)
+
+
+class FacetTests(QueryBudgetTestCase):
+    def facets(self, **params):
+        return get_facets(ProductFilter(params, queryset=Product.objects.all()), Product.objects.all())
+
+    def counts(self, facet):
+        return {item['label']: (item['count'], item['selected']) for item in facet}
+
+    def test_selected_facet_keeps_its_alternatives(self):
+        other = Category.objects.create(name='Гігієна')
+        Product.objects.filter(pk__in=[p.pk for p in self.products[:4]]).update(category=other, subcategory=None)
+        facets = self.facets(category=str(other.pk))
+        # вибір категорії не ховає інші категорії, але звужує підкатегорії
+        self.assertEqual(
+            self.counts(facets['category']),
+            {'Гігієна': (4, True), 'Догляд': (len(self.products) - 4, False)},
+        )
+        self.assertEqual(facets['subcategory'], [])
+        self.assertEqual(sum(item['count'] for item in facets['price']), 4)
+
+    def test_counts_cached_until_catalog_changes(self):
+        self.facets()
+        with self.assertNumQueries(0):
+            cached = self.facets()
+        self.assertEqual(self.counts(cached['category']), {'Догляд': (len(self.products), False)})
+
+        Product.objects.create(
+            seller=self.seller, title='Новий', description='Опис', price=1, stock=1, category=self.category,
+        )
+        self.assertEqual(self.counts(self.facets()['category']), {'Догляд': (len(self.products) + 1, False)})
+
+
+class AnswerCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product(pk=1, title='Шампунь', description='Для волосся', price=Decimal('10.00'))
+        self.calls = 0
+
+    async def produce(self):
+        self.calls += 1
+        for chunk in ('Так, ', 'водостійкий.'):
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def ask(self, question, produce=None):
+        return [chunk async for chunk in cached_answer(self.product, question, produce or self.produce)]
+
+    def test_concurrent_questions_share_one_upstream_call(self):
+        async def main():
+            return await asyncio.gather(
+                self.ask('Чи він водостійкий?'), self.ask('чи він водостійкий'), self.ask('ЧИ ВІН ВОДОСТІЙКИЙ'),
+            )
+
+        answers = asyncio.run(main())
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({''.join(answer) for answer in answers}, {'Так, водостійкий.'})
+        self.assertEqual(asyncio.run(self.ask('Чи він водостійкий?')), ['Так, водостійкий.'])
+        self.assertEqual(self.calls, 1)
+
+        # редагування товару міняє ключ
+        self.product.description = 'Для сухого волосся'
+        asyncio.run(self.ask('Чи він водостійкий?'))
+        self.assertEqual(self.calls, 2)
+
+    def test_failed_flight_is_not_cached(self):
+        async def broken():
+            yield 'Так'
+            # другий клієнт встигає приєднатися до польоту
+            await asyncio.sleep(0.2)
+            raise ConnectionError('upstream')
+
+        async def main():
+            return await asyncio.gather(
+                self.ask('питання', broken), self.ask('питання'), return_exceptions=True,
+            )
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in asyncio.run(main())))
+        self.assertEqual(asyncio.run(self.ask('питання')), ['Так, ', 'водостійкий.'])
+        self.assertEqual(self.calls, 1)
+
+
+class AiRuleEngineTests(TestCase):
+    def test_compiled_rules_match_substring_semantics(self):
+        texts = [
+            'Шампунь для волосся', 'HAIR & SKIN', 'Вітамін C з SPF-кремом', 'hairspray',
+            'Крем-шампунь', 'skincare vitamins', 'Біодобавка', 'Зубна паста', '',
+        ]
+        for text in texts:
+            expected = [
+                index for index, (keywords, _) in enumerate(ai_utils.RULES)
+                if any(word in text.lower() for word in keywords)
+            ]
+            self.assertEqual(ai_utils.matched_rules(text), expected, text)
+
+    def test_overlapping_keywords_of_different_rules(self):
+        rules = ((('hair',), 'A'), (('airs',), 'B'), (('hairspray',), 'C'))
+        pattern, owner = ai_utils._compile(rules)
+        with mock.patch.multiple(ai_utils, _PATTERN=pattern, _KEYWORD_RULES=owner):
+            # слова перекриваються ("hairs") і починаються з однієї позиції ("hairspray")
+            self.assertEqual(ai_utils.matched_rules('hairs'), [0, 1])
+            self.assertEqual(ai_utils.matched_rules('hairspray'), [0, 1, 2])
+
+    def test_stale_summary_is_rebuilt(self):
+        product = Product(title='Крем', description='Для рук', price=Decimal('5.00'))
+        product.ai_summary, product.ai_summary_version = 'застаріле', ai_utils.AI_SUMMARY_VERSION - 1
+        self.assertIn('🧴', ai_utils.generate_ai_description(product))
+        product.ai_summary_version = ai_utils.AI_SUMMARY_VERSION
+        self.assertTrue(ai_utils.generate_ai_description(product).startswith('застаріле'))
+
+
+class FragmentCacheTests(QueryBudgetTestCase):
+    def test_card_follows_product_version(self):
+        self.login(self.buyer)
+        url = reverse('product-list')
+        self.assertContains(self.client.get(url), 'Шампунь 0<')
+        # зміна в обхід save() не міняє версію — картка береться з кешу
+        Product.objects.filter(pk=self.product.pk).update(title='Зміна без версії')
+        self.assertContains(self.client.get(url), 'Шампунь 0<')
+
+        product = Product.objects.get(pk=self.product.pk)
+        product.title = 'Шампунь новий'
+        product.save()
+        self.assertContains(self.client.get(url, {'q': 'шампунь новий'}), 'Шампунь новий<')
+
+    def test_deleted_objects_leave_cache(self):
+        self.login(self.buyer)
+        self.client.get(reverse('product-list'))
+        self.client.get(reverse('product-detail', args=[self.product.pk]))
+        product = Product.objects.get(pk=self.product.pk)
+        review = product.reviews.first()
+        card_keys = fragments.fragment_keys('product_card', product)
+        review_keys = fragments.fragment_keys('review_item', review)
+        self.assertTrue(cache.get_many(card_keys))
+        self.assertTrue(cache.get_many(review_keys))
+
+        review.delete()
+        self.assertEqual(cache.get_many(review_keys), {})
+        product.delete()
+        self.assertEqual(cache.get_many(card_keys), {})
+
+
+class PageCacheTests(QueryBudgetTestCase):
+    def get(self, url, client=None, **params):
+        response = (client or self.client).get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_product_save_purges_list_and_own_page_only(self):
+        url = reverse('product-list')
+        detail = reverse('product-detail', args=[self.product.pk])
+        other = reverse('product-detail', args=[self.products[1].pk])
+        for page in (url, detail, other):
+            self.assertEqual(self.get(page)['X-Page-Cache'], 'miss')
+            self.assertEqual(self.get(page)['X-Page-Cache'], 'hit')
+
+        product = Product.objects.get(pk=self.product.pk)
+        product.title = 'Шампунь 0 новий'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertContains(self.get(url), 'Шампунь 0 новий')
+        self.assertEqual(self.get(detail)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.get(other)['X-Page-Cache'], 'hit')
+
+    def test_language_and_query_string_variants(self):
+        with translation.override('en'):
+            english = reverse('product-list')
+        self.assertNotEqual(english, reverse('product-list'))
+        self.get(reverse('product-list'))
+        self.assertEqual(self.get(english)['X-Page-Cache'], 'miss')
+        self.get(english, category=self.category.pk, q='шампунь')
+        self.assertEqual(self.get(english, q='шампунь', category=self.category.pk)['X-Page-Cache'], 'hit')
+
+    def test_cached_page_gets_own_cart_badge_and_csrf_token(self):
+        url = reverse('product-detail', args=[self.product.pk])
+        token = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+        first = token.search(self.get(url).content.decode()).group(1)
+        shopper = Client()
+        shopper.post(reverse('add-to-cart', args=[self.product.pk]))
+        response = self.get(url, shopper)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, '>1</span>')
+        self.assertNotEqual(token.search(response.content.decode()).group(1), first)
+        self.assertNotContains(self.get(url), '>1</span>')
+
+    def test_logged_in_users_bypass_cache(self):
+        url = reverse('product-list')
+        self.get(url)
+        self.login(self.buyer)
+        self.assertNotIn('X-Page-Cache', self.get(url))
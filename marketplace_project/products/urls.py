@@ -1,4 +1,6 @@
 from django.urls import path
+
+from marketplace_project.page_cache import cache_anonymous_page
 from .views import (
     ProductListView,
     ProductCreateView,
@@ -8,17 +10,25 @@ from .views import (
     SellerReviewListView,
     ProductAIHelpView,
     ProductAIChatView,
-
-
+    ProductImportView,
+    ProductImportJobView,
+    ProductExportView,
 )
 
 urlpatterns = [
-    path('', ProductListView.as_view(), name='product-list'),
+    path('', cache_anonymous_page(ProductListView.as_view(), tags=['products']), name='product-list'),
     path('product/add/', ProductCreateView.as_view(), name='product-add'),
     path('product/<int:pk>/edit/', ProductUpdateView.as_view(), name='product-edit'),
     path('product/<int:pk>/delete/', ProductDeleteView.as_view(), name='product-delete'),
-    path('product/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
-    path('seller/<int:pk>/reviews/', SellerReviewListView.as_view(), name='seller-reviews'),
+    path('import/', ProductImportView.as_view(), name='product-import'),
+    path('import/<int:pk>/', ProductImportJobView.as_view(), name='product-import-job'),
+    path('export/', ProductExportView.as_view(), name='product-export'),
+    path(
+        'product/<int:pk>/',
+        cache_anonymous_page(ProductDetailView.as_view(), tags=['product:{pk}']),
+        name='product-detail',
+    ),
+    path('seller/<int:pk>/reviews/', SellerReviewListView.as_view(), name='seller-feedback'),
     path("product/<int:pk>/ai-help/", ProductAIHelpView.as_view(), name="product-ai-help"),
     path("product/<int:pk>/ai-chat/", ProductAIChatView.as_view(), name="product-ai-chat"),
 ]
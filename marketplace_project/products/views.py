@@ -1,79 +1,83 @@
 from django.views import View
-from django.http import JsonResponse, HttpRequest, HttpResponse
+from django.http import JsonResponse, HttpRequest, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.conf import settings
-from django.shortcuts import get_object_or_404, render
+from django.db import transaction
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView
 )
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils.translation import gettext as _
+from asgiref.sync import sync_to_async
 
-import requests
-
-from .models import Product, SellerReview
-from .forms import ProductForm
+from .models import Product, ProductImportJob, SellerReview
+from .forms import ProductForm, ProductImportForm
+from . import bulk
 from .ai_utils import generate_ai_description
+from .ai_chat import FALLBACK_ANSWER, build_prompt, sse, stream_answer
+from .ai_cache import cached_answer
+from .retrieval import similar_products
+from .search import search_products
+from .pagination import CursorPaginator
+from .filters import ProductFilter
+from .facets import get_facets
+from orders import inventory
+from orders.recommendations import bought_together
+from users.models import CustomUser
 
 
 # ==============================
 #     AI CHAT – ГОЛОВНИЙ АГЕНТ
 # ==============================
 class ProductAIChatView(View):
-    """AI-агент для консультації покупців"""
-
-    def post(self, request, pk):
-        product = get_object_or_404(Product, pk=pk)
+    """
+    AI-агент для консультації покупців. Async: поки OpenAI генерує
+    відповідь, воркер не заблокований. Якщо клієнт приймає
+    text/event-stream — відповідь стрімиться по токенах (SSE),
+    інакше повертається цілою в JSON, як раніше.
+    """
+    query_budget = 2
+
+    async def post(self, request, pk):
+        product = await aget_object_or_404(Product, pk=pk)
         question = request.POST.get("question", "").strip()
 
         if not question:
             return JsonResponse({"answer": "Будь ласка, напишіть питання."})
 
-        # Формуємо промпт
-        prompt = f"""
-        Ти — AI-консультант мого інтернет-магазину.
-
-        ВАЖЛИВІ ПРАВИЛА (ОБОВʼЯЗКОВО):
-        - ❌ ЗАБОРОНЕНО рекомендувати або згадувати будь-які інші інтернет-магазини (Rozetka, Amazon, OLX тощо)
-        - ❌ ЗАБОРОНЕНО давати зовнішні посилання
-        - ✅ МОЖНА рекомендувати ТІЛЬКИ товари, які є в цьому магазині
-        - ✅ Якщо немає альтернатив у магазині — чесно скажи: "На даний момент у магазині немає аналогів"
-        - ✅ Якщо користувач питає про альтернативи — описуй їх ЗАГАЛЬНО, без брендів і без посилань
-
-        Контекст магазину:
-        - Це маркетплейс з товарами продавців
-        - Всі рекомендації повинні звучати так, ніби товар купується ТУТ
-
-        Опис поточного товару:
-        {product.description}
-
-        Питання покупця:
-        {question}
-
-        Відповідай українською мовою, коротко, корисно, без посилань.
-        """
-
-        # Запит до OpenAI
-        response = requests.post(
-            "https://api.openai.com/v1/responses",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-            },
-            json={
-                "model": "gpt-4o-mini",
-                "input": prompt,
-            },
-        )
-
-        data = response.json()
-
-        try:
-            ai_text = data["output"][0]["content"][0]["text"]
-        except Exception:
-            ai_text = "Вибачте, я не зміг згенерувати відповідь 😔"
-
-        return JsonResponse({"answer": ai_text})
+        async def produce():
+            alternatives = await sync_to_async(similar_products)(product, question)
+            async for chunk in stream_answer(build_prompt(product, question, alternatives)):
+                yield chunk
+
+        # однакові питання про той самий товар — з кешу або одним запитом
+        answer = cached_answer(product, question, produce)
+
+        if "text/event-stream" not in request.headers.get("Accept", ""):
+            try:
+                ai_text = "".join([chunk async for chunk in answer])
+            except Exception:
+                ai_text = ""
+            return JsonResponse({"answer": ai_text or FALLBACK_ANSWER})
+
+        async def events():
+            sent = False
+            try:
+                async for chunk in answer:
+                    sent = True
+                    yield sse("token", {"text": chunk})
+            except Exception:
+                if not sent:
+                    yield sse("token", {"text": FALLBACK_ANSWER})
+                yield sse("error", {})
+            yield sse("done", {})
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # nginx не повинен буферизувати стрім
+        response["X-Accel-Buffering"] = "no"
+        return response
 
 
 # =====================================
@@ -81,6 +85,7 @@ class ProductAIChatView(View):
 # =====================================
 class ProductAIHelpView(View):
     """Повторна версія — якщо ти хочеш рендерити HTML через htmx"""
+    query_budget = 1
 
     def post(self, request: HttpRequest, pk: int) -> HttpResponse:
         product = get_object_or_404(Product, pk=pk)
@@ -99,21 +104,26 @@ class ProductAIHelpView(View):
 #   ДЕТАЛІ ТОВАРУ
 # ==============================
 class ProductDetailView(DetailView):
+    query_budget = 6
     model = Product
     template_name = 'products/product_detail.html'
     context_object_name = 'product'
 
+    def get_queryset(self):
+        # продавець з репутацією — тим самим запитом
+        return super().get_queryset().select_related('seller')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        reviews = self.object.reviews.all()
-        if reviews.exists():
-            context['average_rating'] = round(
-                sum(r.rating for r in reviews) / reviews.count(), 1
-            )
+        # агрегати денормалізовані на Product (див. reviews.ratings)
+        if self.object.rating_count:
+            context['average_rating'] = round(self.object.rating_avg, 1)
         else:
             context['average_rating'] = 'Ще немає відгуків'
 
+        context['reviews'] = self.object.reviews.select_related('reviewer')
+        context['bought_together'] = bought_together(self.object)
         return context
 
 
@@ -121,10 +131,17 @@ class ProductDetailView(DetailView):
 #   CRUD ДЛЯ ПРОДАВЦЯ
 # ==============================
 class ProductCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
+    query_budget = {'GET': 5, 'POST': 8}
     template_name = 'products/product_form.html'
     form_class = ProductForm
     success_url = '/products/'
 
+    def get_form_kwargs(self):
+        # продавець потрібен формі ще до валідації (унікальність артикула)
+        kwargs = super().get_form_kwargs()
+        kwargs['instance'] = Product(seller=self.request.user)
+        return kwargs
+
     def form_valid(self, form):
         form.instance.seller = self.request.user
         return super().form_valid(form)
@@ -134,6 +151,7 @@ class ProductCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
 
 
 class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+    query_budget = {'GET': 6, 'POST': 12}
     template_name = 'products/product_form.html'
     form_class = ProductForm
     model = Product
@@ -143,16 +161,37 @@ class ProductUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_queryset(self):
         return Product.objects.filter(seller=self.request.user)
 
+    def get_object(self, queryset=None):
+        # test_func і UpdateView беруть той самий товар — читаємо його раз
+        if not hasattr(self, '_product'):
+            self._product = super().get_object(queryset)
+        return self._product
+
+    def form_valid(self, form):
+        # пишемо лише змінені поля: залишок, який паралельно списали кошики,
+        # і агрегати відгуків не перезаписуються значеннями з форми
+        product = form.instance
+        with transaction.atomic():
+            if 'stock' in form.changed_data:
+                inventory.adjust(product.pk, form.stock_delta())
+                product.stock, product.available = (
+                    Product.objects.filter(pk=product.pk).values_list('stock', 'available').get()
+                )
+            product.save(update_fields=[name for name in form.changed_data if name != 'stock'])
+        self.object = product
+        return HttpResponseRedirect(self.get_success_url())
+
     def test_func(self):
         product = self.get_object()
         return (
             self.request.user.is_authenticated and
             self.request.user.is_seller and
-            product.seller == self.request.user
+            product.seller_id == self.request.user.pk
         )
 
 
 class ProductDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+    query_budget = 5
     model = Product
     template_name = 'products/product_confirm_delete.html'
     success_url = reverse_lazy('product-list')
@@ -162,33 +201,139 @@ class ProductDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return (
             self.request.user.is_authenticated and
             self.request.user.is_seller and
-            product.seller == self.request.user
+            product.seller_id == self.request.user.pk
+        )
+
+
+# ==============================
+#   МАСОВИЙ ІМПОРТ / ЕКСПОРТ
+# ==============================
+class SellerRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
+    def test_func(self):
+        return self.request.user.is_authenticated and self.request.user.is_seller
+
+
+class ProductImportView(SellerRequiredMixin, CreateView):
+    """Завантаження файлу; обробляє воркер process_import_jobs."""
+    query_budget = {'GET': 4, 'POST': 3}
+    form_class = ProductImportForm
+    template_name = 'products/product_import.html'
+
+    def form_valid(self, form):
+        form.instance.seller = self.request.user
+        form.instance.bytes_total = form.cleaned_data['source'].size
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        return reverse('product-import-job', args=[self.object.pk])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['jobs'] = self.request.user.import_jobs.defer('errors')[:10]
+        return context
+
+
+class ProductImportJobView(SellerRequiredMixin, DetailView):
+    """Прогрес імпорту; htmx-запит отримує лише блок прогресу для опитування."""
+    query_budget = 4
+    template_name = 'products/product_import_job.html'
+    context_object_name = 'job'
+
+    def get_queryset(self):
+        return ProductImportJob.objects.filter(seller=self.request.user)
+
+    def get_template_names(self):
+        if self.request.headers.get('HX-Request'):
+            return ['products/partials/import_progress.html']
+        return [self.template_name]
+
+
+class ProductExportView(SellerRequiredMixin, View):
+    """Каталог продавця файлом CSV/JSONL, потоково."""
+    query_budget = 2
+
+    def get(self, request):
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in bulk.EXPORT_CONTENT_TYPES:
+            fmt = 'csv'
+        products = Product.objects.filter(seller=request.user)
+        response = StreamingHttpResponse(
+            bulk.export_rows(products, fmt), content_type=bulk.EXPORT_CONTENT_TYPES[fmt]
         )
+        response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+        return response
 
 
 # ==============================
 #   СПИСКИ
 # ==============================
 class ProductListView(ListView):
+    query_budget = 8
     model = Product
     template_name = 'products/product_list.html'
     context_object_name = 'products'
     paginate_by = 12
     ordering = ['title']
+    # keyset-пагінація (settings.CATALOG_CURSOR_PAGINATION): сортування + унікальний ключ
+    cursor_ordering = ('title', 'pk')
+    search_cursor_ordering = ('-search_rank', 'pk')
 
     def get_queryset(self):
         qs = super().get_queryset()
+        self.filterset = ProductFilter(self.request.GET, queryset=qs)
+        qs = self.filterset.qs
         q = self.request.GET.get('q')
         if q:
-            qs = qs.filter(title__icontains=q)
+            qs = search_products(qs, q)
         return qs
 
+    @property
+    def use_cursor_pagination(self):
+        return getattr(settings, 'CATALOG_CURSOR_PAGINATION', False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination:
+            return super().paginate_queryset(queryset, page_size)
+
+        searching = 'search_rank' in queryset.query.annotations
+        ordering = self.search_cursor_ordering if searching else self.cursor_ordering
+        paginator = CursorPaginator(queryset, page_size, ordering)
+        page = paginator.page(self.request.GET.get('after'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_template_names(self):
+        # htmx "показати ще" отримує лише картки + нову кнопку
+        if self.request.headers.get('HX-Request') and self.request.GET.get('after'):
+            return ['products/partials/product_cards.html']
+        return super().get_template_names()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['cursor_pagination'] = self.use_cursor_pagination
+        context['filter'] = self.filterset
+        context['facets'] = get_facets(
+            self.filterset, Product.objects.all(), self.request.GET.get('q', '')
+        )
+        return context
+
 
 class SellerReviewListView(ListView):
+    """Відгуки про продавця; зведена репутація — з полів продавця."""
+    query_budget = 3
     model = SellerReview
     template_name = 'products/seller_reviews.html'
     context_object_name = 'reviews'
+    paginate_by = 20
 
     def get_queryset(self):
-        seller_id = self.kwargs.get('seller_id')
-        return SellerReview.objects.filter(seller_id=seller_id)
+        self.seller = get_object_or_404(CustomUser, pk=self.kwargs['pk'])
+        return (
+            SellerReview.objects.filter(seller=self.seller)
+            .select_related('reviewer')
+            .order_by('-created_at', '-pk')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['seller'] = self.seller
+        return context
@@ -0,0 +1,27 @@
+"""
+Завдання для пулів процесів у командах керування.
+
+Під spawn / forkserver (macOS, Windows, Python 3.14+ на Linux) дочірній
+процес імпортує модуль завдання заново і без налаштованого Django. Тому
+тут немає імпорту моделей на рівні модуля, а пул запускається з
+``initializer=setup``.
+"""
+import django
+
+
+def setup():
+    django.setup()
+
+
+def render_summaries(rows):
+    """[(pk, title, description, category_name, price), ...] -> [(pk, ai_summary), ...]."""
+    from .ai_utils import render_summary
+
+    return [(pk, render_summary(*fields)) for pk, *fields in rows]
+
+
+def render_image(data, widths):
+    """Байти оригіналу -> мініатюри (див. marketplace_project.images.render)."""
+    from marketplace_project import images
+
+    return images.render(data, widths)
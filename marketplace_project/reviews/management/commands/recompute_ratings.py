@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from reviews.ratings import recompute_product_ratings, recompute_seller_reputation
+
+
+class Command(BaseCommand):
+    help = (
+        "Перераховує rating_avg / rating_count / гістограму всіх товарів з відгуків "
+        "і репутацію продавців (відгуки про продавця + на його товари)."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            products = recompute_product_ratings()
+            sellers = recompute_seller_reputation()
+        self.stdout.write(self.style.SUCCESS(
+            f"Оновлено товарів з відгуками: {products}, продавців: {sellers}"
+        ))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def backfill_product_ratings(apps, schema_editor):
+    from reviews.ratings import recompute_product_ratings
+
+    recompute_product_ratings(
+        apps.get_model('products', 'Product'),
+        apps.get_model('reviews', 'Review'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_rating_aggregates'),
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='rating',
+            field=models.PositiveSmallIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.RunPython(backfill_product_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def backfill_seller_reputation(apps, schema_editor):
+    from reviews.ratings import recompute_seller_reputation
+
+    recompute_seller_reputation(
+        apps.get_model('users', 'CustomUser'),
+        apps.get_model('products', 'SellerReview'),
+        apps.get_model('reviews', 'Review'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_sku_import_job'),
+        ('reviews', '0004_review_updated_at'),
+        ('users', '0005_seller_reputation'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_seller_reputation, migrations.RunPython.noop),
+    ]
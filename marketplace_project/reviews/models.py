@@ -1,4 +1,5 @@
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
 from django.conf import settings
 from products.models import Product
 
@@ -14,12 +15,21 @@ class Review(models.Model):
         on_delete=models.CASCADE,
         related_name='reviews'
     )
-    rating = models.PositiveSmallIntegerField()
+    rating = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # версія для кешованого фрагмента review_item.html
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'Review by {self.reviewer.username} on {self.product.title}'
 
+    def save(self, *args, **kwargs):
+        # відгук і агрегати товару (post_save) пишуться в одній транзакції
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
@@ -0,0 +1,172 @@
+"""
+Денормалізовані агрегати рейтингу: rating_avg, rating_count та
+гістограма rating_1..rating_5 на моделі Product, і так само
+reputation_* на продавці (CustomUser).
+
+Кожна зміна відгуку — один UPDATE з F-виразами, тож паралельні відгуки
+не перетирають один одного, а середнє рахується з тієї ж гістограми.
+
+Репутація продавця об'єднує відгуки про продавця (products.SellerReview)
+і відгуки на його товари (Review) та зберігає байєсове середнє
+(m·C + сума) / (C + n): у продавця з двома п'ятірками воно нижче, ніж у
+продавця з сотнею оцінок 4.8, і росте до справжнього середнього з
+кількістю відгуків.
+"""
+from django.db.models import Case, Count, F, FloatField, Value, When
+from django.db.models.functions import Cast
+
+STARS = range(1, 6)
+
+# апріорне середнє m і його вага C (у "віртуальних" відгуках)
+REPUTATION_PRIOR_MEAN = 4.0
+REPUTATION_PRIOR_WEIGHT = 5
+
+
+def histogram_field(stars: int, prefix: str = "rating") -> str:
+    return f"{prefix}_{stars}"
+
+
+def rating_delta(rating: int, delta: int, prefix: str = "rating", prior=None) -> dict:
+    """
+    kwargs для ``QuerySet.update()``: додати (delta=1) чи прибрати (-1) оцінку.
+    ``prior`` — (m, C) для байєсового середнього замість звичайного.
+    """
+    if rating not in STARS:
+        return {}
+
+    count = f"{prefix}_count"
+    stars_sum = sum(F(histogram_field(stars, prefix)) * stars for stars in STARS) + rating * delta
+    new_count = F(count) + delta
+    if prior is None:
+        average = Cast(stars_sum, FloatField()) / new_count
+    else:
+        mean, weight = prior
+        average = (Cast(stars_sum, FloatField()) + mean * weight) / (new_count + weight)
+    return {
+        histogram_field(rating, prefix): F(histogram_field(rating, prefix)) + delta,
+        count: new_count,
+        f"{prefix}_avg": Case(
+            When(**{f"{count}__lte": -delta}, then=Value(0.0)),
+            default=average,
+            output_field=FloatField(),
+        ),
+    }
+
+
+def apply_rating(product_id: int, rating: int, delta: int) -> None:
+    from products.models import Product
+
+    changes = rating_delta(rating, delta)
+    if changes:
+        Product.objects.filter(pk=product_id).update(**changes)
+
+
+def apply_reputation(seller_id: int, rating: int, delta: int) -> None:
+    from users.models import CustomUser
+
+    changes = rating_delta(
+        rating, delta, prefix="reputation", prior=(REPUTATION_PRIOR_MEAN, REPUTATION_PRIOR_WEIGHT),
+    )
+    if changes:
+        CustomUser.objects.filter(pk=seller_id).update(**changes)
+
+
+def bayesian_average(stars_sum: int, count: int) -> float:
+    if not count:
+        return 0.0
+    return (stars_sum + REPUTATION_PRIOR_MEAN * REPUTATION_PRIOR_WEIGHT) / (count + REPUTATION_PRIOR_WEIGHT)
+
+
+def empty_aggregates(prefix: str = "rating") -> dict:
+    values = {histogram_field(stars, prefix): 0 for stars in STARS}
+    values.update({f"{prefix}_count": 0, f"{prefix}_avg": 0})
+    return values
+
+
+def recompute_product_ratings(product_model=None, review_model=None, batch_size=1000) -> int:
+    """Перераховує агрегати всіх товарів з таблиці відгуків (виправлення дрейфу)."""
+    if product_model is None:
+        from products.models import Product as product_model
+    if review_model is None:
+        from .models import Review as review_model
+
+    fields = list(empty_aggregates())
+    product_model.objects.update(**empty_aggregates())
+
+    rows = (
+        review_model.objects
+        .filter(rating__in=STARS)
+        .values_list("product_id", "rating")
+        .annotate(n=Count("id"))
+        .order_by("product_id")
+    )
+
+    batch = []
+    current = None
+
+    def flush(item):
+        total = sum(getattr(item, histogram_field(s)) * s for s in STARS)
+        item.rating_avg = total / item.rating_count
+        batch.append(item)
+
+    for product_id, rating, n in rows.iterator():
+        if current is None or current.pk != product_id:
+            if current is not None:
+                flush(current)
+            current = product_model(pk=product_id, **empty_aggregates())
+        setattr(current, histogram_field(rating), n)
+        current.rating_count += n
+
+        if len(batch) >= batch_size:
+            product_model.objects.bulk_update(batch, fields)
+            batch = []
+
+    if current is not None:
+        flush(current)
+    if batch:
+        product_model.objects.bulk_update(batch, fields)
+
+    return product_model.objects.filter(rating_count__gt=0).count()
+
+
+def recompute_seller_reputation(user_model=None, seller_review_model=None, review_model=None,
+                                batch_size=1000) -> int:
+    """Перераховує репутацію всіх продавців з обох джерел відгуків."""
+    if user_model is None:
+        from users.models import CustomUser as user_model
+    if seller_review_model is None:
+        from products.models import SellerReview as seller_review_model
+    if review_model is None:
+        from .models import Review as review_model
+
+    fields = list(empty_aggregates("reputation"))
+    user_model.objects.exclude(reputation_count=0).update(**empty_aggregates("reputation"))
+
+    histograms = {}
+    sources = (
+        seller_review_model.objects.values_list("seller_id", "rating"),
+        review_model.objects.values_list("product__seller_id", "rating"),
+    )
+    for rows in sources:
+        grouped = rows.filter(rating__in=STARS).annotate(n=Count("id")).order_by()
+        for seller_id, rating, n in grouped.iterator():
+            histogram = histograms.setdefault(seller_id, dict.fromkeys(STARS, 0))
+            histogram[rating] += n
+
+    batch = []
+    for seller_id, histogram in histograms.items():
+        seller = user_model(pk=seller_id)
+        for stars, n in histogram.items():
+            setattr(seller, histogram_field(stars, "reputation"), n)
+        seller.reputation_count = sum(histogram.values())
+        seller.reputation_avg = bayesian_average(
+            sum(stars * n for stars, n in histogram.items()), seller.reputation_count,
+        )
+        batch.append(seller)
+        if len(batch) >= batch_size:
+            user_model.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        user_model.objects.bulk_update(batch, fields)
+
+    return len(histograms)
@@ -0,0 +1,128 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from marketplace_project import page_cache
+from products import fragments
+from products.models import Product, SellerReview
+
+from .models import Review
+from . import ratings
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_rating = (
+        Review.objects.filter(pk=instance.pk)
+        .values_list("product_id", "product__seller_id", "rating")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_rating", None)
+    current = (instance.product_id, instance.product.seller_id, instance.rating)
+    if previous == current:
+        return
+    if previous is not None:
+        product_id, seller_id, rating = previous
+        ratings.apply_rating(product_id, rating, delta=-1)
+        ratings.apply_reputation(seller_id, rating, delta=-1)
+    product_id, seller_id, rating = current
+    ratings.apply_rating(product_id, rating, delta=1)
+    ratings.apply_reputation(seller_id, rating, delta=1)
+
+
+def _deleted_sellers(origin):
+    """
+    {product_id: seller_id} для відгуків, що видаляються разом з ``origin``:
+    при каскаді відгуки приходять без товару, і без цього був би запит на
+    кожен відгук. Словник живе на ``origin`` — одне видалення, один запит.
+    """
+    if origin is None:
+        return {}
+    sellers = getattr(origin, "_review_sellers", None)
+    if sellers is None:
+        if isinstance(origin, Product):
+            sellers = {origin.pk: origin.seller_id}
+        elif isinstance(origin, QuerySet) and origin.model is Product:
+            sellers = dict(origin.values_list("pk", "seller_id"))
+        elif isinstance(origin, QuerySet) and origin.model is Review:
+            sellers = dict(origin.values_list("product_id", "product__seller_id"))
+        else:
+            sellers = {}
+        origin._review_sellers = sellers
+    return sellers
+
+
+@receiver(pre_delete, sender=Review)
+def remember_seller(sender, instance, origin=None, **kwargs):
+    # рядки ще на місці: post_delete приходить уже після видалення всієї пачки
+    if Review.product.is_cached(instance):
+        instance._seller_id = instance.product.seller_id
+        return
+    sellers = _deleted_sellers(origin)
+    if instance.product_id not in sellers:
+        sellers[instance.product_id] = (
+            Product.objects.filter(pk=instance.product_id).values_list("seller_id", flat=True).first()
+        )
+    instance._seller_id = sellers[instance.product_id]
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    ratings.apply_rating(instance.product_id, instance.rating, delta=-1)
+    ratings.apply_reputation(instance._seller_id, instance.rating, delta=-1)
+
+
+# ===========================
+#   ВІДГУКИ ПРО ПРОДАВЦЯ
+# ===========================
+@receiver(pre_save, sender=SellerReview)
+def remember_previous_seller_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_rating = (
+        SellerReview.objects.filter(pk=instance.pk)
+        .values_list("seller_id", "rating")
+        .first()
+    )
+
+
+@receiver(post_save, sender=SellerReview)
+def update_reputation_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_rating", None)
+    current = (instance.seller_id, instance.rating)
+    if previous == current:
+        return
+    if previous is not None:
+        ratings.apply_reputation(*previous, delta=-1)
+    ratings.apply_reputation(*current, delta=1)
+
+
+@receiver(post_delete, sender=SellerReview)
+def update_reputation_on_delete(sender, instance, **kwargs):
+    ratings.apply_reputation(instance.seller_id, instance.rating, delta=-1)
+
+
+@receiver(post_delete, sender=Review)
+def drop_cached_review(sender, instance, **kwargs):
+    fragments.invalidate('review_item', instance)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def purge_product_page(sender, instance, raw=False, **kwargs):
+    # відгуки і рейтинг — на сторінці товару
+    if raw:
+        return
+    page_cache.purge(f'product:{instance.product_id}')
@@ -1,3 +1,151 @@
-from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from marketplace_project.testing import QueryBudgetTestCase
+from products.models import Product, SellerReview
+from users.models import CustomUser
+
+from .models import Review
+from .ratings import recompute_seller_reputation
+
+REPUTATION_FIELDS = ['reputation_avg', 'reputation_count'] + [f'reputation_{stars}' for stars in range(1, 6)]
+
+
+class ReviewQueryBudgetTests(QueryBudgetTestCase):
+    def test_product_reviews(self):
+        self.assertWithinBudget(self.client.get(reverse('product-reviews', args=[self.product.pk])))
+
+    def test_seller_reviews(self):
+        response = self.client.get(reverse('seller-reviews', args=[self.seller.pk]))
+        self.assertWithinBudget(response)
+        # відгуки на товар 0 продавця; товар 1 — іншого продавця
+        self.assertEqual(len(response.context['reviews']), self.ROWS)
+
+    def test_seller_reviews_paginated(self):
+        Review.objects.bulk_create([
+            Review(product=self.product, reviewer=self.buyer, rating=3, comment=str(i)) for i in range(20)
+        ])
+        url = reverse('seller-reviews', args=[self.seller.pk])
+        self.assertWithinBudget(self.client.get(url))
+        response = self.client.get(url, {'page': 2})
+        self.assertWithinBudget(response)
+        self.assertEqual(len(response.context['reviews']), self.ROWS)
+
+    def test_review_form(self):
+        self.login(self.buyer)
+        url = reverse('review-create', args=[self.product.pk])
+        self.assertWithinBudget(self.client.get(url))
+        self.assertWithinBudget(
+            self.client.post(url, {'rating': 5, 'comment': 'Чудово'}), status=302
+        )
+
+    def test_review_create_htmx(self):
+        self.login(self.buyer)
+        url = reverse('review-create', args=[self.product.pk])
+        self.assertWithinBudget(
+            self.client.post(url, {'rating': 3, 'comment': 'Норм'}, headers={'HX-Request': 'true'})
+        )
+
+
+class SellerReputationTests(QueryBudgetTestCase):
+    def reputation(self, user=None):
+        return CustomUser.objects.filter(pk=(user or self.seller).pk).values(*REPUTATION_FIELDS).get()
+
+    def test_combines_both_sources(self):
+        # 5 відгуків про продавця по 5★ і 5 відгуків на його товар по 4★
+        reputation = self.reputation()
+        self.assertEqual(reputation['reputation_count'], 10)
+        self.assertEqual((reputation['reputation_5'], reputation['reputation_4']), (5, 5))
+        # (45 + 4.0 * 5) / (10 + 5)
+        self.assertAlmostEqual(reputation['reputation_avg'], 65 / 15)
+
+    def test_incremental_updates_match_recompute(self):
+        review = Review.objects.create(product=self.products[2], reviewer=self.buyer, rating=1, comment='Погано')
+        review.rating = 2
+        review.save()
+        SellerReview.objects.create(seller=self.seller, reviewer=self.buyer, rating=3)
+        SellerReview.objects.filter(rating=5).first().delete()
+        Review.objects.filter(product=self.product).first().delete()
+        # відгук на товар іншого продавця не впливає
+        Review.objects.create(product=self.products[1], reviewer=self.buyer, rating=1, comment='Ні')
+
+        incremental = self.reputation()
+        self.assertEqual(incremental['reputation_count'], 10)
+        recompute_seller_reputation()
+        recomputed = self.reputation()
+        self.assertEqual(incremental.pop('reputation_avg'), recomputed.pop('reputation_avg'))
+        self.assertEqual(incremental, recomputed)
+
+    def test_last_review_removed(self):
+        Review.objects.filter(product__seller=self.seller).delete()
+        for review in SellerReview.objects.filter(seller=self.seller):
+            review.delete()
+        reputation = self.reputation()
+        self.assertEqual((reputation['reputation_count'], reputation['reputation_avg']), (0, 0))
+
+    def test_shown_without_extra_queries(self):
+        self.assertWithinBudget(self.client.get(reverse('profile', args=[self.seller.pk])))
+        response = self.client.get(reverse('product-detail', args=[self.product.pk]))
+        self.assertWithinBudget(response)
+        self.assertContains(response, '★ 4,3')
+
+    def test_cascade_delete_loads_sellers_once(self):
+        # create, а не bulk_create: лічильники рейтингу мають врахувати відгуки
+        for i, product in enumerate(self.products[:6] * 3):
+            Review.objects.create(product=product, reviewer=self.buyer, rating=2, comment=str(i))
+        for delete in (
+            lambda: Product.objects.filter(pk__in=[p.pk for p in self.products[2:6]]).delete(),
+            lambda: Review.objects.filter(product=self.products[0]).delete(),
+            lambda: self.products[1].delete(),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                delete()
+            # товар на кожен відгук: ... WHERE "products_product"."id" = N
+            per_review = [
+                query['sql'] for query in queries
+                if query['sql'].startswith('SELECT') and '"products_product"."id" = ' in query['sql']
+            ]
+            self.assertEqual(per_review, [])
+
+        incremental = self.reputation()
+        recompute_seller_reputation()
+        recomputed = self.reputation()
+        self.assertEqual(incremental.pop('reputation_avg'), recomputed.pop('reputation_avg'))
+        self.assertEqual(incremental, recomputed)
+
+
+class ProductRatingTests(QueryBudgetTestCase):
+    def rating(self, product=None):
+        product = Product.objects.get(pk=(product or self.products[2]).pk)
+        return product.rating_avg, product.rating_count, product.rating_histogram
+
+    def test_create_change_delete(self):
+        product = self.products[2]
+        first = Review.objects.create(product=product, reviewer=self.buyer, rating=5, comment='Супер')
+        Review.objects.create(product=product, reviewer=self.seller, rating=2, comment='Так собі')
+        self.assertEqual(self.rating(), (3.5, 2, [(5, 1), (4, 0), (3, 0), (2, 1), (1, 0)]))
+
+        first.rating = 3
+        first.save()
+        self.assertEqual(self.rating(), (2.5, 2, [(5, 0), (4, 0), (3, 1), (2, 1), (1, 0)]))
+
+        Review.objects.filter(rating=2, product=product).get().delete()
+        first.delete()
+        self.assertEqual(self.rating(), (0, 0, [(5, 0), (4, 0), (3, 0), (2, 0), (1, 0)]))
+
+    def test_stale_instances_do_not_overwrite_aggregates(self):
+        product = Product.objects.get(pk=self.product.pk)
+        stale_review = Review.objects.filter(product=product).first()
+        Review.objects.create(product=product, reviewer=self.buyer, rating=1, comment='Погано')
+        # продавець зберігає товар, прочитаний до нового відгуку
+        product.title = 'Шампунь новий'
+        product.save()
+        stale_review.rating = 5
+        stale_review.save()
+
+        avg, count, histogram = self.rating(product)
+        self.assertEqual(count, self.ROWS + 1)
+        self.assertEqual(dict(histogram), {5: 1, 4: self.ROWS - 1, 3: 0, 2: 0, 1: 1})
+        self.assertAlmostEqual(avg, (5 + 4 * (self.ROWS - 1) + 1) / (self.ROWS + 1))
+        self.assertEqual(Product.objects.get(pk=product.pk).title, 'Шампунь новий')
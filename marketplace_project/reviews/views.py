@@ -1,4 +1,4 @@
-from django.views.generic import CreateView, ListView, DetailView
+from django.views.generic import CreateView, ListView
 from django.shortcuts import get_object_or_404, render
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse
@@ -11,28 +11,40 @@ from products.models import Product
 from users.models import CustomUser
 
 
-class SellerReviewListView(DetailView):
+class SellerReviewListView(ListView):
+    """Відгуки на товари продавця; зведена репутація — з полів продавця."""
+    query_budget = 3
     template_name = "reviews/seller_reviews.html"
-    model = CustomUser
-    context_object_name = "seller"
+    context_object_name = "reviews"
+    paginate_by = 20
+
+    def get_queryset(self):
+        self.seller = get_object_or_404(CustomUser, pk=self.kwargs["pk"])
+        return (
+            Review.objects.filter(product__seller=self.seller)
+            .select_related("reviewer", "product")
+            .order_by("-created_at", "-pk")
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["reviews"] = Review.objects.filter(product__seller=self.object)
+        context["seller"] = self.seller
         return context
 
 
 class ProductReviewListView(ListView):
+    query_budget = 1
     template_name = 'reviews/review_list.html'
     model = Review
     context_object_name = 'reviews'
 
     def get_queryset(self):
         product_id = self.kwargs.get('product_id')
-        return Review.objects.filter(product_id=product_id)
+        return Review.objects.filter(product_id=product_id).select_related('reviewer')
 
 
 class ReviewCreateView(LoginRequiredMixin, CreateView):
+    query_budget = {'GET': 3, 'POST': 6}
     template_name = 'reviews/review_form.html'
     form_class = ReviewForm
 
@@ -1,10 +1,16 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from marketplace_project.storage import content_storage
+
+
 class CustomUser(AbstractUser):
     is_seller = models.BooleanField(default=False)
     is_buyer = models.BooleanField(default=True)
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    avatar = models.ImageField(
+        upload_to='avatars/', storage=content_storage, blank=True, null=True, db_index=True,
+    )
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True)
     store_name = models.CharField(max_length=255, blank=True)
     payment_info = models.TextField(blank=True)
@@ -15,5 +21,19 @@ class CustomUser(AbstractUser):
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='buyer')
 
+    # 🔹 Репутація продавця: відгуки про продавця + на його товари (оновлює reviews.ratings)
+    reputation_avg = models.FloatField(default=0)
+    reputation_count = models.PositiveIntegerField(default=0)
+    reputation_1 = models.PositiveIntegerField(default=0)
+    reputation_2 = models.PositiveIntegerField(default=0)
+    reputation_3 = models.PositiveIntegerField(default=0)
+    reputation_4 = models.PositiveIntegerField(default=0)
+    reputation_5 = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.username
+
+    @property
+    def reputation_histogram(self):
+        """[(зірки, кількість), ...] від 5 до 1"""
+        return [(stars, getattr(self, f'reputation_{stars}')) for stars in range(5, 0, -1)]
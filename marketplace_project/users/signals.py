@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from marketplace_project import images, storage
+
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def build_avatar_derivatives(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    images.schedule(instance, 'avatar', 'avatar_variants', images.AVATAR_WIDTHS)
+
+
+storage.track(CustomUser, 'avatar')
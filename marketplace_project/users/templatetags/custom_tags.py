@@ -1,7 +1,43 @@
 from django import template
+from django.utils.html import format_html, format_html_join
+
+from marketplace_project import images, page_cache
 
 register = template.Library()
 
 @register.filter
 def startswith(text, starts):
     return str(text).startswith(starts)
+
+
+@register.simple_tag(takes_context=True)
+def page_hole(context, name):
+    """Персональний шматок сторінки, який кеш сторінок рендерить для кожного запиту."""
+    return page_cache.render_hole(name, context["request"])
+
+
+@register.simple_tag
+def responsive_image(image, variants, sizes="100vw", **attrs):
+    """
+    <picture> з WebP/JPEG srcset із похідних (marketplace_project.images).
+    Поки похідних ще немає — звичайний <img> з оригіналом.
+    """
+    if not image:
+        return ""
+    attrs.setdefault("loading", "lazy")
+    extra = format_html_join(" ", '{}="{}"', attrs.items())
+
+    if not variants or variants.get("src") != image.name or not variants.get("widths"):
+        return format_html('<img src="{}" {}>', image.url, extra)
+
+    storage = image.storage
+    (webp, _), (jpeg, _) = images.FORMATS
+    fallback = images.derivative_name(image.name, variants["widths"][-1], jpeg)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" {}>'
+        '</picture>',
+        images.srcset(variants, webp, storage), sizes,
+        storage.url(fallback), images.srcset(variants, jpeg, storage), sizes, extra,
+    )
@@ -1,3 +1,23 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from marketplace_project.testing import QueryBudgetTestCase
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+    def test_register_and_login_pages(self):
+        self.assertWithinBudget(self.client.get(reverse('register')))
+        self.assertWithinBudget(self.client.get(reverse('login')))
+
+    def test_login_and_logout(self):
+        response = self.client.post(
+            reverse('login'), {'username': 'buyer', 'password': self.password}
+        )
+        self.assertWithinBudget(response, status=302)
+        self.assertWithinBudget(self.client.post(reverse('logout')), status=302)
+
+    def test_profile(self):
+        self.assertWithinBudget(self.client.get(reverse('profile', args=[self.seller.pk])))
+
+    def test_profile_edit(self):
+        self.login(self.seller)
+        self.assertWithinBudget(self.client.get(reverse('profile-edit')))
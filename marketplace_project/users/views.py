@@ -6,6 +6,7 @@ from .forms import UserRegisterForm, UserProfileForm, UserLoginForm
 
 
 class UserRegisterView(CreateView):
+    query_budget = 0
     template_name = 'users/register.html'
     form_class = UserRegisterForm
     success_url = reverse_lazy('login')
@@ -20,6 +21,9 @@ class UserRegisterView(CreateView):
 
 
 class UserLoginView(LoginView):
+    # вхід із сесією — 6 запитів, злиття анонімного кошика з наявним — ще 10
+    # (сталих, див. orders.cart.merge_carts)
+    query_budget = {'GET': 0, 'POST': 16}
     template_name = 'users/login.html'
     authentication_form = UserLoginForm
 
@@ -33,16 +37,19 @@ class UserLoginView(LoginView):
 
 
 class UserLogoutView(LogoutView):
+    query_budget = 4
     next_page = reverse_lazy('login')
 
 
 class UserProfileView(DetailView):
+    query_budget = 1
     template_name = 'users/profile.html'
     model = CustomUser
     context_object_name = 'user_obj'
 
 
 class UserProfileUpdateView(UpdateView):
+    query_budget = 3
     template_name = 'users/profile_edit.html'
     model = CustomUser
     form_class = UserProfileForm